@@ -5,7 +5,7 @@ Provides advanced reporting and visualization capabilities
 
 from datetime import datetime, date, timedelta
 from collections import defaultdict, Counter
-from sqlalchemy import func, and_, or_
+from sqlalchemy import func, and_, or_, case
 import json
 
 def calculate_attendance_trends(db, current_user, days=30, class_id=None):
@@ -61,43 +61,53 @@ def get_student_attendance_summary(db, current_user, class_id=None, days=30):
     if class_id and class_id != 'all':
         students_query = students_query.filter(Student.class_id == class_id)
     
-    students = students_query.all()
+    students = students_query.order_by(Student.id).all()
+    
+    # Per-student status counts and average late minutes in one grouped query
+    totals_query = db.session.query(
+        Attendance.student_id,
+        func.count(Attendance.id),
+        func.sum(case((Attendance.status == 'Present', 1), else_=0)),
+        func.sum(case((Attendance.status == 'Late', 1), else_=0)),
+        func.sum(case((Attendance.status == 'Absent', 1), else_=0)),
+        func.sum(case((Attendance.status == 'Excused', 1), else_=0)),
+        func.avg(case((and_(Attendance.status == 'Late', Attendance.late_minutes > 0), Attendance.late_minutes)))
+    ).join(Class).filter(
+        Class.teacher_id == current_user.id,
+        Attendance.date >= start_date,
+        Attendance.date <= end_date
+    )
+    
+    # Recent attendance pattern (last 7 days) for every student in one batched query
+    recent_query = db.session.query(
+        Attendance.student_id,
+        Attendance.status
+    ).join(Class).filter(
+        Class.teacher_id == current_user.id,
+        Attendance.date >= max(start_date, end_date - timedelta(days=7)),
+        Attendance.date <= end_date
+    )
+    
+    if class_id and class_id != 'all':
+        totals_query = totals_query.filter(Class.id == class_id)
+        recent_query = recent_query.filter(Class.id == class_id)
+    
+    totals = {row[0]: row[1:] for row in totals_query.group_by(Attendance.student_id).all()}
+    recent_patterns = defaultdict(list)
+    for student_id, status in recent_query.order_by(Attendance.date, Attendance.id).all():
+        recent_patterns[student_id].append(status)
     
     student_summaries = []
     
     for student in students:
-        # Get attendance records for this student
-        attendance_query = db.session.query(Attendance).join(Class).filter(
-            Class.teacher_id == current_user.id,
-            Attendance.student_id == student.id,
-            Attendance.date >= start_date,
-            Attendance.date <= end_date
-        )
-        
-        if class_id and class_id != 'all':
-            attendance_query = attendance_query.filter(Class.id == class_id)
-        
-        records = attendance_query.all()
-        
-        # Calculate statistics
-        total_days = len(records)
-        present_count = sum(1 for r in records if r.status == 'Present')
-        late_count = sum(1 for r in records if r.status == 'Late')
-        absent_count = sum(1 for r in records if r.status == 'Absent')
-        excused_count = sum(1 for r in records if r.status == 'Excused')
+        total_days, present_count, late_count, absent_count, excused_count, avg_late_minutes = \
+            totals.get(student.id, (0, 0, 0, 0, 0, None))
+        avg_late_minutes = avg_late_minutes or 0
         
         # Calculate attendance rate
         attending_count = present_count + late_count
         attendance_rate = (attending_count / total_days * 100) if total_days > 0 else 0
         
-        # Calculate average late minutes
-        late_records = [r for r in records if r.status == 'Late' and r.late_minutes > 0]
-        avg_late_minutes = sum(r.late_minutes for r in late_records) / len(late_records) if late_records else 0
-        
-        # Get recent attendance pattern (last 7 days)
-        recent_records = [r for r in records if r.date >= (end_date - timedelta(days=7))]
-        recent_pattern = [r.status for r in sorted(recent_records, key=lambda x: x.date)]
-        
         student_summaries.append({
             'student': student,
             'total_days': total_days,
@@ -107,7 +117,7 @@ def get_student_attendance_summary(db, current_user, class_id=None, days=30):
             'excused_count': excused_count,
             'attendance_rate': round(attendance_rate, 1),
             'avg_late_minutes': round(avg_late_minutes, 1),
-            'recent_pattern': recent_pattern,
+            'recent_pattern': recent_patterns.get(student.id, []),
             'risk_level': calculate_risk_level(attendance_rate, absent_count, late_count)
         })
     
@@ -191,7 +201,7 @@ def get_time_based_analytics(db, current_user, class_id=None, days=30):
     records = query.all()
     
     # Day of week analysis
-    day_stats = defaultdict(lambda: {'Present': 0, 'Late': 0, 'Absent': 0, 'total': 0})
+    day_stats = defaultdict(lambda: {'Present': 0, 'Late': 0, 'Absent': 0, 'Excused': 0, 'total': 0})
     
     # Hour of day analysis (for late arrivals)
     hour_stats = defaultdict(lambda: {'count': 0, 'late_minutes': 0})
@@ -9,33 +9,90 @@ from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 from flask import abort
-import qrcode
 from io import BytesIO
 from flask import send_file
 from datetime import datetime
 import csv
-from flask import Response
-from sqlalchemy import event
+from flask import Response, stream_with_context
+from sqlalchemy import event, func, case, and_, or_, exists, select, literal, bindparam, extract, type_coerce, String, tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.engine import Engine
-# from flask_migrate import Migrate
+from sqlalchemy.exc import SQLAlchemyError
+from flask_migrate import Migrate
 import io
 from flask import session
 from math import ceil
+from collections import namedtuple, defaultdict
+from array import array
+from bisect import bisect_left
+import json
+import base64
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import click
+import tempfile
+import threading
+from scheduler import JobScheduler
+from qr_service import QRCodeService, QRImageCache, render_qr_png, render_qr_svg, qr_digest
+from badge_sheets import BADGE_LAYOUTS, PAGE_FORMATS, iter_badge_pages, iter_pdf, iter_zip
+from photo_variants import (PHOTO_VARIANT_MIMETYPE, PHOTO_VARIANT_SIZES, backfill_photo_variants, existing_variant,
+                            remove_photo_variants, render_photo_variants, variant_path)
+from blob_storage import BlobStore, LocalBlobBackend, S3BlobBackend, is_blob_key
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import uuid
+import mimetypes
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your_secret_key_here'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///attendance.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///attendance.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(minutes=15)
 # Photo upload configuration
 app.config['UPLOAD_FOLDER'] = 'static/photos'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+# Upload storage: 'local' (files under UPLOAD_STORAGE_ROOT) or 's3' (S3 or an S3-compatible server like MinIO,
+# needs the extra packages in requirements-s3.txt)
+app.config['UPLOAD_STORAGE'] = os.environ.get('UPLOAD_STORAGE', 'local')
+app.config['UPLOAD_STORAGE_ROOT'] = os.environ.get('UPLOAD_STORAGE_ROOT', 'static/blobs')
+app.config['S3_BUCKET'] = os.environ.get('S3_BUCKET')
+app.config['S3_ENDPOINT_URL'] = os.environ.get('S3_ENDPOINT_URL')  # e.g. http://localhost:9000 for MinIO
+app.config['S3_PUBLIC_URL'] = os.environ.get('S3_PUBLIC_URL')  # unset: presigned URLs
+UPLOAD_GC_GRACE = timedelta(hours=24)  # unreferenced blobs younger than this are kept (uploads in flight)
+# Background job configuration
+# The jobs run in one process only: `flask run-scheduler` next to the web server, or
+# SCHEDULER_ENABLED=1 to run them inside a single-process `python app.py`
+app.config['SCHEDULER_ENABLED'] = os.environ.get('SCHEDULER_ENABLED', '0') == '1'
+app.config['EXCUSE_EXPIRY_INTERVAL'] = timedelta(hours=1)
+app.config['CLASS_CLOSE_SYNC_INTERVAL'] = timedelta(minutes=5)  # how soon the scheduler sees edited class end times
+# Mark absentees automatically when each class ends; off by default since classes have no meeting days
+app.config['AUTO_CLOSE_CLASSES'] = os.environ.get('AUTO_CLOSE_CLASSES', '0') == '1'
+EXCUSE_EXPIRY_BATCH_SIZE = 500
+CSV_EXPORT_BATCH_SIZE = 1000  # rows fetched per round trip while streaming exports
+PARQUET_ROW_GROUP_SIZE = 50000  # rows read per chunk and written as one Parquet row group
+STUDENTS_PAGE_SIZE = 50  # students per /students/manage page and /api/students request
+STUDENT_IMPORT_BATCH_SIZE = 500  # students inserted per commit during a CSV import
+QR_WORKERS = os.cpu_count() or 1  # processes writing QR files in flask regenerate-qr-codes
+QR_IMAGE_CACHE_BYTES = 16 * 1024 * 1024  # encoded /qr images kept in memory
+QR_MAX_SIZE = 1024  # largest ?size= accepted by /qr images, in pixels
+QR_CACHE_MAX_AGE = 365 * 24 * 3600  # an image for a given number and size never changes
+BADGE_WORKERS = os.cpu_count() or 1  # processes drawing badge sheet pages, shared by every badge job
+BADGE_JOB_WORKERS = 2  # badge sheets built at once; further requests wait in line
+MAX_TRACKED_BADGE_JOBS = 10  # finished sheets kept for download; older files are deleted
+PHOTO_WORKERS = os.cpu_count() or 1  # processes making photo thumbnails in backfill-photo-variants
+BADGES_PER_PAGE = 8  # default badge sheet layout, see badge_sheets.BADGE_LAYOUTS
+QR_THUMBNAIL_SIZE = 100  # /qr size for the 50 px student list thumbnails (2x for high-DPI screens)
+CHANGES_PAGE_SIZE = 500  # default rows per /api/changes page
+CHANGES_MAX_PAGE_SIZE = 5000
+# Analytics configuration: 'python' (pure Python frame) or 'numpy' (vectorized)
+app.config['ANALYTICS_BACKEND'] = os.environ.get('ANALYTICS_BACKEND', 'python')
 
 db = SQLAlchemy(app)
 login_manager = LoginManager(app)
 login_manager.login_view = 'login'
-# migrate = Migrate(app, db)
+migrate = Migrate(app, db)
 
 # Models will be added here
 
@@ -52,17 +109,94 @@ class Class(db.Model):
     start_time = db.Column(db.Time, default=time(8, 0), nullable=False)  # Default 8:00 AM
     end_time = db.Column(db.Time, default=time(17, 0), nullable=False)   # Default 5:00 PM
     students = db.relationship('Student', backref='class_', lazy=True)
-    attendances = db.relationship('Attendance', backref='class_', lazy=True)
+    attendances = db.relationship('Attendance', backref='class_', lazy=True, cascade='all, delete-orphan')
 
 class Student(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
+    name_lower = db.Column(db.String(100), nullable=False, index=True)  # Set from name; used for search and duplicate checks
     student_number = db.Column(db.String(50), unique=True, nullable=False)
     class_id = db.Column(db.Integer, db.ForeignKey('class.id'), nullable=True)
-    qr_code_path = db.Column(db.String(200))
     photo_path = db.Column(db.String(200), nullable=True)  # New field for student photos
     attendances = db.relationship('Attendance', backref='student', lazy=True, cascade='all, delete-orphan')
 
+def normalize_student_name(name):
+    """Lowercase, trimmed form of a student name stored in Student.name_lower"""
+    return (name or '').strip().lower()
+
+@event.listens_for(Student.name, 'set')
+def sync_student_name_lower(target, value, oldvalue, initiator):
+    """Keep name_lower in step with every assignment to Student.name"""
+    target.name_lower = normalize_student_name(value)
+
+# Content-addressed QR files written by `flask regenerate-qr-codes`, see qr_service.QRCodeService.
+# Pages use /qr/<student_number>.<fmt>, rendered on demand; badge sheets reuse these files when present.
+qr_codes = QRCodeService('static/qr', max_workers=QR_WORKERS)
+
+# Encoded images served by /qr/<student_number>.<fmt>
+qr_images = QRImageCache(QR_IMAGE_CACHE_BYTES)
+
+class ChangeCounter(db.Model):
+    """
+    Single-row counter behind the change_seq columns on Attendance, ExcuseRequest
+    and ChangeTombstone.
+    
+    Every write transaction takes the next value once (see current_change_seq),
+    so change_seq grows in commit order and /api/changes can resume from the
+    last value a client has seen.
+    """
+    __tablename__ = 'change_counter'
+    id = db.Column(db.Integer, primary_key=True)
+    value = db.Column(db.Integer, default=0, nullable=False)
+
+def current_change_seq():
+    """
+    Change sequence number for the current transaction.
+    
+    The counter is bumped on the first tracked write of a transaction and the
+    same value is stamped on every row written before commit. SQLite only lets
+    one writer in at a time, so a higher value is never committed before a
+    lower one. ORM writes are stamped by stamp_change_seq; Core inserts and
+    updates of tracked tables must set change_seq to this value themselves.
+    
+    Returns:
+        int: change_seq for rows inserted or updated in this transaction
+    """
+    seq = db.session.info.get('change_seq')
+    if seq is None:
+        counter = ChangeCounter.__table__
+        connection = db.session.connection()
+        result = connection.execute(
+            counter.update().where(counter.c.id == 1).values(value=counter.c.value + 1)
+        )
+        if result.rowcount == 0:
+            connection.execute(counter.insert().values(id=1, value=1))
+        seq = connection.execute(select(counter.c.value).where(counter.c.id == 1)).scalar_one()
+        db.session.info['change_seq'] = seq
+    return seq
+
+@event.listens_for(db.session, 'after_commit')
+@event.listens_for(db.session, 'after_rollback')
+def reset_change_seq(session):
+    """The next transaction takes a new change sequence number"""
+    session.info.pop('change_seq', None)
+
+class ChangeTombstone(db.Model):
+    """
+    A deleted attendance or excuse request row, so /api/changes can tell
+    clients to drop it. Written by record_change_tombstones.
+    """
+    __tablename__ = 'change_tombstone'
+    id = db.Column(db.Integer, primary_key=True)
+    teacher_id = db.Column(db.Integer, nullable=False)  # no foreign key: outlives the deleted row
+    table_name = db.Column(db.String(30), nullable=False)  # attendance/excuse_request
+    row_id = db.Column(db.Integer, nullable=False)
+    change_seq = db.Column(db.Integer, nullable=False)
+    
+    __table_args__ = (
+        db.Index('ix_change_tombstone_teacher_change_seq', 'teacher_id', 'change_seq'),
+    )
+
 class Attendance(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('student.id', ondelete='CASCADE'), nullable=False)
@@ -76,6 +210,17 @@ class Attendance(db.Model):
     late_minutes = db.Column(db.Integer, default=0, nullable=False)  # Minutes late
     notes = db.Column(db.Text, nullable=True)  # Optional notes for late arrivals
     excuse_request_id = db.Column(db.Integer, db.ForeignKey('excuse_request.id'), nullable=True)  # Link to excuse request
+    # Stamped on every insert/update so changes can be exported incrementally, see stamp_change_seq
+    change_seq = db.Column(db.Integer, nullable=False)
+
+    # Indexes for the (student, class, date) lookups done on every scan/review
+    __table_args__ = (
+        db.Index('ix_attendance_class_date_student', 'class_id', 'date', 'student_id', unique=True),
+        db.Index('ix_attendance_student_date', 'student_id', 'date'),
+        db.Index('ix_attendance_excuse_request_id', 'excuse_request_id'),
+        db.Index('ix_attendance_teacher_change_seq', 'teacher_id', 'change_seq'),
+        db.Index('ix_attendance_date', 'date'),  # (date, id) keyset pages on /records/manage
+    )
 
 class ExcuseRequest(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -89,93 +234,494 @@ class ExcuseRequest(db.Model):
     submitted_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
     reviewed_at = db.Column(db.DateTime, nullable=True)
     teacher_notes = db.Column(db.Text, nullable=True)  # Teacher's notes on the decision
+    change_seq = db.Column(db.Integer, nullable=False)
+    
+    __table_args__ = (
+        db.Index('ix_excuse_request_teacher_change_seq', 'teacher_id', 'change_seq'),
+    )
     
-    # Relationships
-    student = db.relationship('Student', backref='excuse_requests')
-    class_ = db.relationship('Class', backref='excuse_requests')
+    # Relationships; deleting a student or class deletes its requests
+    student = db.relationship('Student', backref=db.backref('excuse_requests', cascade='all, delete-orphan'))
+    class_ = db.relationship('Class', backref=db.backref('excuse_requests', cascade='all, delete-orphan'))
     teacher = db.relationship('Teacher', backref='excuse_requests')
     attendance = db.relationship('Attendance', backref='excuse_request', uselist=False)
 
+# Tables reported by /api/changes: model -> table name in the feed
+CHANGE_TRACKED_MODELS = {Attendance: 'attendance', ExcuseRequest: 'excuse_request'}
+
+@event.listens_for(db.session, 'before_flush')
+def stamp_change_seq(session, flush_context, instances):
+    """Give attendance and excuse request rows inserted or changed by this flush the transaction's change_seq"""
+    written = [obj for obj in session.new | session.dirty
+               if type(obj) in CHANGE_TRACKED_MODELS and obj not in session.deleted
+               and (obj in session.new or session.is_modified(obj, include_collections=False))]
+    if written:
+        seq = current_change_seq()
+        for obj in written:
+            obj.change_seq = seq
+
+@event.listens_for(db.session, 'after_flush')
+def record_change_tombstones(session, flush_context):
+    """Add a change_tombstone row for every attendance and excuse request row this flush deleted"""
+    tombstones = [{'teacher_id': obj.teacher_id, 'table_name': CHANGE_TRACKED_MODELS[type(obj)], 'row_id': obj.id}
+                  for obj in session.deleted if type(obj) in CHANGE_TRACKED_MODELS]
+    if tombstones:
+        seq = current_change_seq()
+        session.connection().execute(ChangeTombstone.__table__.insert(),
+                                     [dict(tombstone, change_seq=seq) for tombstone in tombstones])
+
+class Blob(db.Model):
+    """One stored upload, see blob_storage.BlobStore"""
+    key = db.Column(db.String(100), primary_key=True)  # <digest[:2]>/<sha256 digest>.<ext>
+    size = db.Column(db.Integer, nullable=False)
+    content_type = db.Column(db.String(100), nullable=True)
+    uploaded_at = db.Column(db.DateTime, default=datetime.now, nullable=False)  # Bumped when identical content is uploaded again
+
+class BlobReference(db.Model):
+    """
+    A row that points at a blob. Kept in step with the columns in
+    BLOB_REFERENCE_COLUMNS by sync_blob_references; blobs with no
+    references are removed by the gc-uploads command.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    blob_key = db.Column(db.String(100), db.ForeignKey('blob.key'), nullable=False, index=True)
+    owner_type = db.Column(db.String(30), nullable=False)  # student_photo/excuse_letter
+    owner_id = db.Column(db.Integer, nullable=False)
+    
+    __table_args__ = (
+        db.UniqueConstraint('owner_type', 'owner_id', name='uq_blob_reference_owner'),
+    )
+
+# Columns holding blob keys: model -> (owner_type, attribute)
+BLOB_REFERENCE_COLUMNS = {
+    Student: ('student_photo', 'photo_path'),
+    ExcuseRequest: ('excuse_letter', 'excuse_letter_path'),
+}
+
+@event.listens_for(db.session, 'after_flush')
+def sync_blob_references(session, flush_context):
+    """Point blob_reference rows at whatever the flushed students and excuse requests now hold"""
+    changes = []
+    for obj in session.new | session.dirty | session.deleted:
+        if type(obj) not in BLOB_REFERENCE_COLUMNS:
+            continue
+        owner_type, attribute = BLOB_REFERENCE_COLUMNS[type(obj)]
+        if obj in session.deleted:
+            changes.append((owner_type, obj.id, None))
+        elif obj in session.new or db.inspect(obj).attrs[attribute].history.has_changes():
+            changes.append((owner_type, obj.id, getattr(obj, attribute)))
+    
+    reference_table = BlobReference.__table__
+    connection = session.connection()
+    for owner_type, owner_id, location in changes:
+        connection.execute(reference_table.delete().where(
+            reference_table.c.owner_type == owner_type, reference_table.c.owner_id == owner_id))
+        if is_blob_key(location):
+            connection.execute(reference_table.insert().values(
+                blob_key=location, owner_type=owner_type, owner_id=owner_id))
+
+class DailyClassStats(db.Model):
+    """
+    Per-class, per-day attendance rollup.
+    
+    Rows are recomputed by refresh_attendance_rollups() on every write path and
+    can be rebuilt from scratch with `flask rebuild-daily-stats`. Dashboard
+    reads come from here instead of re-aggregating raw Attendance rows.
+    """
+    __tablename__ = 'daily_class_stats'
+    class_id = db.Column(db.Integer, db.ForeignKey('class.id', ondelete='CASCADE'), primary_key=True)
+    date = db.Column(db.Date, primary_key=True)
+    present_count = db.Column(db.Integer, default=0, nullable=False)
+    late_count = db.Column(db.Integer, default=0, nullable=False)
+    absent_count = db.Column(db.Integer, default=0, nullable=False)
+    excused_count = db.Column(db.Integer, default=0, nullable=False)
+    total_count = db.Column(db.Integer, default=0, nullable=False)  # All attendance rows, any status
+    late_minutes_total = db.Column(db.Integer, default=0, nullable=False)
+    pending_excused_count = db.Column(db.Integer, default=0, nullable=False)  # Excused rows awaiting review
+    approved_without_record_count = db.Column(db.Integer, default=0, nullable=False)  # Approved excuses with no attendance row
+
+# Rolling counter window: days window_end - COUNTER_WINDOW_DAYS .. window_end, one ring slot per day
+COUNTER_WINDOW_DAYS = 60
+COUNTER_SLOTS = COUNTER_WINDOW_DAYS + 1
+COUNTER_STATUS_CHARS = {'Present': 'P', 'Late': 'L', 'Absent': 'A', 'Excused': 'E'}
+COUNTER_CHAR_STATUSES = {char: status for status, char in COUNTER_STATUS_CHARS.items()}
+COUNTER_CHAR_FIELDS = {'P': 'present_count', 'L': 'late_count', 'A': 'absent_count', 'E': 'excused_count'}
+COUNTER_EMPTY = '.'
+COUNTER_OTHER = '?'  # Any other status: counted in total_count only
+
+class StudentAttendanceCounter(db.Model):
+    """
+    Rolling attendance counters for one student in one class.
+    
+    day_statuses is a ring buffer with one character per day of the window
+    (slot = date ordinal % COUNTER_SLOTS), and the *_count columns are kept in
+    step with it, so attendance rate, absences, lates and the recent pattern
+    are read in constant time. Writes set single day slots; the window is
+    rolled forward daily by roll_attendance_counters().
+    """
+    __tablename__ = 'student_attendance_counter'
+    student_id = db.Column(db.Integer, db.ForeignKey('student.id', ondelete='CASCADE'), primary_key=True)
+    class_id = db.Column(db.Integer, db.ForeignKey('class.id', ondelete='CASCADE'), primary_key=True, index=True)
+    window_end = db.Column(db.Date, nullable=False, index=True)
+    day_statuses = db.Column(db.String(COUNTER_SLOTS), nullable=False, default=COUNTER_EMPTY * COUNTER_SLOTS)
+    present_count = db.Column(db.Integer, default=0, nullable=False)
+    late_count = db.Column(db.Integer, default=0, nullable=False)
+    absent_count = db.Column(db.Integer, default=0, nullable=False)
+    excused_count = db.Column(db.Integer, default=0, nullable=False)
+    total_count = db.Column(db.Integer, default=0, nullable=False)
+    
+    @classmethod
+    def empty(cls, student_id, class_id, window_end):
+        return cls(student_id=student_id, class_id=class_id, window_end=window_end,
+                   day_statuses=COUNTER_EMPTY * COUNTER_SLOTS, present_count=0, late_count=0,
+                   absent_count=0, excused_count=0, total_count=0)
+    
+    def _put(self, slot, char):
+        old = self.day_statuses[slot]
+        if old == char:
+            return
+        if old != COUNTER_EMPTY:
+            self.total_count -= 1
+            if old in COUNTER_CHAR_FIELDS:
+                setattr(self, COUNTER_CHAR_FIELDS[old], getattr(self, COUNTER_CHAR_FIELDS[old]) - 1)
+        if char != COUNTER_EMPTY:
+            self.total_count += 1
+            if char in COUNTER_CHAR_FIELDS:
+                setattr(self, COUNTER_CHAR_FIELDS[char], getattr(self, COUNTER_CHAR_FIELDS[char]) + 1)
+        self.day_statuses = self.day_statuses[:slot] + char + self.day_statuses[slot + 1:]
+    
+    def covers(self, day):
+        """Whether a date falls inside the current window"""
+        return 0 <= (self.window_end - day).days <= COUNTER_WINDOW_DAYS
+    
+    def set_day(self, day, status):
+        """Record the status for a date in the window (None clears it); other dates are ignored"""
+        if self.covers(day):
+            char = COUNTER_STATUS_CHARS.get(status, COUNTER_OTHER) if status else COUNTER_EMPTY
+            self._put(day.toordinal() % COUNTER_SLOTS, char)
+    
+    def roll_to(self, window_end):
+        """
+        Move the window forward, clearing the slots of days that drop out.
+        Costs at most COUNTER_SLOTS steps however far the window moves.
+        """
+        current, target = self.window_end.toordinal(), window_end.toordinal()
+        if target <= current:
+            return
+        # Each day entering the window reuses the slot of the day leaving it
+        for ordinal in range(max(current + 1, target - COUNTER_SLOTS + 1), target + 1):
+            self._put(ordinal % COUNTER_SLOTS, COUNTER_EMPTY)
+        self.window_end = window_end
+    
+    def recent_days(self, days):
+        """(date ordinal, status) for the last `days` days of the window, oldest first"""
+        end = self.window_end.toordinal()
+        pattern = []
+        for ordinal in range(end - days + 1, end + 1):
+            char = self.day_statuses[ordinal % COUNTER_SLOTS]
+            if char != COUNTER_EMPTY:
+                pattern.append((ordinal, COUNTER_CHAR_STATUSES.get(char, 'Other')))
+        return pattern
+
+# Student lookup cache for the QR scan path
+StudentEntry = namedtuple('StudentEntry', ['id', 'name', 'student_number', 'photo_path'])
+
+class StudentRegistry:
+    """
+    Process-local cache of students keyed by student_number.
+    
+    Scans resolve students with a dict lookup instead of a database query.
+    The cache is loaded at startup and reloaded on the next lookup after
+    invalidate() is called by any route that changes students. Numbers not in
+    the cache fall back to the database, so students added by another process
+    are still found.
+    """
+    
+    def __init__(self):
+        self._by_number = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def load(self):
+        """Load every student from the database (requires an app context)"""
+        rows = db.session.query(Student.id, Student.name, Student.student_number, Student.photo_path).all()
+        with self._lock:
+            self._by_number = {row.student_number: StudentEntry(*row) for row in rows}
+            self._loaded = True
+    
+    def invalidate(self):
+        """Mark the cache stale after students are added, edited or deleted"""
+        with self._lock:
+            self._loaded = False
+    
+    def get(self, student_number):
+        """Return the StudentEntry for a student number, or None"""
+        return self.get_many([student_number]).get(student_number)
+    
+    def get_many(self, student_numbers):
+        """
+        Resolve several student numbers at once.
+        
+        Returns:
+            dict: {student_number: StudentEntry} for the numbers that exist
+        """
+        if not self._loaded:
+            self.load()
+        
+        found = {}
+        missing = []
+        for number in student_numbers:
+            entry = self._by_number.get(number)
+            if entry:
+                self.hits += 1
+                found[number] = entry
+            else:
+                self.misses += 1
+                missing.append(number)
+        
+        # Fall back to the database for numbers the cache doesn't know yet
+        for chunk in chunked(missing):
+            rows = db.session.query(
+                Student.id, Student.name, Student.student_number, Student.photo_path
+            ).filter(Student.student_number.in_(chunk)).all()
+            for row in rows:
+                entry = StudentEntry(*row)
+                self._by_number[row.student_number] = entry
+                found[row.student_number] = entry
+        return found
+    
+    def stats(self):
+        """Cache size and hit/miss counters"""
+        return {'size': len(self._by_number), 'hits': self.hits, 'misses': self.misses}
+
+student_registry = StudentRegistry()
+
 # Helper functions
 def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 def auto_expire_pending_excuses():
-    """Automatically mark pending excuse requests as absent after 7 days"""
-    from datetime import timedelta
+    """
+    Automatically mark pending excuse requests as absent after 7 days.
     
+    Expired requests are processed in batches; each batch is one bulk UPDATE of
+    the excuse requests plus one bulk update/insert of the linked attendance records.
+    """
     # Calculate the cutoff date (7 days ago)
     cutoff_date = datetime.now() - timedelta(days=7)
     
-    # Find all pending excuse requests older than 7 days
-    expired_requests = ExcuseRequest.query.filter(
-        ExcuseRequest.status == 'Pending',
-        ExcuseRequest.submitted_at < cutoff_date
-    ).all()
-    
     expired_count = 0
-    for request in expired_requests:
+    while True:
+        # Next batch of pending excuse requests older than 7 days
+        batch = db.session.query(
+            ExcuseRequest.id,
+            ExcuseRequest.student_id,
+            ExcuseRequest.class_id,
+            ExcuseRequest.teacher_id,
+            ExcuseRequest.absence_date,
+            ExcuseRequest.reason
+        ).filter(
+            ExcuseRequest.status == 'Pending',
+            ExcuseRequest.submitted_at < cutoff_date
+        ).order_by(ExcuseRequest.id).limit(EXCUSE_EXPIRY_BATCH_SIZE).all()
+        
+        if not batch:
+            break
+        
         # Update excuse request status to expired/disapproved
-        request.status = 'Disapproved'
-        request.reviewed_at = datetime.now()
-        request.teacher_notes = 'Automatically disapproved - no response within 7 days'
+        now = datetime.now()
+        db.session.query(ExcuseRequest).filter(
+            ExcuseRequest.id.in_([r.id for r in batch])
+        ).update({
+            ExcuseRequest.status: 'Disapproved',
+            ExcuseRequest.reviewed_at: now,
+            ExcuseRequest.teacher_notes: 'Automatically disapproved - no response within 7 days',
+            ExcuseRequest.change_seq: current_change_seq()
+        }, synchronize_session=False)
         
-        # Update corresponding attendance record to Absent
-        attendance = Attendance.query.filter_by(
-            student_id=request.student_id,
-            class_id=request.class_id,
-            date=request.absence_date
-        ).first()
+        # Find which requests already have an attendance record
+        existing_keys = set(db.session.query(
+            Attendance.student_id, Attendance.class_id, Attendance.date
+        ).filter(
+            Attendance.student_id.in_({r.student_id for r in batch}),
+            Attendance.class_id.in_({r.class_id for r in batch}),
+            Attendance.date.in_({r.absence_date for r in batch})
+        ).all())
         
-        if attendance:
-            attendance.status = 'Absent'
-            attendance.notes = f"Excuse expired after 7 days: {request.reason}"
-        else:
-            # Create new absent attendance record if none exists
-            attendance = Attendance(
-                student_id=request.student_id,
-                class_id=request.class_id,
-                teacher_id=request.teacher_id,
-                date=request.absence_date,
-                scan_time=datetime.now().time(),
-                status='Absent',
-                excuse_request_id=request.id,
-                notes=f"Excuse expired after 7 days: {request.reason}"
-            )
-            db.session.add(attendance)
+        updates = []
+        inserts = []
+        for r in batch:
+            key = (r.student_id, r.class_id, r.absence_date)
+            notes = f"Excuse expired after 7 days: {r.reason}"
+            if key in existing_keys:
+                # Update corresponding attendance record to Absent
+                updates.append({'key_student_id': r.student_id, 'key_class_id': r.class_id,
+                                'key_date': r.absence_date, 'new_notes': notes})
+            else:
+                # Create new absent attendance record if none exists
+                inserts.append({
+                    'student_id': r.student_id,
+                    'class_id': r.class_id,
+                    'teacher_id': r.teacher_id,
+                    'date': r.absence_date,
+                    'scan_time': now.time(),
+                    'status': 'Absent',
+                    'late_arrival': False,
+                    'late_minutes': 0,
+                    'excuse_request_id': r.id,
+                    'notes': notes,
+                    'change_seq': current_change_seq()
+                })
+                existing_keys.add(key)
         
-        expired_count += 1
+        attendance_table = Attendance.__table__
+        if inserts:
+            db.session.execute(attendance_table.insert(), inserts)
+        if updates:
+            db.session.execute(
+                attendance_table.update().where(and_(
+                    attendance_table.c.student_id == bindparam('key_student_id'),
+                    attendance_table.c.class_id == bindparam('key_class_id'),
+                    attendance_table.c.date == bindparam('key_date')
+                )).values(status='Absent', notes=bindparam('new_notes'), change_seq=current_change_seq()),
+                updates
+            )
+        refresh_attendance_rollups((r.class_id, r.absence_date) for r in batch)
+        db.session.commit()
+        expired_count += len(batch)
     
     if expired_count > 0:
-        db.session.commit()
         print(f"Auto-expired {expired_count} pending excuse requests older than 7 days")
     
     return expired_count
 
-def save_photo(photo, student_number):
+def run_excuse_expiry_job():
+    """Scheduler entry point for excuse expiry"""
+    with app.app_context():
+        auto_expire_pending_excuses()
+
+def create_blob_store():
+    """BlobStore for the backend named by UPLOAD_STORAGE"""
+    if app.config['UPLOAD_STORAGE'] == 's3':
+        return BlobStore(S3BlobBackend(app.config['S3_BUCKET'], endpoint_url=app.config['S3_ENDPOINT_URL'],
+                                       public_url=app.config['S3_PUBLIC_URL']))
+    return BlobStore(LocalBlobBackend(app.config['UPLOAD_STORAGE_ROOT']))
+
+blob_store = create_blob_store()
+
+def store_upload(file):
+    """
+    Save an uploaded file in the blob store and record it.
+    
+    Args:
+        file (FileStorage): Upload with an allowed extension
+    
+    Returns:
+        tuple: (blob key, True if the content was new to the store)
+    """
+    extension = file.filename.rsplit('.', 1)[1].lower()
+    key, size, created = blob_store.save(file.stream, extension, file.mimetype)
+    record_blob(key, size, file.mimetype)
+    return key, created
+
+def record_blob(key, size, content_type):
+    """
+    Add the blob row for a stored key, or mark an existing one as just uploaded again.
+    
+    One upsert in the caller's transaction, so it still works if gc-uploads
+    deleted the row since it was read, and the row is committed together with
+    the reference to it. The bumped uploaded_at keeps gc-uploads away meanwhile.
+    """
+    now = datetime.now()
+    db.session.execute(
+        sqlite_insert(Blob.__table__)
+        .values(key=key, size=size, content_type=content_type, uploaded_at=now)
+        .on_conflict_do_update(index_elements=['key'], set_={'uploaded_at': now})
+    )
+
+def store_photo_variants(key, overwrite=True):
+    """
+    Make the resized thumbnails of a photo blob.
+    
+    Returns:
+        int: Number of variants written
+    
+    Raises:
+        OSError: If the blob can't be read as an image
+    """
+    sizes = [size for size in PHOTO_VARIANT_SIZES if overwrite or not blob_store.exists(variant_path(key, size))]
+    if not sizes:
+        return 0
+    with blob_store.open(key) as source:
+        variants = render_photo_variants(source, sizes)
+    for size, data in variants.items():
+        blob_store.put_derived(variant_path(key, size), data, PHOTO_VARIANT_MIMETYPE)
+    return len(variants)
+
+def save_photo(photo):
+    """
+    Store an uploaded student photo and its thumbnails.
+    
+    Returns:
+        str: Blob key for Student.photo_path, or None if the file isn't an image
+    """
     if photo and allowed_file(photo.filename):
-        filename = secure_filename(f"{student_number}.{photo.filename.rsplit('.', 1)[1].lower()}")
-        os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-        photo_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        photo.save(photo_path)
-        return f'static/photos/{filename}'
+        key, created = store_upload(photo)
+        try:
+            # Known content only gets the variants it lacks, which also rejects a
+            # non-image that was stored before and never got any
+            store_photo_variants(key, overwrite=created)
+        except (OSError, ValueError):
+            # Not an image after all; the blob is left for gc-uploads
+            return None
+        return key
     return None
 
-def save_excuse_letter(file, student_id, class_id, date_str):
-    """Save uploaded excuse letter file"""
+def upload_url(location):
+    """URL of a stored upload: a blob key, or a static/ path from before blob storage"""
+    if not location:
+        return None
+    return blob_store.url(location) if is_blob_key(location) else '/' + location
+
+def photo_url(photo_path, size=None):
+    """
+    URL of a student photo, preferring the resized variant for the display size.
+    
+    Args:
+        photo_path (str): Student.photo_path, may be None
+        size (int): One of PHOTO_VARIANT_SIZES, or None for the original upload
+    
+    Returns:
+        str: URL path, or None if the student has no photo
+    """
+    if not photo_path or not size:
+        return upload_url(photo_path)
+    if is_blob_key(photo_path):
+        # Photo blobs get their variants when stored
+        return blob_store.url(variant_path(photo_path, size))
+    return '/' + existing_variant(photo_path, size)
+
+def photo_file(photo_path, size):
+    """Local file to draw a photo from, or None when it isn't on this machine"""
+    if not photo_path:
+        return None
+    if is_blob_key(photo_path):
+        return blob_store.local_path(variant_path(photo_path, size))
+    return existing_variant(photo_path, size)
+
+def save_excuse_letter(file):
+    """
+    Store an uploaded excuse letter.
+    
+    Returns:
+        str: Blob key for ExcuseRequest.excuse_letter_path, or None for a disallowed file type
+    """
     if file and allowed_file(file.filename):
-        # Create filename with student_id, class_id, and date for uniqueness
-        file_ext = file.filename.rsplit('.', 1)[1].lower()
-        filename = secure_filename(f"excuse_{student_id}_{class_id}_{date_str}.{file_ext}")
-        
-        # Create excuse_letters directory
-        excuse_folder = os.path.join('static', 'excuse_letters')
-        os.makedirs(excuse_folder, exist_ok=True)
-        
-        file_path = os.path.join(excuse_folder, filename)
-        file.save(file_path)
-        return f'static/excuse_letters/{filename}'
+        key, _ = store_upload(file)
+        return key
     return None
 
 def calculate_late_arrival(arrival_time, class_start_time):
@@ -286,78 +832,840 @@ def is_class_in_session(current_time, class_start_time, class_end_time):
         class_end_time (time): Class end time
     
     Returns:
-        bool: True if class is in session, False otherwise
+        bool: True if class is in session, False otherwise
+    """
+    return class_start_time <= current_time <= class_end_time
+
+def auto_mark_absent_students(class_id, attendance_date=None):
+    """
+    Automatically mark students as absent for a class that has ended.
+    
+    Args:
+        class_id (int): ID of the class
+        attendance_date (date): Date to mark attendance for (defaults to today)
+    
+    Returns:
+        int: Number of students marked as absent
+    """
+    # Use today's date if none provided
+    if attendance_date is None:
+        attendance_date = date.today()
+    
+    return bulk_mark_absent_students([class_id], [attendance_date])
+
+def bulk_mark_absent_students(class_ids, attendance_dates, only_ended=True):
+    """
+    Mark every student without an attendance record as absent for several
+    classes and dates in one transaction.
+    
+    Each date is handled by a single INSERT ... SELECT ... WHERE NOT EXISTS over
+    students x classes, so no Student or Attendance objects are loaded.
+    
+    Args:
+        class_ids (list): IDs of the classes to close out
+        attendance_dates (list): Dates to mark attendance for
+        only_ended (bool): Skip classes whose end time hasn't passed yet
+    
+    Returns:
+        int: Number of students marked as absent
+    """
+    classes = db.session.query(Class.id, Class.end_time).filter(Class.id.in_(list(class_ids))).all() if class_ids else []
+    
+    # Only classes that have ended can be closed out
+    if only_ended:
+        current_time = datetime.now().time()
+        classes = [c for c in classes if c.end_time and current_time >= c.end_time]
+    if not classes:
+        return 0
+    eligible_ids = [c.id for c in classes]
+    
+    columns = ['student_id', 'class_id', 'teacher_id', 'date', 'scan_time',
+               'status', 'late_arrival', 'late_minutes', 'notes', 'change_seq']
+    absent_count = 0
+    for attendance_date in set(attendance_dates):
+        date_value = literal(attendance_date, db.Date)
+        has_record = exists().where(and_(
+            Attendance.student_id == Student.id,
+            Attendance.class_id == Class.id,
+            Attendance.date == date_value
+        ))
+        missing_students = select(
+            Student.id,
+            Class.id,
+            Class.teacher_id,
+            date_value,
+            Class.end_time,  # Use class end time as scan time
+            literal('Absent'),
+            literal(False),
+            literal(0),
+            literal('Auto-marked absent - did not attend class'),
+            literal(current_change_seq())
+        ).select_from(Student).join(
+            Class, Class.id.in_(eligible_ids)  # every student x every eligible class
+        ).where(~has_record)
+        result = db.session.execute(
+            Attendance.__table__.insert().from_select(columns, missing_students)
+        )
+        absent_count += result.rowcount
+    
+    refresh_attendance_rollups(
+        (class_id, attendance_date) for class_id in eligible_ids for attendance_date in set(attendance_dates)
+    )
+    # Commit all changes at once
+    db.session.commit()
+    return absent_count
+
+def close_classes_job(end_time):
+    """
+    Scheduler entry point - mark absentees for classes that just ended, then queue tomorrow's run.
+    
+    Classes are looked up when the job runs, so classes added, moved or
+    deleted since it was queued (by this or another process) are picked up.
+    Class has no meeting days, so only classes with at least one scan today
+    are taken to have met; the others are left alone on weekends and holidays.
+    """
+    still_used = True  # a failed run is retried tomorrow rather than turning auto-close off
+    try:
+        with app.app_context():
+            try:
+                today = date.today()
+                scanned_today = exists().where(and_(
+                    Attendance.class_id == Class.id,
+                    Attendance.date == today,
+                    Attendance.status.in_(['Present', 'Late'])
+                ))
+                class_ids = [class_id for (class_id,) in
+                             db.session.query(Class.id).filter(Class.end_time == end_time, scanned_today)]
+                absent_count = bulk_mark_absent_students(class_ids, [today])
+                if absent_count > 0:
+                    print(f"Auto-closed {len(class_ids)} class(es) ending at {end_time.strftime('%H:%M')}: {absent_count} marked absent")
+                still_used = db.session.query(exists().where(Class.end_time == end_time)).scalar()
+            except Exception:
+                db.session.rollback()
+                raise
+    finally:
+        if still_used:
+            schedule_class_close(end_time)
+
+def schedule_class_close(end_time):
+    """Queue the absence sweep for classes ending at end_time at its next occurrence"""
+    now = datetime.now()
+    next_end = datetime.combine(now.date(), end_time)
+    if next_end <= now:
+        next_end += timedelta(days=1)
+    scheduler.add_job(
+        f"close_classes_{end_time.strftime('%H%M%S')}",
+        lambda: close_classes_job(end_time),
+        run_at=next_end.timestamp()
+    )
+
+def schedule_class_closings():
+    """
+    Rebuild the timeline of class end events from the Class table.
+    
+    Classes that end at the same time share one job, so each end time costs a
+    single bulk sweep. Call after classes are added, edited or deleted; it only
+    does anything in the process running the scheduler, which also calls it
+    every CLASS_CLOSE_SYNC_INTERVAL to pick up edits made by web processes.
+    """
+    if not app.config['AUTO_CLOSE_CLASSES'] or not scheduler.is_running():
+        return
+    
+    end_times = {end_time for (end_time,) in db.session.query(Class.end_time).distinct() if end_time}
+    
+    # Drop end events that no longer belong to any class
+    wanted = {f"close_classes_{end_time.strftime('%H%M%S')}" for end_time in end_times}
+    for name in scheduler.jobs():
+        if name.startswith('close_classes_') and name not in wanted:
+            scheduler.cancel(name)
+    
+    for end_time in end_times:
+        schedule_class_close(end_time)
+
+def apply_scan(existing_record, class_, student_id, attendance_date, arrival_time, teacher_id):
+    """
+    Apply a QR scan to an existing attendance record, or build a new one.
+    
+    New records are returned unsaved - callers add them to the session and
+    decide the transaction boundary.
+    
+    Args:
+        existing_record (Attendance): Record for this student/class/date, or None
+        class_ (Class): Class being scanned into
+        student_id (int): ID of the scanned student
+        attendance_date (date): Attendance date
+        arrival_time (time): Time the student arrived
+        teacher_id (int): Teacher recording the attendance
+    
+    Returns:
+        tuple: (result: str, record: Attendance) where result is
+               'created', 'updated' or 'already_marked'
+    """
+    # Calculate late arrival status using class-specific start time
+    is_late, minutes_late = calculate_late_arrival(arrival_time, class_.start_time)
+    status = 'Late' if is_late else 'Present'
+    
+    if existing_record:
+        if existing_record.status in ['Present', 'Late']:
+            return 'already_marked', existing_record
+        
+        # Update existing record
+        existing_record.status = status
+        existing_record.scan_time = datetime.now().time()
+        existing_record.arrival_time = arrival_time
+        existing_record.late_arrival = is_late
+        existing_record.late_minutes = minutes_late
+        return 'updated', existing_record
+    
+    # Create new attendance record
+    attendance = Attendance(
+        student_id=student_id, 
+        class_id=class_.id, 
+        teacher_id=teacher_id, 
+        date=attendance_date, 
+        scan_time=datetime.now().time(),
+        arrival_time=arrival_time,
+        status=status,
+        late_arrival=is_late,
+        late_minutes=minutes_late
+    )
+    return 'created', attendance
+
+def record_qr_scan(class_, student, attendance_date, arrival_time, teacher_id):
+    """
+    Mark a scanned student as Present or Late for a class and date.
+    
+    Returns:
+        tuple: (result: str, record: Attendance) - see apply_scan()
+    """
+    # Check if student already has an attendance record for this date/class
+    existing_record = Attendance.query.filter_by(
+        student_id=student.id, 
+        class_id=class_.id, 
+        date=attendance_date
+    ).first()
+    
+    result, record = apply_scan(existing_record, class_, student.id, attendance_date, arrival_time, teacher_id)
+    if result == 'created':
+        db.session.add(record)
+    if result != 'already_marked':
+        refresh_attendance_rollups([(class_.id, attendance_date)])
+        db.session.commit()
+    return result, record
+
+def parse_scan_time(value):
+    """Parse an HH:MM or HH:MM:SS arrival time sent by a scanner"""
+    for fmt in ('%H:%M', '%H:%M:%S'):
+        try:
+            return datetime.strptime(value, fmt).time()
+        except ValueError:
+            continue
+    raise ValueError(f'Invalid time: {value}')
+
+def chunked(items, size=900):
+    """Split a list into chunks that stay under SQLite's bound-parameter limit"""
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def iter_csv(header, rows, flush_size=64 * 1024):
+    """
+    Yield CSV text in ~flush_size pieces as rows are produced, so an export
+    never holds the whole file (or every record) in memory.
+    
+    Args:
+        header (list): Column names for the first line
+        rows (iterable): Lists of cell values, typically read lazily with yield_per
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= flush_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+    yield buffer.getvalue()
+
+def encode_page_token(record_date, record_id):
+    """Opaque keyset pagination token for a (date, id) position"""
+    raw = f'{record_date.isoformat()}|{record_id}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_page_token(token):
+    """
+    Decode a token from encode_page_token().
+    
+    Returns:
+        tuple: (date, id), or None if the token is missing or invalid
+    """
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        date_str, record_id = raw.split('|')
+        return datetime.strptime(date_str, '%Y-%m-%d').date(), int(record_id)
+    except ValueError:
+        return None
+
+def encode_student_cursor(name_lower, student_id):
+    """Opaque keyset cursor for a (name_lower, id) position in the student list"""
+    raw = json.dumps([name_lower, student_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_student_cursor(token):
+    """
+    Decode a cursor from encode_student_cursor().
+    
+    Returns:
+        tuple: (name_lower, id), or None if the cursor is missing or invalid
+    """
+    if not token:
+        return None
+    try:
+        name_lower, student_id = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        return str(name_lower), int(student_id)
+    except (ValueError, TypeError):
+        return None
+
+def filter_students_by_search(query, search):
+    """Restrict a student query to a student number prefix (digits) or a name prefix"""
+    search = search.strip()
+    if search.isdigit():
+        return query.filter(Student.student_number >= search, Student.student_number < search + '\uffff')
+    if search:
+        prefix = normalize_student_name(search)
+        return query.filter(Student.name_lower >= prefix, Student.name_lower < prefix + '\uffff')
+    return query
+
+def search_students(search='', cursor=None, limit=STUDENTS_PAGE_SIZE):
+    """
+    One page of students ordered by name, optionally filtered by a search term.
+    
+    Digits match the start of the student number and anything else matches the
+    start of the name. Both are range scans on an index (student_number,
+    name_lower) and pages continue from a (name_lower, id) cursor, so the cost
+    does not grow with the roster size.
+    
+    Args:
+        search (str): Search text, empty for all students
+        cursor (tuple): (name_lower, id) of the last student already shown
+        limit (int): Maximum students to return
+    
+    Returns:
+        tuple: (list of Student, next cursor string or None)
+    """
+    query = filter_students_by_search(Student.query, search)
+    if cursor:
+        query = query.filter(tuple_(Student.name_lower, Student.id) > cursor)
+    
+    students = query.order_by(Student.name_lower, Student.id).limit(limit + 1).all()
+    next_cursor = None
+    if len(students) > limit:
+        students = students[:limit]
+        next_cursor = encode_student_cursor(students[-1].name_lower, students[-1].id)
+    return students, next_cursor
+
+def ingest_scan_batch(scans, teacher_id):
+    """
+    Record a batch of queued QR scans in a single transaction.
+    
+    Args:
+        scans (list): Items of (student_number, class_id, date, arrival_time),
+                      as lists or as dicts with those keys
+        teacher_id (int): Teacher uploading the scans; other teachers' classes are rejected
+    
+    Returns:
+        list: One result dict per scan, in input order
+    """
+    results = [None] * len(scans)
+    parsed = []
+    
+    for index, item in enumerate(scans):
+        if isinstance(item, dict):
+            student_number = item.get('student_number')
+            class_id = item.get('class_id')
+            date_str = item.get('date')
+            time_str = item.get('arrival_time')
+        elif isinstance(item, (list, tuple)) and len(item) == 4:
+            student_number, class_id, date_str, time_str = item
+        else:
+            results[index] = {'index': index, 'result': 'error', 'message': 'Invalid scan format.'}
+            continue
+        
+        try:
+            attendance_date = datetime.strptime(date_str, '%Y-%m-%d').date() if date_str else date.today()
+        except (TypeError, ValueError):
+            results[index] = {'index': index, 'result': 'error', 'message': 'Invalid date format.'}
+            continue
+        try:
+            arrival_time = parse_scan_time(time_str) if time_str else datetime.now().time()
+        except (TypeError, ValueError):
+            results[index] = {'index': index, 'result': 'error', 'message': 'Invalid time format.'}
+            continue
+        try:
+            class_id = int(class_id)
+        except (TypeError, ValueError):
+            results[index] = {'index': index, 'result': 'error', 'message': 'Class not found.'}
+            continue
+        
+        parsed.append((index, str(student_number).strip(), class_id, attendance_date, arrival_time))
+    
+    # Resolve every student and class referenced by the batch up front
+    student_numbers = list({p[1] for p in parsed})
+    class_ids = list({p[2] for p in parsed})
+    students = student_registry.get_many(student_numbers)
+    classes = {c.id: c for c in Class.query.filter(Class.id.in_(class_ids), Class.teacher_id == teacher_id).all()} if class_ids else {}
+    
+    # Load existing records for the affected student/class/date combinations
+    student_ids = list({s.id for s in students.values()})
+    dates = list({p[3] for p in parsed})
+    existing = {}
+    if student_ids and classes:
+        for chunk in chunked(student_ids):
+            for record in Attendance.query.filter(
+                Attendance.student_id.in_(chunk),
+                Attendance.class_id.in_(list(classes)),
+                Attendance.date.in_(dates)
+            ).all():
+                existing[(record.student_id, record.class_id, record.date)] = record
+    
+    new_records = []
+    touched_days = set()
+    for index, student_number, class_id, attendance_date, arrival_time in parsed:
+        student = students.get(student_number)
+        class_ = classes.get(class_id)
+        if not student:
+            results[index] = {'index': index, 'result': 'error', 'message': 'Student not found.'}
+            continue
+        if not class_:
+            results[index] = {'index': index, 'result': 'error', 'message': 'Class not found.'}
+            continue
+        
+        key = (student.id, class_id, attendance_date)
+        result, record = apply_scan(existing.get(key), class_, student.id, attendance_date, arrival_time, teacher_id)
+        if result == 'created':
+            new_records.append(record)
+        if result != 'already_marked':
+            touched_days.add((class_id, attendance_date))
+        # Later scans in the same batch see this record
+        existing[key] = record
+        results[index] = {
+            'index': index,
+            'result': result,
+            'student_number': student_number,
+            'student_name': student.name,
+            'class_id': class_id,
+            'date': attendance_date.strftime('%Y-%m-%d'),
+            'status': record.status,
+            'late_minutes': record.late_minutes
+        }
+    
+    # New rows go in as one executemany insert rather than one INSERT per object
+    if new_records:
+        columns = [c.key for c in Attendance.__table__.columns if c.key not in ('id', 'change_seq')]
+        seq = current_change_seq()
+        db.session.execute(
+            Attendance.__table__.insert(),
+            [dict({column: getattr(record, column) for column in columns}, change_seq=seq) for record in new_records]
+        )
+    refresh_attendance_rollups(touched_days)
+    db.session.commit()
+    return results
+
+def scan_result_message(result, student, record):
+    """Build the (message, category) shown after a QR scan"""
+    if result == 'already_marked':
+        return f'{student.name} is already marked {record.status.lower()}.', 'info'
+    if record.late_arrival:
+        return f'{student.name} marked as Late (arrived {record.late_minutes} minutes late).', 'warning'
+    if result == 'updated':
+        return f'{student.name} status updated to Present.', 'success'
+    return f'{student.name} marked present.', 'success'
+
+# Dashboard aggregation helpers
+def _empty_status_counts():
+    return {'Present': 0, 'Late': 0, 'Absent': 0, 'Excused': 0,
+            'pending_excused': 0, 'approved_without_record': 0, 'total': 0}
+
+def _aggregate_daily_class_stats(attendance_filters=(), excuse_filters=()):
+    """
+    Aggregate raw Attendance and ExcuseRequest rows into daily_class_stats rows.
+    
+    Returns:
+        dict: {(class_id, date): column values for DailyClassStats}
+    """
+    rows = db.session.query(
+        Attendance.class_id,
+        Attendance.date,
+        func.sum(case((Attendance.status == 'Present', 1), else_=0)),
+        func.sum(case((Attendance.status == 'Late', 1), else_=0)),
+        func.sum(case((Attendance.status == 'Absent', 1), else_=0)),
+        func.sum(case((Attendance.status == 'Excused', 1), else_=0)),
+        func.count(Attendance.id),
+        func.sum(case((Attendance.status == 'Late', Attendance.late_minutes), else_=0)),
+        func.sum(case((and_(Attendance.status == 'Excused', ExcuseRequest.status == 'Pending'), 1), else_=0))
+    ).outerjoin(
+        ExcuseRequest, Attendance.excuse_request_id == ExcuseRequest.id
+    ).filter(*attendance_filters).group_by(Attendance.class_id, Attendance.date).all()
+    
+    stats = {}
+    for class_id, day, present, late, absent, excused, total, late_minutes, pending in rows:
+        stats[(class_id, day)] = {
+            'class_id': class_id, 'date': day,
+            'present_count': present, 'late_count': late, 'absent_count': absent,
+            'excused_count': excused, 'total_count': total,
+            'late_minutes_total': late_minutes or 0, 'pending_excused_count': pending or 0,
+            'approved_without_record_count': 0
+        }
+    
+    # Approved excuse requests that have no matching attendance record (anti-join)
+    has_record = exists().where(and_(
+        Attendance.student_id == ExcuseRequest.student_id,
+        Attendance.class_id == ExcuseRequest.class_id,
+        Attendance.date == ExcuseRequest.absence_date
+    ))
+    approved = db.session.query(
+        ExcuseRequest.class_id,
+        ExcuseRequest.absence_date,
+        func.count(ExcuseRequest.id)
+    ).filter(
+        ExcuseRequest.status == 'Approved',
+        ~has_record,
+        *excuse_filters
+    ).group_by(ExcuseRequest.class_id, ExcuseRequest.absence_date).all()
+    
+    for class_id, day, count in approved:
+        row = stats.get((class_id, day))
+        if row is None:
+            row = stats[(class_id, day)] = {
+                'class_id': class_id, 'date': day,
+                'present_count': 0, 'late_count': 0, 'absent_count': 0, 'excused_count': 0,
+                'total_count': 0, 'late_minutes_total': 0, 'pending_excused_count': 0
+            }
+        row['approved_without_record_count'] = count
+    return stats
+
+def refresh_daily_class_stats(keys):
+    """
+    Recompute the daily_class_stats rows for the given (class_id, date) keys.
+    
+    Called through refresh_attendance_rollups() before a write path commits, so
+    the rollup changes in the same transaction as the attendance rows. Only the
+    touched class/day buckets are re-aggregated.
+    
+    Args:
+        keys (iterable): (class_id, date) pairs whose attendance or excuses changed
+    """
+    keys = sorted(set(keys))
+    if not keys:
+        return
+    db.session.flush()
+    if sync_daily_class_stats():
+        return  # just rebuilt from the raw tables, these keys included
+    stats_table = DailyClassStats.__table__
+    for chunk in chunked(keys, 400):
+        stats = _aggregate_daily_class_stats(
+            [tuple_(Attendance.class_id, Attendance.date).in_(chunk)],
+            [tuple_(ExcuseRequest.class_id, ExcuseRequest.absence_date).in_(chunk)]
+        )
+        db.session.execute(stats_table.delete().where(
+            tuple_(stats_table.c.class_id, stats_table.c.date).in_(chunk)
+        ))
+        if stats:
+            db.session.execute(stats_table.insert(), list(stats.values()))
+
+def _write_daily_class_stats():
+    """Replace every daily_class_stats row with a fresh aggregate; the caller commits"""
+    stats_table = DailyClassStats.__table__
+    db.session.execute(stats_table.delete())
+    stats = list(_aggregate_daily_class_stats().values())
+    for chunk in chunked(stats, 5000):
+        db.session.execute(stats_table.insert(), chunk)
+    return len(stats)
+
+def rebuild_daily_class_stats():
+    """
+    Repopulate daily_class_stats from the raw tables.
+    
+    Returns:
+        int: Number of rollup rows written
+    """
+    row_count = _write_daily_class_stats()
+    db.session.commit()
+    return row_count
+
+def sync_daily_class_stats():
+    """
+    Build daily_class_stats on first use. A database whose rollup was never
+    backfilled (tables added with db.create_all() next to existing attendance,
+    or rows loaded outside the app) would otherwise show zero totals.
+    The caller commits.
+    
+    Returns:
+        bool: True if the rollup was rebuilt
+    """
+    if db.session.query(DailyClassStats.class_id).first() is not None:
+        return False
+    if db.session.query(Attendance.id).first() is None and db.session.query(ExcuseRequest.id).first() is None:
+        return False
+    return _write_daily_class_stats() > 0
+
+# Rolling per-student attendance counters
+def rebuild_attendance_counters(window_end=None):
+    """
+    Repopulate student_attendance_counter from the attendance table. The caller commits.
+    
+    Every (student, class) pair with a record in or after the window gets a row,
+    so records dated ahead of time are picked up as the window rolls onto them.
+    
+    Returns:
+        int: Number of counter rows written
+    """
+    window_end = window_end or date.today()
+    counters = {}
+    rows = db.session.query(
+        Attendance.student_id, Attendance.class_id, Attendance.date, Attendance.status
+    ).filter(
+        Attendance.date >= window_end - timedelta(days=COUNTER_WINDOW_DAYS)
+    ).yield_per(5000)
+    for student_id, class_id, day, status in rows:
+        counter = counters.get((student_id, class_id))
+        if counter is None:
+            counter = counters[(student_id, class_id)] = StudentAttendanceCounter.empty(student_id, class_id, window_end)
+        counter.set_day(day, status)
+    
+    counter_table = StudentAttendanceCounter.__table__
+    columns = [c.key for c in counter_table.columns]
+    db.session.execute(counter_table.delete())
+    values = [{column: getattr(counter, column) for column in columns} for counter in counters.values()]
+    for chunk in chunked(values, 5000):
+        db.session.execute(counter_table.insert(), chunk)
+    return len(values)
+
+def roll_attendance_counters(window_end=None):
+    """
+    Move stale counter windows forward to window_end (default today). The caller commits.
+    
+    Returns:
+        int: Number of counter rows rolled
+    """
+    window_end = window_end or date.today()
+    stale = {
+        (counter.student_id, counter.class_id): counter
+        for counter in StudentAttendanceCounter.query.filter(StudentAttendanceCounter.window_end < window_end).all()
+    }
+    if not stale:
+        return 0
+    previous_ends = {key: counter.window_end for key, counter in stale.items()}
+    for counter in stale.values():
+        counter.roll_to(window_end)
+    
+    # Fill in records dated inside the days that just entered each window
+    earliest = max(min(previous_ends.values()), window_end - timedelta(days=COUNTER_SLOTS))
+    entering = db.session.query(
+        Attendance.student_id, Attendance.class_id, Attendance.date, Attendance.status
+    ).filter(Attendance.date > earliest, Attendance.date <= window_end).yield_per(5000)
+    for student_id, class_id, day, status in entering:
+        key = (student_id, class_id)
+        if key in stale and day > previous_ends[key]:
+            stale[key].set_day(day, status)
+    return len(stale)
+
+def sync_attendance_counters():
+    """
+    Make sure the counters exist and cover today: builds them on first use and
+    rolls any window left behind (e.g. if the nightly roll hasn't run yet).
+    The caller commits.
+    
+    Returns:
+        bool: True if anything was written
     """
-    return class_start_time <= current_time <= class_end_time
+    counter_columns = (StudentAttendanceCounter.student_id,)
+    if db.session.query(*counter_columns).first() is None:
+        return rebuild_attendance_counters() > 0
+    if db.session.query(*counter_columns).filter(StudentAttendanceCounter.window_end < date.today()).first() is None:
+        return False
+    return roll_attendance_counters() > 0
 
-def auto_mark_absent_students(class_id, attendance_date=None):
+def refresh_attendance_counters(keys):
     """
-    Automatically mark students as absent for a class that has ended.
-    
-    Args:
-        class_id (int): ID of the class
-        attendance_date (date): Date to mark attendance for (defaults to today)
+    Apply the attendance of the given (class_id, date) keys to the counters.
     
-    Returns:
-        int: Number of students marked as absent
+    Only the counter rows of students with a record on those days are touched;
+    each costs one ring slot update. The caller commits.
     """
-    from datetime import datetime, date
-    
-    # Use today's date if none provided
-    if attendance_date is None:
-        attendance_date = date.today()
+    keys = sorted(set(keys))
+    if not keys:
+        return
+    db.session.flush()
+    sync_attendance_counters()
+    
+    records = []
+    for chunk in chunked(keys, 400):
+        records.extend(db.session.query(
+            Attendance.student_id, Attendance.class_id, Attendance.date, Attendance.status
+        ).filter(tuple_(Attendance.class_id, Attendance.date).in_(chunk)).all())
+    
+    counters = {}
+    pairs = sorted({(r.student_id, r.class_id) for r in records})
+    for chunk in chunked(pairs, 400):
+        for counter in StudentAttendanceCounter.query.filter(
+            tuple_(StudentAttendanceCounter.student_id, StudentAttendanceCounter.class_id).in_(chunk)
+        ).all():
+            counters[(counter.student_id, counter.class_id)] = counter
     
-    # Get the class
-    class_ = Class.query.get(class_id)
-    if not class_:
-        return 0
+    today = date.today()
+    for student_id, class_id, day, status in records:
+        counter = counters.get((student_id, class_id))
+        if counter is None:
+            counter = counters[(student_id, class_id)] = StudentAttendanceCounter.empty(student_id, class_id, today)
+            db.session.add(counter)
+        counter.set_day(day, status)
+
+def refresh_attendance_rollups(keys):
+    """
+    Bring the derived attendance tables up to date for the (class_id, date)
+    keys a write path touched. Call before committing the write.
+    """
+    keys = set(keys)
+    refresh_daily_class_stats(keys)
+    refresh_attendance_counters(keys)
+
+def run_counter_roll_job():
+    """Scheduler entry point - roll the counter windows over to the new day, then queue tomorrow's run"""
+    try:
+        with app.app_context():
+            try:
+                sync_attendance_counters()
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+    finally:
+        schedule_counter_roll()  # even after a failure, or the counters would stop rolling over
+
+def schedule_counter_roll():
+    """Queue the counter roll for just after the next midnight"""
+    next_midnight = datetime.combine(date.today() + timedelta(days=1), time(0, 0, 5))
+    scheduler.add_job('roll_attendance_counters', run_counter_roll_job, run_at=next_midnight.timestamp())
+
+def get_attendance_risk_summaries(students, teacher_id, class_id=None):
+    """
+    60-day attendance summaries per student read from the rolling counters.
     
-    # Check if class has ended
-    current_time = datetime.now().time()
-    if not class_.end_time or current_time < class_.end_time:
-        # Class hasn't ended yet, don't auto-mark
-        return 0
+    Same keys as get_student_attendance_summary_inline() apart from avg_late_minutes,
+    which the counters don't track. A student's rows for all of the teacher's
+    classes (or just class_id) are added together.
     
-    # Get all students
-    all_students = Student.query.all()
+    Returns:
+        list: Summary dicts sorted by attendance rate, lowest first
+    """
+    if sync_attendance_counters():
+        db.session.commit()
     
-    # Get students who already have attendance records for this class/date
-    existing_attendance = Attendance.query.filter_by(
-        class_id=class_id,
-        date=attendance_date
-    ).all()
+    query = StudentAttendanceCounter.query.filter(
+        StudentAttendanceCounter.class_id.in_(db.session.query(Class.id).filter(Class.teacher_id == teacher_id))
+    )
+    if class_id and class_id != 'all':
+        query = query.filter(StudentAttendanceCounter.class_id == class_id)
+    
+    totals = {}
+    for counter in query.order_by(StudentAttendanceCounter.class_id).all():
+        entry = totals.get(counter.student_id)
+        if entry is None:
+            entry = totals[counter.student_id] = [0, 0, 0, 0, 0, []]
+        entry[0] += counter.total_count
+        entry[1] += counter.present_count
+        entry[2] += counter.late_count
+        entry[3] += counter.absent_count
+        entry[4] += counter.excused_count
+        entry[5].extend(counter.recent_days(8))  # same recent window as the summaries: last 7 days plus today
+    
+    summaries = []
+    for student in students:
+        total_days, present_count, late_count, absent_count, excused_count, recent = \
+            totals.get(student.id, (0, 0, 0, 0, 0, []))
+        attendance_rate = ((present_count + late_count) / total_days * 100) if total_days > 0 else 0
+        summaries.append({
+            'student': student,
+            'total_days': total_days,
+            'present_count': present_count,
+            'late_count': late_count,
+            'absent_count': absent_count,
+            'excused_count': excused_count,
+            'attendance_rate': round(attendance_rate, 1),
+            # Sorted by day; a stable sort keeps class order within a day
+            'recent_pattern': [status for _, status in sorted(recent, key=lambda item: item[0])],
+            'risk_level': calculate_risk_level_inline(attendance_rate, absent_count, late_count)
+        })
+    return sorted(summaries, key=lambda x: x['attendance_rate'])
+
+def _rollup_status_counts(group_column, filters):
+    """
+    Sum daily_class_stats rows per group_column in a single GROUP BY query.
     
-    # Create a set of student IDs who already have attendance records
-    attended_student_ids = {record.student_id for record in existing_attendance}
+    Returns:
+        dict: {group_value: status counts dict}
+    """
+    if sync_daily_class_stats():
+        db.session.commit()
     
-    # Find students who haven't attended
-    absent_students = [student for student in all_students 
-                      if student.id not in attended_student_ids]
+    rows = db.session.query(
+        group_column,
+        func.sum(DailyClassStats.present_count),
+        func.sum(DailyClassStats.late_count),
+        func.sum(DailyClassStats.absent_count),
+        func.sum(DailyClassStats.excused_count),
+        func.sum(DailyClassStats.pending_excused_count),
+        func.sum(DailyClassStats.approved_without_record_count),
+        func.sum(DailyClassStats.total_count)
+    ).filter(*filters).group_by(group_column).all()
     
-    # Mark absent students
-    absent_count = 0
-    for student in absent_students:
-        # Create absent attendance record
-        attendance = Attendance(
-            student_id=student.id,
-            class_id=class_id,
-            teacher_id=class_.teacher_id,
-            date=attendance_date,
-            scan_time=class_.end_time,  # Use class end time as scan time
-            arrival_time=None,  # No arrival time for absent students
-            status='Absent',
-            late_arrival=False,
-            late_minutes=0,
-            notes='Auto-marked absent - did not attend class'
-        )
-        db.session.add(attendance)
-        absent_count += 1
+    return {
+        key: {'Present': present, 'Late': late, 'Absent': absent, 'Excused': excused,
+              'pending_excused': pending, 'approved_without_record': approved, 'total': total}
+        for key, present, late, absent, excused, pending, approved, total in rows
+    }
+
+def get_class_status_counts(class_ids, start_date, end_date):
+    """
+    Status counts per class for a date range, read from the daily rollup.
     
-    # Commit all changes at once
-    if absent_count > 0:
-        db.session.commit()
+    Returns:
+        dict: {class_id: status counts dict}
+    """
+    if not class_ids:
+        return {}
+    return _rollup_status_counts(DailyClassStats.class_id, [
+        DailyClassStats.class_id.in_(class_ids),
+        DailyClassStats.date >= start_date,
+        DailyClassStats.date <= end_date
+    ])
+
+def get_daily_status_counts(teacher_id, start_date, end_date, class_id='all'):
+    """
+    Status counts per day for a teacher's classes, read from the daily rollup.
     
-    return absent_count
+    Returns:
+        dict: {date: status counts dict}
+    """
+    filters = [
+        DailyClassStats.class_id.in_(db.session.query(Class.id).filter(Class.teacher_id == teacher_id)),
+        DailyClassStats.date >= start_date,
+        DailyClassStats.date <= end_date
+    ]
+    if class_id != 'all':
+        filters.append(DailyClassStats.class_id == class_id)
+    return _rollup_status_counts(DailyClassStats.date, filters)
+
+def sum_status_counts(counts_list):
+    """Add up several status counts dicts"""
+    total = _empty_status_counts()
+    for counts in counts_list:
+        for key in total:
+            total[key] += counts[key]
+    return total
 
 @app.context_processor
 def utility_processor():
@@ -491,9 +1799,6 @@ def logout():
 @app.route('/dashboard', methods=['GET', 'POST'])
 @login_required
 def dashboard():
-    # Run automatic expiration check for pending excuse requests
-    auto_expire_pending_excuses()
-    
     # Enhanced date and class filter with range support
     date_filter = request.args.get('date')
     date_range = request.args.get('date_range', 'today')  # today, week, month, custom
@@ -541,54 +1846,20 @@ def dashboard():
     total_present = total_late = total_absent = total_excused = 0
     filtered_classes = classes if class_id == 'all' else [c for c in classes if str(c.id) == class_id]
     
+    # Status counts for every class in one grouped pass
+    class_counts = get_class_status_counts([c.id for c in filtered_classes], start_date, end_date)
+    
     for c in filtered_classes:
-        # Get attendance records
-        records = Attendance.query.filter(
-            Attendance.class_id == c.id,
-            Attendance.date >= start_date,
-            Attendance.date <= end_date
-        ).all()
+        counts = class_counts.get(c.id, _empty_status_counts())
         
-        present = sum(1 for r in records if r.status == 'Present')
-        late = sum(1 for r in records if r.status == 'Late')
-        absent = sum(1 for r in records if r.status == 'Absent')
+        late = counts['Late']
+        absent = counts['Absent']
         # Count only records with 'Excused' status that have PENDING excuse requests
-        # Use join to efficiently get excuse request status instead of individual queries
-        excused_with_pending = db.session.query(Attendance).join(
-            ExcuseRequest, Attendance.excuse_request_id == ExcuseRequest.id
-        ).filter(
-            Attendance.class_id == c.id,
-            Attendance.date >= start_date,
-            Attendance.date <= end_date,
-            Attendance.status == 'Excused',
-            ExcuseRequest.status == 'Pending'
-        ).count()
-        
-        excused = excused_with_pending
-        
-        # Count approved excuse requests as Present (they're already counted as Present in attendance records)
-        # Get approved excuse requests for this class and date range that have attendance records
-        approved_excuse_requests = ExcuseRequest.query.filter(
-            ExcuseRequest.class_id == c.id,
-            ExcuseRequest.absence_date >= start_date,
-            ExcuseRequest.absence_date <= end_date,
-            ExcuseRequest.status == 'Approved'
-        ).all()
-        
-        # Count approved excuses that don't already have attendance records as Present
-        additional_present = 0
-        for excuse_req in approved_excuse_requests:
-            # Check if there's already an attendance record for this student/class/date
-            existing_attendance = next((r for r in records 
-                                     if r.student_id == excuse_req.student_id 
-                                     and r.date == excuse_req.absence_date), None)
-            if not existing_attendance:
-                additional_present += 1
-        
-        present += additional_present
+        excused = counts['pending_excused']
+        # Approved excuses without an attendance record count as Present
+        present = counts['Present'] + counts['approved_without_record']
         
         # Calculate attendance rate - approved excuses now count as present
-        total_students_system = Student.query.count()
         total_attendance = present + late + absent + excused
         # Count Present (including approved excuses), Late as attending
         attending_count = present + late
@@ -607,7 +1878,7 @@ def dashboard():
             'absent': absent,
             'excused': excused,
             'attendance_rate': round(attendance_rate, 1),
-            'total_students': total_students_system
+            'total_students': total_students_count
         })
     
     # Recent activity feed (last 10 attendance records)
@@ -628,67 +1899,31 @@ def dashboard():
             'date': attendance.date
         })
     
+    # Monthly comparison window (current vs previous month)
+    current_month_start = today.replace(day=1)
+    if today.month == 1:
+        prev_month_start = date(today.year - 1, 12, 1)
+        prev_month_end = date(today.year, 1, 1) - timedelta(days=1)
+    else:
+        prev_month_start = date(today.year, today.month - 1, 1)
+        prev_month_end = current_month_start - timedelta(days=1)
+    
+    # Per-day counts from the start of last month cover both the weekly trend and the monthly comparison
+    daily_counts = get_daily_status_counts(current_user.id, prev_month_start, today, class_id)
+    
     # Weekly trend analysis (last 7 days) - filtered by class if selected
     weekly_trends = []
     for i in range(7):
         trend_date = today - timedelta(days=6-i)
-        day_query = Attendance.query.join(Class).filter(
-            Class.teacher_id == current_user.id,
-            Attendance.date == trend_date
-        )
-        
-        # Filter by class if specified
-        if class_id != 'all':
-            day_query = day_query.filter(Class.id == class_id)
-        
-        day_records = day_query.all()
-        
-        day_present = sum(1 for r in day_records if r.status == 'Present')
-        day_late = sum(1 for r in day_records if r.status == 'Late')
-        day_absent = sum(1 for r in day_records if r.status == 'Absent')
-        
-        # Count only records with 'Excused' status that have PENDING excuse requests using efficient query
-        day_excused_query = db.session.query(Attendance).join(
-            ExcuseRequest, Attendance.excuse_request_id == ExcuseRequest.id
-        ).join(Class).filter(
-            Class.teacher_id == current_user.id,
-            Attendance.date == trend_date,
-            Attendance.status == 'Excused',
-            ExcuseRequest.status == 'Pending'
-        )
-        
-        # Filter by class if specified
-        if class_id != 'all':
-            day_excused_query = day_excused_query.filter(Class.id == class_id)
+        counts = daily_counts.get(trend_date, _empty_status_counts())
         
-        day_excused = day_excused_query.count()
-        
-        # Also count approved excuse requests for this day that don't have attendance records as Present
-        excuse_query = ExcuseRequest.query.join(Class).filter(
-            Class.teacher_id == current_user.id,
-            ExcuseRequest.absence_date == trend_date,
-            ExcuseRequest.status == 'Approved'
-        )
+        additional_present = counts['approved_without_record']
+        day_present = counts['Present'] + additional_present
+        day_late = counts['Late']
+        day_absent = counts['Absent']
+        day_excused = counts['pending_excused']
         
-        # Filter by class if specified
-        if class_id != 'all':
-            excuse_query = excuse_query.filter(Class.id == class_id)
-        
-        day_excuse_requests = excuse_query.all()
-        
-        # Count approved excuse requests that don't already have attendance records as Present
-        additional_present = 0
-        for excuse_req in day_excuse_requests:
-            # Check if there's already an attendance record for this student/class/date
-            existing_attendance = next((r for r in day_records 
-                                     if r.student_id == excuse_req.student_id 
-                                     and r.date == excuse_req.absence_date 
-                                     and r.class_id == excuse_req.class_id), None)
-            if not existing_attendance:
-                additional_present += 1
-        
-        day_present += additional_present
-        day_total = len(day_records) + additional_present
+        day_total = counts['total'] + additional_present
         # Count Present (including approved excuses) and Late as attending
         day_attending = day_present + day_late
         day_rate = day_attending / day_total * 100 if day_total > 0 else 0
@@ -703,148 +1938,34 @@ def dashboard():
             'rate': round(day_rate, 1)
         })
     
-    # Monthly comparison (current vs previous month) - filtered by class if selected
-    current_month_start = today.replace(day=1)
-    if today.month == 1:
-        prev_month_start = date(today.year - 1, 12, 1)
-        prev_month_end = date(today.year, 1, 1) - timedelta(days=1)
-    else:
-        prev_month_start = date(today.year, today.month - 1, 1)
-        prev_month_end = current_month_start - timedelta(days=1)
-    
-    # Apply class filter to monthly analytics
-    current_month_query = Attendance.query.join(Class).filter(
-        Class.teacher_id == current_user.id,
-        Attendance.date >= current_month_start,
-        Attendance.date <= today
-    )
-    prev_month_query = Attendance.query.join(Class).filter(
-        Class.teacher_id == current_user.id,
-        Attendance.date >= prev_month_start,
-        Attendance.date <= prev_month_end
-    )
-    
-    # Filter by class if specified
-    if class_id != 'all':
-        current_month_query = current_month_query.filter(Class.id == class_id)
-        prev_month_query = prev_month_query.filter(Class.id == class_id)
-    
-    current_month_records = current_month_query.all()
-    prev_month_records = prev_month_query.all()
-    
-    # Also get excuse requests for monthly comparison
-    current_month_excuse_query = ExcuseRequest.query.join(Class).filter(
-        Class.teacher_id == current_user.id,
-        ExcuseRequest.absence_date >= current_month_start,
-        ExcuseRequest.absence_date <= today,
-        ExcuseRequest.status == 'Approved'
-    )
-    prev_month_excuse_query = ExcuseRequest.query.join(Class).filter(
-        Class.teacher_id == current_user.id,
-        ExcuseRequest.absence_date >= prev_month_start,
-        ExcuseRequest.absence_date <= prev_month_end,
-        ExcuseRequest.status == 'Approved'
-    )
-    
-    # Filter by class if specified
-    if class_id != 'all':
-        current_month_excuse_query = current_month_excuse_query.filter(Class.id == class_id)
-        prev_month_excuse_query = prev_month_excuse_query.filter(Class.id == class_id)
-    
-    current_month_excuse_requests = current_month_excuse_query.all()
-    prev_month_excuse_requests = prev_month_excuse_query.all()
-    
-    current_month_rate = 0
-    prev_month_rate = 0
-    
-    if current_month_records or current_month_excuse_requests:
-        current_present = sum(1 for r in current_month_records if r.status in ['Present', 'Late'])
-        
-        # Count only records with 'Excused' status that have PENDING excuse requests using efficient query
-        current_excused_query = db.session.query(Attendance).join(
-            ExcuseRequest, Attendance.excuse_request_id == ExcuseRequest.id
-        ).join(Class).filter(
-            Class.teacher_id == current_user.id,
-            Attendance.date >= current_month_start,
-            Attendance.date <= today,
-            Attendance.status == 'Excused',
-            ExcuseRequest.status == 'Pending'
-        )
-        
-        # Filter by class if specified
-        if class_id != 'all':
-            current_excused_query = current_excused_query.filter(Class.id == class_id)
-        
-        current_excused = current_excused_query.count()
-        
-        # Count approved excuse requests that don't already have attendance records as Present
-        additional_current_present = 0
-        for excuse_req in current_month_excuse_requests:
-            existing_attendance = next((r for r in current_month_records 
-                                     if r.student_id == excuse_req.student_id 
-                                     and r.date == excuse_req.absence_date 
-                                     and r.class_id == excuse_req.class_id), None)
-            if not existing_attendance:
-                additional_current_present += 1
-        
-        total_current = len(current_month_records) + additional_current_present
+    def month_rate(month_start, month_end):
+        counts = sum_status_counts(v for k, v in daily_counts.items() if month_start <= k <= month_end)
+        total = counts['total'] + counts['approved_without_record']
         # Only Present and Late count as attending (approved excuses are now counted as Present)
-        current_attending = current_present + additional_current_present
-        current_month_rate = current_attending / total_current * 100 if total_current > 0 else 0
+        attending = counts['Present'] + counts['Late'] + counts['approved_without_record']
+        return attending / total * 100 if total > 0 else 0
     
-    if prev_month_records or prev_month_excuse_requests:
-        prev_present = sum(1 for r in prev_month_records if r.status in ['Present', 'Late'])
-        
-        # Count only records with 'Excused' status that have PENDING excuse requests using efficient query
-        prev_excused_query = db.session.query(Attendance).join(
-            ExcuseRequest, Attendance.excuse_request_id == ExcuseRequest.id
-        ).join(Class).filter(
-            Class.teacher_id == current_user.id,
-            Attendance.date >= prev_month_start,
-            Attendance.date <= prev_month_end,
-            Attendance.status == 'Excused',
-            ExcuseRequest.status == 'Pending'
-        )
-        
-        # Filter by class if specified
-        if class_id != 'all':
-            prev_excused_query = prev_excused_query.filter(Class.id == class_id)
-        
-        prev_excused = prev_excused_query.count()
-        
-        # Count approved excuse requests that don't already have attendance records as Present
-        additional_prev_present = 0
-        for excuse_req in prev_month_excuse_requests:
-            existing_attendance = next((r for r in prev_month_records 
-                                     if r.student_id == excuse_req.student_id 
-                                     and r.date == excuse_req.absence_date 
-                                     and r.class_id == excuse_req.class_id), None)
-            if not existing_attendance:
-                additional_prev_present += 1
-        
-        total_prev = len(prev_month_records) + additional_prev_present
-        # Only Present and Late count as attending (approved excuses are now counted as Present)
-        prev_attending = prev_present + additional_prev_present
-        prev_month_rate = prev_attending / total_prev * 100 if total_prev > 0 else 0
+    current_month_rate = month_rate(current_month_start, today)
+    prev_month_rate = month_rate(prev_month_start, prev_month_end)
     
     # Real-time status indicators
     current_time = datetime.now().time()
     classes_in_session = []
     upcoming_classes = []
     
+    in_session = [c for c in classes if c.start_time and c.end_time and c.start_time <= current_time <= c.end_time]
+    session_counts = get_class_status_counts([c.id for c in in_session], today, today) if in_session else {}
+    
     for c in classes:
         if c.start_time and c.end_time:
             if c.start_time <= current_time <= c.end_time:
                 # Class in session - check today's attendance
-                today_attendance = Attendance.query.filter_by(
-                    class_id=c.id, 
-                    date=today
-                ).all()
+                counts = session_counts.get(c.id, _empty_status_counts())
                 
                 classes_in_session.append({
                     'class': c,
-                    'attendance_count': len(today_attendance),
-                    'present_count': sum(1 for a in today_attendance if a.status in ['Present', 'Late']),
+                    'attendance_count': counts['total'],
+                    'present_count': counts['Present'] + counts['Late'],
                     'total_students': total_students_count  # Add total students available
                 })
             elif c.start_time > current_time:
@@ -929,6 +2050,7 @@ def add_class():
         new_class = Class(name=name, teacher_id=current_user.id, start_time=start_time, end_time=end_time)
         db.session.add(new_class)
         db.session.commit()
+        schedule_class_closings()
         flash('Class added successfully.', 'success')
         return redirect(url_for('view_classes'))
     return render_template('add_class.html')
@@ -967,6 +2089,7 @@ def edit_class(class_id):
         
         class_.name = name
         db.session.commit()
+        schedule_class_closings()
         flash('Class updated successfully.', 'success')
         return redirect(url_for('view_classes'))
     return render_template('edit_class.html', class_=class_)
@@ -979,6 +2102,7 @@ def delete_class(class_id):
         abort(403)
     db.session.delete(class_)
     db.session.commit()
+    schedule_class_closings()
     flash('Class deleted successfully.', 'success')
     return redirect(url_for('view_classes'))
 
@@ -1008,23 +2132,17 @@ def add_student(class_id):
         if Student.query.filter_by(student_number=student_number).first():
             flash('Student number already exists.', 'danger')
             return render_template('add_student.html', class_=class_)
-        # Generate QR code
-        qr_data = f"{student_number}"
-        qr = qrcode.make(qr_data)
-        qr_path = f'static/qr/{student_number}.png'
-        import os
-        os.makedirs('static/qr', exist_ok=True)
-        qr.save(qr_path)
         # Handle photo upload or avatar selection
         photo_path = None
         if photo and photo.filename != '':
-            photo_path = save_photo(photo, student_number)
+            photo_path = save_photo(photo)
         elif avatar_filename:
             photo_path = f'static/avatars/{avatar_filename}'
-        new_student = Student(name=name, student_number=student_number, class_id=class_id, qr_code_path=qr_path, photo_path=photo_path)
+        new_student = Student(name=name, student_number=student_number, class_id=class_id, photo_path=photo_path)
         db.session.add(new_student)
         db.session.commit()
-        flash('Student added and QR code generated.', 'success')
+        student_registry.invalidate()
+        flash('Student added successfully.', 'success')
         return redirect(url_for('view_students', class_id=class_id))
     return render_template('add_student.html', class_=class_)
 
@@ -1048,15 +2166,8 @@ def edit_student(student_id):
         
         # Handle photo upload
         if photo and photo.filename != '':
-            # Delete old photo if it exists
-            if student.photo_path and os.path.exists(student.photo_path):
-                try:
-                    os.remove(student.photo_path)
-                except Exception as e:
-                    print(f"Error deleting old photo: {e}")
-            
-            # Save new photo
-            photo_path = save_photo(photo, student.student_number)
+            # The old photo stays stored until gc-uploads finds nothing refers to it
+            photo_path = save_photo(photo)
             if photo_path:
                 student.photo_path = photo_path
                 flash('Student updated with new photo.', 'success')
@@ -1064,6 +2175,7 @@ def edit_student(student_id):
                 flash('Student updated, but photo upload failed. Invalid photo format.', 'warning')
         
         db.session.commit()
+        student_registry.invalidate()
         if not (photo and photo.filename != ''):
             flash('Student updated.', 'success')
         return redirect(url_for('manage_students'))
@@ -1073,8 +2185,12 @@ def edit_student(student_id):
 @login_required
 def delete_student(student_id):
     student = Student.query.get_or_404(student_id)
+    # Class/day buckets that lose this student's attendance rows
+    touched_days = db.session.query(Attendance.class_id, Attendance.date).filter_by(student_id=student.id).all()
     db.session.delete(student)
+    refresh_attendance_rollups(touched_days)
     db.session.commit()
+    student_registry.invalidate()
     flash('Student deleted.', 'success')
     return redirect(url_for('manage_students'))
 
@@ -1082,32 +2198,145 @@ def delete_student(student_id):
 @login_required
 def download_qr(student_id):
     student = Student.query.get_or_404(student_id)
-    if not student.qr_code_path:
-        flash('QR code not found.', 'danger')
-        return redirect(url_for('manage_students'))
-    qr_path = os.path.join(os.getcwd(), student.qr_code_path)
-    if not os.path.exists(qr_path):
-        flash('QR code file does not exist.', 'danger')
+    body = get_qr_image(student.student_number, 'png')
+    return send_file(BytesIO(body), mimetype='image/png', as_attachment=True,
+                     download_name=f'{student.student_number}.png')
+
+@app.route('/students/badges')
+@login_required
+def badge_sheets():
+    """
+    Printable QR badges (photo, name, student number, QR code) for many students.
+    
+    The sheet is built by a background job (see run_badge_job) and this page
+    polls badge_job_status, then downloads the file, so no request thread
+    waits for the pages to be drawn. Students are printed in name order.
+    
+    Query Parameters:
+        class_id (int): Only students in this class (must be the teacher's own)
+        student_id (int): Only these students; may be repeated
+        search (str): Student number or name prefix, as on /students/manage
+        format (str): 'pdf' (default) or 'zip' of PNG pages
+        per_page (int): Badges per page, one of BADGE_LAYOUTS
+    """
+    sheet_format = request.args.get('format', 'pdf')
+    per_page = request.args.get('per_page', BADGES_PER_PAGE, type=int)
+    if sheet_format not in PAGE_FORMATS or per_page not in BADGE_LAYOUTS:
+        abort(400)
+    
+    query = filter_students_by_search(Student.query, request.args.get('search', ''))
+    class_id = request.args.get('class_id', type=int)
+    if class_id is not None:
+        class_ = Class.query.get_or_404(class_id)
+        if class_.teacher_id != current_user.id:
+            abort(403)
+        query = query.filter(Student.class_id == class_id)
+    student_ids = request.args.getlist('student_id', type=int)
+    if student_ids:
+        query = query.filter(Student.id.in_(student_ids))
+    
+    badges = [
+        (student.name, student.student_number, photo_file(student.photo_path, 256),
+         qr_codes.path_for(student.student_number))
+        for student in query.with_entities(Student.name, Student.student_number, Student.photo_path)
+                            .order_by(Student.name_lower, Student.id)
+    ]
+    if not badges:
+        flash('No students match the badge filter.', 'warning')
         return redirect(url_for('manage_students'))
-    return send_file(qr_path, as_attachment=True)
+    
+    job = new_badge_job(current_user.id, sheet_format, ceil(len(badges) / per_page))
+    badge_job_executor.submit(run_badge_job, job, badges, per_page)
+    return render_template('badge_job.html', job=job,
+                           status_url=url_for('badge_job_status', job_id=job['id']))
+
+@app.route('/students/badges/<job_id>')
+@login_required
+def badge_job_status(job_id):
+    """API endpoint for the progress of a badge sheet job"""
+    job = badge_jobs.get(job_id)
+    if job is None or job['teacher_id'] != current_user.id:
+        abort(404)
+    status = {key: value for key, value in job.items() if key not in ('teacher_id', 'path')}
+    if job['state'] == 'finished':
+        status['download_url'] = url_for('download_badge_sheet', job_id=job_id)
+    return {'success': True, 'job': status}
+
+@app.route('/students/badges/<job_id>/download')
+@login_required
+def download_badge_sheet(job_id):
+    """Send a finished badge sheet"""
+    job = badge_jobs.get(job_id)
+    if job is None or job['teacher_id'] != current_user.id or job['state'] != 'finished':
+        abort(404)
+    return send_file(job['path'], mimetype=BADGE_MIMETYPES[job['format']], as_attachment=True,
+                     download_name=f'qr_badges.{job["format"]}')
+
+QR_MIMETYPES = {'png': 'image/png', 'svg': 'image/svg+xml'}
+
+def get_qr_image(student_number, fmt, size=None):
+    """
+    Encoded QR image for a student number, from the in-memory LRU when possible.
+    
+    Args:
+        student_number (str): Payload to encode
+        fmt (str): 'png' or 'svg'
+        size (int): Width in pixels, or None for the full-size image
+    
+    Returns:
+        bytes: Image file contents
+    """
+    render = render_qr_png if fmt == 'png' else render_qr_svg
+    return qr_images.get_or_render((student_number, fmt, size), lambda: render(student_number, size))
+
+@app.route('/qr/<student_number>.<fmt>')
+@login_required
+def qr_image(student_number, fmt):
+    """
+    QR code for a student's number, rendered on demand.
+    
+    The image depends only on the number, format and size, so it is served
+    with a strong ETag and a long-lived private Cache-Control; the teacher's
+    browser reuses it without asking again, and a revalidation is answered
+    with 304 before anything is rendered. Only numbers of existing students
+    are drawn (checked in student_registry), so the image cache can't be
+    filled with arbitrary text.
+    
+    Query Parameters:
+        size (int): Width in pixels (16-QR_MAX_SIZE); omitted for full size
+    """
+    if fmt not in QR_MIMETYPES or student_registry.get(student_number) is None:
+        abort(404)
+    size = request.args.get('size')
+    if size is not None:
+        try:
+            size = int(size)
+        except ValueError:
+            abort(400)
+        if not 16 <= size <= QR_MAX_SIZE:
+            abort(400)
+    
+    etag = f'{qr_digest(student_number)}-{fmt}-{size or "full"}'
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(get_qr_image(student_number, fmt, size), mimetype=QR_MIMETYPES[fmt])
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.max_age = QR_CACHE_MAX_AGE
+    response.cache_control.immutable = True
+    return response
 
 @app.route('/students/<int:student_id>/photo/delete', methods=['POST'])
 @login_required
 def delete_student_photo(student_id):
     student = Student.query.get_or_404(student_id)
     if student.photo_path:
-        # Delete the photo file
-        if os.path.exists(student.photo_path):
-            try:
-                os.remove(student.photo_path)
-                flash('Photo deleted successfully.', 'success')
-            except Exception as e:
-                flash('Error deleting photo file.', 'warning')
-                print(f"Error deleting photo: {e}")
-        
-        # Remove photo path from database
+        # The stored file is removed by gc-uploads once nothing refers to it
         student.photo_path = None
+        flash('Photo deleted successfully.', 'success')
         db.session.commit()
+        student_registry.invalidate()
     else:
         flash('No photo to delete.', 'info')
     
@@ -1137,11 +2366,6 @@ def take_attendance(class_id):
             attendance_date = date.today()
     else:
         attendance_date = date.today()
-    # Get all attendance records for today (to check existing records)
-    all_today_records = Attendance.query.filter_by(class_id=class_id, date=attendance_date).all()
-    present_students = [a for a in all_today_records if a.status == 'Present']
-    present_ids = [a.student_id for a in present_students]
-    students = Student.query.all()  # Show all students
     # Manual mark Absent/Excused/Late
     if request.method == 'POST' and 'manual_student_id' in request.form and 'manual_status' in request.form:
         student_id = int(request.form['manual_student_id'])
@@ -1180,6 +2404,7 @@ def take_attendance(class_id):
                 record.late_arrival = is_late
                 record.late_minutes = minutes_late
                 record.notes = notes
+                refresh_attendance_rollups([(class_id, attendance_date)])
                 db.session.commit()
                 
                 if status == 'Late':
@@ -1200,6 +2425,7 @@ def take_attendance(class_id):
                     notes=notes
                 )
                 db.session.add(attendance)
+                refresh_attendance_rollups([(class_id, attendance_date)])
                 db.session.commit()
                 
                 if status == 'Late':
@@ -1221,7 +2447,7 @@ def take_attendance(class_id):
         qr_data = request.form.get('qr_data')
         arrival_time_str = request.form.get('arrival_time', '')  # Optional manual arrival time
         
-        student = Student.query.filter_by(student_number=qr_data).first()  # Find by student_number only
+        student = student_registry.get(qr_data)  # Find by student_number only
         if not student:
             flash('Student not found.', 'danger')
         else:
@@ -1235,73 +2461,36 @@ def take_attendance(class_id):
             else:
                 arrival_time = datetime.now().time()
             
-            # Calculate late arrival status using class-specific start time
-            is_late, minutes_late = calculate_late_arrival(arrival_time, class_.start_time)
-            
-            # Determine status based on arrival time
-            if is_late:
-                status = 'Late'
-            else:
-                status = 'Present'
-            
-            # Check if student already has an attendance record for this date/class
-            existing_record = Attendance.query.filter_by(
-                student_id=student.id, 
-                class_id=class_id, 
-                date=attendance_date
-            ).first()
-            
-            if existing_record:
-                if existing_record.status in ['Present', 'Late']:
-                    flash(f'{student.name} is already marked {existing_record.status.lower()}.', 'info')
-                else:
-                    # Update existing record
-                    existing_record.status = status
-                    existing_record.scan_time = datetime.now().time()
-                    existing_record.arrival_time = arrival_time
-                    existing_record.late_arrival = is_late
-                    existing_record.late_minutes = minutes_late
-                    db.session.commit()
-                    
-                    if is_late:
-                        flash(f'{student.name} marked as Late (arrived {minutes_late} minutes late).', 'warning')
-                    else:
-                        flash(f'{student.name} status updated to Present.', 'success')
-            else:
-                # Create new attendance record
-                attendance = Attendance(
-                    student_id=student.id, 
-                    class_id=class_id, 
-                    teacher_id=current_user.id, 
-                    date=attendance_date, 
-                    scan_time=datetime.now().time(),
-                    arrival_time=arrival_time,
-                    status=status,
-                    late_arrival=is_late,
-                    late_minutes=minutes_late
-                )
-                db.session.add(attendance)
-                db.session.commit()
-                
-                if is_late:
-                    flash(f'{student.name} marked as Late (arrived {minutes_late} minutes late).', 'warning')
-                else:
-                    flash(f'{student.name} marked present.', 'success')
+            result, record = record_qr_scan(class_, student, attendance_date, arrival_time, current_user.id)
+            message, category = scan_result_message(result, student, record)
+            flash(message, category)
         return redirect(url_for('take_attendance', class_id=class_id) + f'?attendance_date={attendance_date}')
-    # Get all attendance records for the selected date and class
-    all_attendance = Attendance.query.filter_by(class_id=class_id, date=attendance_date).all()
-    
-    # Separate students by status
-    present_students = [a for a in all_attendance if a.status == 'Present']
-    late_students = [a for a in all_attendance if a.status == 'Late']
-    absent_students = [a for a in all_attendance if a.status == 'Absent']
-    excused_students = [a for a in all_attendance if a.status == 'Excused']
-    
-    # Convert to student objects with attendance info
-    present_list = [(Student.query.get(a.student_id), a) for a in present_students]
-    late_list = [(Student.query.get(a.student_id), a) for a in late_students]
-    absent_list = [(Student.query.get(a.student_id), a) for a in absent_students]
-    excused_list = [(Student.query.get(a.student_id), a) for a in excused_students]
+    # Load every student with their attendance record (if any) for the selected date and class
+    # in one joined query - the excuse request is selected too so the template doesn't lazy-load it
+    rows = db.session.query(Student, Attendance, ExcuseRequest).outerjoin(
+        Attendance, and_(
+            Attendance.student_id == Student.id,
+            Attendance.class_id == class_id,
+            Attendance.date == attendance_date
+        )
+    ).outerjoin(
+        ExcuseRequest, Attendance.excuse_request_id == ExcuseRequest.id
+    ).order_by(Student.id).all()
+    
+    students = []  # Show all students
+    status_lists = {'Present': [], 'Late': [], 'Absent': [], 'Excused': []}
+    for student, attendance, excuse_request in rows:
+        students.append(student)
+        if attendance and attendance.status in status_lists:
+            status_lists[attendance.status].append((student, attendance))
+    
+    # Keep records in the order they were taken
+    for entries in status_lists.values():
+        entries.sort(key=lambda entry: entry[1].id)
+    present_list = status_lists['Present']
+    late_list = status_lists['Late']
+    absent_list = status_lists['Absent']
+    excused_list = status_lists['Excused']
     
     return render_template('attendance.html', 
                          class_=class_, 
@@ -1312,6 +2501,77 @@ def take_attendance(class_id):
                          excused_list=excused_list,
                          attendance_date=attendance_date)
 
+@app.route('/api/classes/<int:class_id>/scan', methods=['POST'])
+@login_required
+def api_scan(class_id):
+    """API endpoint for QR scans - records attendance without reloading the page"""
+    class_ = Class.query.get_or_404(class_id)
+    if class_.teacher_id != current_user.id:
+        abort(403)
+    
+    data = request.get_json(silent=True) or request.form
+    if not hasattr(data, 'get'):
+        return {'success': False, 'message': 'Expected a JSON object or form data.'}, 400
+    fields = ('qr_data', 'attendance_date', 'arrival_time')
+    if not all(isinstance(data.get(field), (str, type(None))) for field in fields):
+        return {'success': False, 'message': 'qr_data, attendance_date and arrival_time must be strings.'}, 400
+    qr_data = (data.get('qr_data') or '').strip()
+    selected_date = data.get('attendance_date')
+    arrival_time_str = data.get('arrival_time') or ''
+    
+    try:
+        attendance_date = datetime.strptime(selected_date, '%Y-%m-%d').date() if selected_date else date.today()
+    except ValueError:
+        return {'success': False, 'message': 'Invalid date format.'}, 400
+    
+    try:
+        arrival_time = datetime.strptime(arrival_time_str, '%H:%M').time() if arrival_time_str else datetime.now().time()
+    except ValueError:
+        return {'success': False, 'message': 'Invalid time format. Please use HH:MM format.'}, 400
+    
+    student = student_registry.get(qr_data) if qr_data else None
+    if not student:
+        return {'success': False, 'message': 'Student not found.'}, 404
+    
+    result, record = record_qr_scan(class_, student, attendance_date, arrival_time, current_user.id)
+    message, category = scan_result_message(result, student, record)
+    
+    return {
+        'success': True,
+        'result': result,
+        'message': message,
+        'category': category,
+        'status': record.status,
+        'late_minutes': record.late_minutes,
+        'arrival_time': record.arrival_time.strftime('%H:%M') if record.arrival_time else None,
+        'student_id': student.id,
+        'student_name': student.name,
+        'student_number': student.student_number,
+        'photo_path': student.photo_path,
+        'photo_url': photo_url(student.photo_path, 64)
+    }
+
+@app.route('/api/scans/batch', methods=['POST'])
+@login_required
+def api_scan_batch():
+    """API endpoint for uploading queued scans from offline scanner stations"""
+    data = request.get_json(silent=True)
+    scans = data.get('scans') if isinstance(data, dict) else None
+    if not isinstance(scans, list):
+        return {'success': False, 'message': 'Expected a JSON body with a "scans" list.'}, 400
+    
+    results = ingest_scan_batch(scans, current_user.id)
+    
+    summary = {'created': 0, 'updated': 0, 'already_marked': 0, 'error': 0}
+    for result in results:
+        summary[result['result']] += 1
+    
+    return {
+        'success': True,
+        'summary': summary,
+        'results': results
+    }
+
 @app.route('/attendance/edit/<int:attendance_id>', methods=['GET', 'POST'])
 @login_required
 def edit_attendance(attendance_id):
@@ -1361,6 +2621,7 @@ def edit_attendance(attendance_id):
         record.late_minutes = minutes_late
         record.notes = notes
         
+        refresh_attendance_rollups([(record.class_id, record.date)])
         db.session.commit()
         flash('Attendance record updated successfully.', 'success')
         return redirect(url_for('attendance_records', class_id=record.class_id))
@@ -1394,26 +2655,30 @@ def export_records(class_id):
     class_ = Class.query.get_or_404(class_id)
     if class_.teacher_id != current_user.id:
         abort(403)
-    records = Attendance.query.filter_by(class_id=class_id).all()
-    students = {s.id: s for s in Student.query.all()}
-    import csv
-    import io
-    from flask import Response
+    rows = db.session.query(
+        Attendance.date, Student.name, Student.student_number, Attendance.scan_time,
+        Attendance.arrival_time, Attendance.status, Attendance.late_minutes, Attendance.notes
+    ).outerjoin(
+        Student, Attendance.student_id == Student.id
+    ).filter(
+        Attendance.class_id == class_id
+    ).order_by(Attendance.date, Attendance.id).yield_per(CSV_EXPORT_BATCH_SIZE)
+    
     def generate():
-        output = io.StringIO()
-        writer = csv.writer(output)
-        writer.writerow(['Date', 'Student Name', 'Student Number', 'Scan Time', 'Arrival Time', 'Status', 'Late Minutes', 'Notes'])
-        for r in records:
-            s = students.get(r.student_id)
-            scan_time = r.scan_time.strftime('%H:%M:%S') if r.scan_time else ''
-            arrival_time = r.arrival_time.strftime('%H:%M:%S') if r.arrival_time else ''
-            date_str = r.date.strftime('%Y-%m-%d') if hasattr(r.date, 'strftime') else str(r.date)
-            late_minutes = r.late_minutes if r.late_minutes else ''
-            notes = r.notes if r.notes else ''
-            writer.writerow([date_str, s.name if s else '', s.student_number if s else '', 
-                           scan_time, arrival_time, r.status, late_minutes, notes])
-        return output.getvalue()
-    return Response(generate(), mimetype='text/csv', headers={'Content-Disposition': f'attachment;filename=attendance_{class_.name}.csv'})
+        for r in rows:
+            yield [
+                r.date.strftime('%Y-%m-%d'),
+                r.name or '',
+                r.student_number or '',
+                r.scan_time.strftime('%H:%M:%S') if r.scan_time else '',
+                r.arrival_time.strftime('%H:%M:%S') if r.arrival_time else '',
+                r.status,
+                r.late_minutes if r.late_minutes else '',
+                r.notes if r.notes else ''
+            ]
+    header = ['Date', 'Student Name', 'Student Number', 'Scan Time', 'Arrival Time', 'Status', 'Late Minutes', 'Notes']
+    return Response(stream_with_context(iter_csv(header, generate())), mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment;filename=attendance_{class_.name}.csv'})
 
 @app.route('/students/manage', methods=['GET', 'POST'])
 @login_required
@@ -1421,7 +2686,6 @@ def manage_students():
     """
     Global student management - all students can attend any class
     """
-    students = Student.query.all()
     classes = Class.query.filter_by(teacher_id=current_user.id).all()
     
     if request.method == 'POST':
@@ -1430,8 +2694,9 @@ def manage_students():
         photo = request.files.get('photo')  # Get uploaded photo
         avatar_filename = request.form.get('avatar')
         
-        normalized_name = name.lower()
-        duplicate = any(s.name.strip().lower() == normalized_name for s in students)
+        duplicate = db.session.query(
+            exists().where(Student.name_lower == normalize_student_name(name))
+        ).scalar()
         
         if not name or not student_number:
             flash('All fields are required.', 'danger')
@@ -1445,31 +2710,22 @@ def manage_students():
             # Handle photo upload
             photo_path = None
             if photo and photo.filename != '':
-                photo_path = save_photo(photo, student_number)
+                photo_path = save_photo(photo)
                 if not photo_path:
                     flash('Invalid photo format. Please use PNG, JPG, JPEG, or GIF.', 'warning')
             elif avatar_filename:
                 photo_path = f'static/avatars/{avatar_filename}'
             
-            # Optimize QR code generation: only generate if file does not exist
-            import qrcode, os
-            qr_data = f"{student_number}"
-            qr_path = f'static/qr/{student_number}.png'
-            os.makedirs('static/qr', exist_ok=True)
-            if not os.path.exists(qr_path):
-                qr = qrcode.make(qr_data)
-                qr.save(qr_path)
-            
             # Create student without specific class assignment (can attend any class)
             new_student = Student(
                 name=name, 
                 student_number=student_number, 
                 class_id=None,  # No specific class assignment
-                qr_code_path=qr_path, 
                 photo_path=photo_path
             )
             db.session.add(new_student)
             db.session.commit()
+            student_registry.invalidate()
             
             success_msg = 'Student added successfully. They can now attend any class.'
             if photo_path:
@@ -1477,7 +2733,273 @@ def manage_students():
             flash(success_msg, 'success')
             return redirect(url_for('manage_students'))
     
-    return render_template('manage_students.html', students=students, classes=classes)
+    # Only the first page is rendered; the rest is loaded from /api/students as the list scrolls
+    search = request.args.get('q', '').strip()
+    students, next_cursor = search_students(search)
+    total_students = db.session.query(func.count(Student.id)).scalar()
+    return render_template('manage_students.html', students=students, classes=classes, search=search,
+                           next_cursor=next_cursor, total_students=total_students)
+
+@app.route('/api/students')
+@login_required
+def api_students():
+    """API endpoint for the student list - one page of search results per request"""
+    search = request.args.get('q', '').strip()
+    cursor = decode_student_cursor(request.args.get('cursor'))
+    try:
+        limit = max(1, min(int(request.args.get('limit', STUDENTS_PAGE_SIZE)), 500))
+    except ValueError:
+        return {'success': False, 'message': 'Invalid limit.'}, 400
+    
+    students, next_cursor = search_students(search, cursor, limit)
+    
+    return {
+        'success': True,
+        'students': [{
+            'id': student.id,
+            'name': student.name,
+            'student_number': student.student_number,
+            'photo_url': photo_url(student.photo_path, 64),
+            'qr_code_url': url_for('qr_image', student_number=student.student_number, fmt='png', size=QR_THUMBNAIL_SIZE),
+            'edit_url': url_for('edit_student', student_id=student.id),
+            'download_qr_url': url_for('download_qr', student_id=student.id),
+            'delete_url': url_for('delete_student', student_id=student.id)
+        } for student in students],
+        'next_cursor': next_cursor
+    }
+
+# Badge sheet jobs
+BADGE_MIMETYPES = {'pdf': 'application/pdf', 'zip': 'application/zip'}
+badge_jobs = {}  # job id -> progress dict, see new_badge_job()
+badge_jobs_lock = threading.Lock()
+badge_job_executor = ThreadPoolExecutor(max_workers=BADGE_JOB_WORKERS, thread_name_prefix='badge-sheets')
+badge_page_pool = None  # ProcessPoolExecutor drawing pages for every badge job, see get_badge_page_pool()
+
+def get_badge_page_pool():
+    """The process pool badge pages are drawn on, started on first use"""
+    global badge_page_pool
+    with badge_jobs_lock:
+        if badge_page_pool is None:
+            badge_page_pool = ProcessPoolExecutor(max_workers=BADGE_WORKERS)
+        return badge_page_pool
+
+def new_badge_job(teacher_id, sheet_format, page_count):
+    """Register a progress record for a badge sheet and drop the oldest finished ones with their files"""
+    job = {
+        'id': uuid.uuid4().hex,
+        'teacher_id': teacher_id,
+        'format': sheet_format,
+        'state': 'queued',  # queued/running/finished/failed
+        'pages': page_count,
+        'pages_done': 0,
+        'error': None,
+        'path': None,
+        'started_at': None,
+        'finished_at': None,
+    }
+    with badge_jobs_lock:
+        finished = [j for j in badge_jobs.values() if j['state'] in ('finished', 'failed')]
+        for old in finished[:max(0, len(badge_jobs) - MAX_TRACKED_BADGE_JOBS + 1)]:
+            del badge_jobs[old['id']]
+            if old['path'] and os.path.exists(old['path']):
+                os.remove(old['path'])
+        badge_jobs[job['id']] = job
+    return job
+
+def run_badge_job(job, badges, per_page):
+    """
+    Badge job executor entry point: draw the pages on the shared process pool
+    and write them to a temporary PDF or zip file for download_badge_sheet.
+    
+    Each job keeps at most two pages per worker in flight, so the
+    BADGE_JOB_WORKERS jobs that can run at once share the pool fairly.
+    """
+    job['state'] = 'running'
+    job['started_at'] = datetime.now().isoformat(timespec='seconds')
+    fd, job['path'] = tempfile.mkstemp(prefix='badges-', suffix=f'.{job["format"]}')
+    
+    def counted(pages):
+        for page in pages:
+            yield page
+            job['pages_done'] += 1
+    
+    write = iter_pdf if job['format'] == 'pdf' else iter_zip
+    try:
+        with os.fdopen(fd, 'wb') as sheet:
+            pages = iter_badge_pages(get_badge_page_pool(), badges, per_page, PAGE_FORMATS[job['format']],
+                                     window=2 * BADGE_WORKERS)
+            for chunk in write(counted(pages)):
+                sheet.write(chunk)
+        job['state'] = 'finished'
+    except Exception as e:
+        job['state'] = 'failed'
+        job['error'] = str(e)
+        raise
+    finally:
+        job['finished_at'] = datetime.now().isoformat(timespec='seconds')
+
+# Bulk student import
+student_import_jobs = {}  # job id -> progress dict, see new_student_import_job()
+student_import_lock = threading.Lock()
+# Imports run one at a time on their own thread, so a large file doesn't hold up the scheduled jobs
+student_import_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='student-import')
+MAX_TRACKED_IMPORT_JOBS = 50
+IMPORT_ERROR_LIMIT = 100  # errors kept per job; the rest are only counted
+
+def new_student_import_job(teacher_id, filename):
+    """Register a progress record for an import and drop the oldest finished ones"""
+    job = {
+        'id': uuid.uuid4().hex,
+        'teacher_id': teacher_id,
+        'filename': filename,
+        'state': 'queued',  # queued/running/finished/failed
+        'rows': 0,
+        'created': 0,
+        'skipped': 0,
+        'errors': [],
+        'started_at': None,
+        'finished_at': None,
+    }
+    with student_import_lock:
+        finished = [j for j in student_import_jobs.values() if j['state'] in ('finished', 'failed')]
+        for old in finished[:max(0, len(student_import_jobs) - MAX_TRACKED_IMPORT_JOBS + 1)]:
+            del student_import_jobs[old['id']]
+        student_import_jobs[job['id']] = job
+    return job
+
+def _import_error(job, message):
+    job['skipped'] += 1
+    if len(job['errors']) < IMPORT_ERROR_LIMIT:
+        job['errors'].append(message)
+
+def import_students_csv(path, job, batch_size=STUDENT_IMPORT_BATCH_SIZE):
+    """
+    Import students from a CSV file with Name and Student Number columns.
+    
+    The whole file is validated before anything is written: rows are checked
+    against in-memory sets of the existing student numbers and names, so each
+    row costs no queries, and validated like the add-student form (both fields
+    required, digits-only numbers, no repeated numbers or names). The valid
+    rows are then inserted batch_size at a time in a single transaction, so
+    an import either adds every valid row or, if an insert fails (e.g. a
+    student added through the form in the meantime), nothing at all. QR
+    codes need no work here; /qr renders them on demand.
+    
+    Args:
+        path (str): CSV file to read
+        job (dict): Progress record from new_student_import_job(), updated in place
+        batch_size (int): Students per INSERT statement
+    
+    Returns:
+        dict: The job record
+    """
+    job['state'] = 'running'
+    job['started_at'] = datetime.now().isoformat(timespec='seconds')
+    numbers = set()
+    names = set()
+    for student_number, name_lower in db.session.query(Student.student_number, Student.name_lower):
+        numbers.add(student_number)
+        names.add(name_lower)
+    
+    students = []
+    with open(path, newline='', encoding='utf-8-sig') as csv_file:
+        reader = csv.reader(csv_file)
+        header = [column.strip().lower().replace('_', ' ') for column in next(reader, [])]
+        if 'name' not in header or 'student number' not in header:
+            job['state'] = 'failed'
+            job['errors'].append('The CSV needs "Name" and "Student Number" columns.')
+            job['finished_at'] = datetime.now().isoformat(timespec='seconds')
+            return job
+        name_index, number_index = header.index('name'), header.index('student number')
+        
+        for line_number, row in enumerate(reader, start=2):
+            if not any(cell.strip() for cell in row):
+                continue
+            job['rows'] += 1
+            name = row[name_index].strip() if len(row) > name_index else ''
+            student_number = row[number_index].strip() if len(row) > number_index else ''
+            name_lower = normalize_student_name(name)
+            if not name or not student_number:
+                _import_error(job, f'Line {line_number}: name and student number are required.')
+            elif not student_number.isdigit():
+                _import_error(job, f'Line {line_number}: student number must be digits only.')
+            elif student_number in numbers:
+                _import_error(job, f'Line {line_number}: student number {student_number} already exists.')
+            elif name_lower in names:
+                _import_error(job, f'Line {line_number}: a student named {name} already exists.')
+            else:
+                numbers.add(student_number)
+                names.add(name_lower)
+                # Core insert: name_lower is set here because the ORM event doesn't run
+                students.append({
+                    'name': name,
+                    'name_lower': name_lower,
+                    'student_number': student_number,
+                    'class_id': None,
+                    'photo_path': None
+                })
+    
+    try:
+        for start in range(0, len(students), batch_size):
+            db.session.execute(Student.__table__.insert(), students[start:start + batch_size])
+        db.session.commit()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        job['state'] = 'failed'
+        job['errors'].append(f'Import stopped, no students were added: {getattr(e, "orig", None) or e}')
+        job['finished_at'] = datetime.now().isoformat(timespec='seconds')
+        return job
+    student_registry.invalidate()
+    job['created'] = len(students)
+    job['state'] = 'finished'
+    job['finished_at'] = datetime.now().isoformat(timespec='seconds')
+    return job
+
+def run_student_import_job(job, path):
+    """Import executor entry point for an uploaded CSV; removes the upload when done"""
+    with app.app_context():
+        try:
+            import_students_csv(path, job)
+        except Exception as e:
+            db.session.rollback()
+            job['state'] = 'failed'
+            job['errors'].append(f'Import stopped: {e}')
+            job['finished_at'] = datetime.now().isoformat(timespec='seconds')
+            raise
+        finally:
+            os.remove(path)
+
+@app.route('/students/import', methods=['POST'])
+@login_required
+def import_students():
+    """Start a bulk CSV import in the background; progress is read from import_status"""
+    upload = request.files.get('csv_file')
+    if not upload or not upload.filename:
+        return {'success': False, 'message': 'Choose a CSV file to import.'}, 400
+    if not upload.filename.lower().endswith('.csv'):
+        return {'success': False, 'message': 'Only .csv files can be imported.'}, 400
+    
+    # The request stream is gone once we return, so keep the file until the job has read it
+    fd, path = tempfile.mkstemp(suffix='.csv')
+    with os.fdopen(fd, 'wb') as saved:
+        upload.save(saved)
+    job = new_student_import_job(current_user.id, secure_filename(upload.filename))
+    student_import_executor.submit(run_student_import_job, job, path)
+    
+    return {
+        'success': True,
+        'job_id': job['id'],
+        'status_url': url_for('import_status', job_id=job['id'])
+    }, 202
+
+@app.route('/students/import/<job_id>')
+@login_required
+def import_status(job_id):
+    """API endpoint for the progress of a bulk student import"""
+    job = student_import_jobs.get(job_id)
+    if job is None or job['teacher_id'] != current_user.id:
+        abort(404)
+    return {'success': True, 'job': {key: value for key, value in job.items() if key != 'teacher_id'}}
 
 @app.route('/records/manage', methods=['GET', 'POST'])
 @login_required
@@ -1486,72 +3008,96 @@ def manage_records():
     # Support both POST (form submission) and GET (URL parameters) for filtering
     class_id = request.form.get('class_id') or request.args.get('class_id')
     date_filter = request.form.get('date') or request.args.get('date')
-    page = int(request.args.get('page', 1))
     per_page = 10
-    query = Attendance.query.join(Class).filter(Class.teacher_id == current_user.id)
-    if class_id:
-        query = query.filter(Attendance.class_id == class_id)
+    filter_date = None
     if date_filter:
-        from datetime import datetime
         try:
             filter_date = datetime.strptime(date_filter, '%Y-%m-%d').date()
-            query = query.filter(Attendance.date == filter_date)
         except ValueError:
             pass
-    total_records = query.count()
-    total_pages = ceil(total_records / per_page) if total_records else 1
-    records = query.order_by(Attendance.date.desc(), Attendance.id.desc()).offset((page-1)*per_page).limit(per_page).all()
-    students = {s.id: s for s in Student.query.all()}
+    
+    query = Attendance.query.join(Class).filter(Class.teacher_id == current_user.id)
+    if class_id:
+        query = query.filter(Attendance.class_id == class_id)
+    if filter_date:
+        query = query.filter(Attendance.date == filter_date)
+    
+    # Keyset pagination on (date, id), newest first: 'after' moves to older
+    # records and 'before' back to newer ones, so deep pages cost the same as page 1
+    after = decode_page_token(request.args.get('after'))
+    before = None if after else decode_page_token(request.args.get('before'))
+    if before:
+        records = query.filter(
+            tuple_(Attendance.date, Attendance.id) > before
+        ).order_by(Attendance.date, Attendance.id).limit(per_page + 1).all()
+        has_prev = len(records) > per_page
+        records = records[:per_page][::-1]
+        has_next = True
+    else:
+        if after:
+            query = query.filter(tuple_(Attendance.date, Attendance.id) < after)
+        records = query.order_by(Attendance.date.desc(), Attendance.id.desc()).limit(per_page + 1).all()
+        has_next = len(records) > per_page
+        records = records[:per_page]
+        has_prev = after is not None
+    prev_token = encode_page_token(records[0].date, records[0].id) if records and has_prev else None
+    next_token = encode_page_token(records[-1].date, records[-1].id) if records and has_next else None
+    
+    # Only the students shown on this page
+    student_ids = {r.student_id for r in records}
+    students = {s.id: s for s in Student.query.filter(Student.id.in_(student_ids))} if student_ids else {}
     class_dict = {c.id: c for c in classes}
-    present = sum(1 for r in query if r.status == 'Present')
-    absent = sum(1 for r in query if r.status == 'Absent')
-    excused = sum(1 for r in query if r.status == 'Excused')
-    return render_template('manage_records.html', classes=classes, records=records, students=students, class_dict=class_dict, class_id=class_id, date_filter=date_filter, present=present, absent=absent, excused=excused, page=page, total_pages=total_pages)
+    
+    # Status totals for the whole filter from the daily rollup, in one GROUP BY
+    stats_filters = [DailyClassStats.class_id.in_(list(class_dict))]
+    if class_id:
+        stats_filters.append(DailyClassStats.class_id == class_id)
+    if filter_date:
+        stats_filters.append(DailyClassStats.date == filter_date)
+    counts = sum_status_counts(_rollup_status_counts(DailyClassStats.class_id, stats_filters).values())
+    
+    return render_template('manage_records.html', classes=classes, records=records, students=students, class_dict=class_dict, class_id=class_id, date_filter=date_filter, present=counts['Present'], absent=counts['Absent'], excused=counts['Excused'], total_records=counts['total'], prev_token=prev_token, next_token=next_token)
 
 @app.route('/records/manage/export', methods=['POST'])
 @login_required
 def export_manage_records():
-    classes = Class.query.filter_by(teacher_id=current_user.id).all()
     class_id = request.form.get('class_id')
     date_filter = request.form.get('date')
-    query = Attendance.query.join(Class).filter(Class.teacher_id == current_user.id)
+    query = db.session.query(
+        Class.name.label('class_name'), Student.name, Student.student_number,
+        Attendance.date, Attendance.scan_time, Attendance.status
+    ).select_from(Attendance).join(
+        Class, Attendance.class_id == Class.id
+    ).outerjoin(
+        Student, Attendance.student_id == Student.id
+    ).filter(Class.teacher_id == current_user.id)
     if class_id:
         query = query.filter(Attendance.class_id == class_id)
     if date_filter:
-        from datetime import datetime
         try:
             filter_date = datetime.strptime(date_filter, '%Y-%m-%d').date()
             query = query.filter(Attendance.date == filter_date)
         except ValueError:
             pass
-    records = query.all()
-    students = {s.id: s for s in Student.query.all()}
-    class_dict = {c.id: c for c in classes}
-    import csv
-    import io
-    from flask import Response
+    rows = query.order_by(Attendance.date, Attendance.id).yield_per(CSV_EXPORT_BATCH_SIZE)
+    
     def generate():
-        output = io.StringIO()
-        writer = csv.writer(output)
-        writer.writerow(['Class', 'Student Name', 'Student Number', 'Date', 'Scan Time', 'Status'])
-        for r in records:
-            s = students.get(r.student_id)
-            c = class_dict.get(r.class_id)
-            scan_time = r.scan_time.strftime('%H:%M:%S') if r.scan_time else ''
-            date_str = r.date.strftime('%Y-%m-%d') if hasattr(r.date, 'strftime') else str(r.date)
-            writer.writerow([
-                c.name if c else '',
-                s.name if s else '',
-                s.student_number if s else '',
-                date_str,
-                scan_time,
+        for r in rows:
+            yield [
+                r.class_name,
+                r.name or '',
+                r.student_number or '',
+                r.date.strftime('%Y-%m-%d'),
+                r.scan_time.strftime('%H:%M:%S') if r.scan_time else '',
                 r.status
-            ])
-        return output.getvalue()
-    return Response(generate(), mimetype='text/csv', headers={'Content-Disposition': 'attachment;filename=attendance_records.csv'})
+            ]
+    header = ['Class', 'Student Name', 'Student Number', 'Date', 'Scan Time', 'Status']
+    return Response(stream_with_context(iter_csv(header, generate())), mimetype='text/csv',
+                    headers={'Content-Disposition': 'attachment;filename=attendance_records.csv'})
 
 
-app.jinja_env.globals.update(now=datetime.now)
+app.jinja_env.globals.update(now=datetime.now, QR_THUMBNAIL_SIZE=QR_THUMBNAIL_SIZE, photo_url=photo_url,
+                             upload_url=upload_url)
 
 # Excuse Request Management Routes
 @app.route('/excuse-requests', methods=['GET', 'POST'])
@@ -1641,6 +3187,7 @@ def review_excuse_request(request_id):
     excuse_request.reviewed_at = datetime.now()
     excuse_request.teacher_notes = teacher_notes
     
+    refresh_attendance_rollups([(excuse_request.class_id, excuse_request.absence_date)])
     db.session.commit()
     return redirect(url_for('manage_excuse_requests'))
 
@@ -1676,7 +3223,7 @@ def submit_excuse_request():
         # Save excuse letter if uploaded
         excuse_letter_path = None
         if excuse_file and excuse_file.filename:
-            excuse_letter_path = save_excuse_letter(excuse_file, student_id, class_id, absence_date_str)
+            excuse_letter_path = save_excuse_letter(excuse_file)
             if not excuse_letter_path:
                 flash('Invalid file format. Please upload PNG, JPG, JPEG, or GIF files.', 'warning')
         
@@ -1720,6 +3267,7 @@ def submit_excuse_request():
             )
             db.session.add(new_attendance)
         
+        refresh_attendance_rollups([(class_id, absence_date)])
         db.session.commit()
         
         flash('Excuse request submitted successfully. Attendance record created with pending status. Please wait for teacher approval.', 'success')
@@ -1731,11 +3279,12 @@ def submit_excuse_request():
 @login_required
 def expire_pending_excuses():
     """Manually trigger expiration of pending excuse requests older than 7 days"""
-    expired_count = auto_expire_pending_excuses()
-    if expired_count > 0:
-        flash(f'Expired {expired_count} pending excuse requests older than 7 days.', 'warning')
+    if scheduler.is_running():
+        scheduler.run_now('expire_excuses')
+        flash('Expiration of pending excuse requests older than 7 days has been queued. Refresh to see the results.', 'info')
     else:
-        flash('No pending excuse requests found that are older than 7 days.', 'info')
+        expired_count = auto_expire_pending_excuses()
+        flash(f'Expired {expired_count} pending excuse requests older than 7 days.', 'info')
     return redirect(url_for('manage_excuse_requests'))
 
 @app.route('/excuse-requests/<int:request_id>/details')
@@ -1757,10 +3306,19 @@ def get_excuse_details(request_id):
         'submitted_at': excuse_request.submitted_at.strftime('%B %d, %Y at %I:%M %p'),
         'reviewed_at': excuse_request.reviewed_at.strftime('%B %d, %Y at %I:%M %p') if excuse_request.reviewed_at else None,
         'teacher_notes': excuse_request.teacher_notes,
-        'excuse_letter_path': excuse_request.excuse_letter_path
+        'excuse_letter_path': excuse_request.excuse_letter_path,
+        'excuse_letter_url': upload_url(excuse_request.excuse_letter_path)
     }
 
 # Inline Analytics Functions
+def calculate_risk_level_inline(attendance_rate, absent_count, late_count):
+    """Classify a student's attendance risk as high, medium or low"""
+    if attendance_rate < 70 or absent_count > 5:
+        return 'high'
+    elif attendance_rate < 85 or absent_count > 3 or late_count > 5:
+        return 'medium'
+    return 'low'
+
 def calculate_attendance_trends_inline(days=30, class_id=None):
     """Calculate attendance trends over specified period"""
     end_date = date.today()
@@ -1810,50 +3368,55 @@ def get_student_attendance_summary_inline(class_id=None, days=30):
     if class_id and class_id != 'all':
         students_query = students_query.filter(Student.class_id == class_id)
     
-    students = students_query.all()
+    students = students_query.order_by(Student.id).all()
+    
+    # Per-student status counts and average late minutes in one grouped query
+    totals_query = db.session.query(
+        Attendance.student_id,
+        func.count(Attendance.id),
+        func.sum(case((Attendance.status == 'Present', 1), else_=0)),
+        func.sum(case((Attendance.status == 'Late', 1), else_=0)),
+        func.sum(case((Attendance.status == 'Absent', 1), else_=0)),
+        func.sum(case((Attendance.status == 'Excused', 1), else_=0)),
+        func.avg(case((and_(Attendance.status == 'Late', Attendance.late_minutes > 0), Attendance.late_minutes)))
+    ).join(Class).filter(
+        Class.teacher_id == current_user.id,
+        Attendance.date >= start_date,
+        Attendance.date <= end_date
+    )
+    
+    # Recent attendance pattern (last 7 days) for every student in one batched query
+    recent_query = db.session.query(
+        Attendance.student_id,
+        Attendance.status
+    ).join(Class).filter(
+        Class.teacher_id == current_user.id,
+        Attendance.date >= max(start_date, end_date - timedelta(days=7)),
+        Attendance.date <= end_date
+    )
+    
+    if class_id and class_id != 'all':
+        totals_query = totals_query.filter(Class.id == class_id)
+        recent_query = recent_query.filter(Class.id == class_id)
+    
+    totals = {row[0]: row[1:] for row in totals_query.group_by(Attendance.student_id).all()}
+    recent_patterns = defaultdict(list)
+    for student_id, status in recent_query.order_by(Attendance.date, Attendance.id).all():
+        recent_patterns[student_id].append(status)
     
     student_summaries = []
     
     for student in students:
-        # Get attendance records for this student
-        attendance_query = db.session.query(Attendance).join(Class).filter(
-            Class.teacher_id == current_user.id,
-            Attendance.student_id == student.id,
-            Attendance.date >= start_date,
-            Attendance.date <= end_date
-        )
-        
-        if class_id and class_id != 'all':
-            attendance_query = attendance_query.filter(Class.id == class_id)
-        
-        records = attendance_query.all()
-        
-        # Calculate statistics
-        total_days = len(records)
-        present_count = sum(1 for r in records if r.status == 'Present')
-        late_count = sum(1 for r in records if r.status == 'Late')
-        absent_count = sum(1 for r in records if r.status == 'Absent')
-        excused_count = sum(1 for r in records if r.status == 'Excused')
+        total_days, present_count, late_count, absent_count, excused_count, avg_late_minutes = \
+            totals.get(student.id, (0, 0, 0, 0, 0, None))
+        avg_late_minutes = avg_late_minutes or 0
         
         # Calculate attendance rate
         attending_count = present_count + late_count
         attendance_rate = (attending_count / total_days * 100) if total_days > 0 else 0
         
-        # Calculate average late minutes
-        late_records = [r for r in records if r.status == 'Late' and r.late_minutes > 0]
-        avg_late_minutes = sum(r.late_minutes for r in late_records) / len(late_records) if late_records else 0
-        
-        # Get recent attendance pattern (last 7 days)
-        recent_records = [r for r in records if r.date >= (end_date - timedelta(days=7))]
-        recent_pattern = [r.status for r in sorted(recent_records, key=lambda x: x.date)]
-        
         # Calculate risk level
-        if attendance_rate < 70 or absent_count > 5:
-            risk_level = 'high'
-        elif attendance_rate < 85 or absent_count > 3 or late_count > 5:
-            risk_level = 'medium'
-        else:
-            risk_level = 'low'
+        risk_level = calculate_risk_level_inline(attendance_rate, absent_count, late_count)
         
         student_summaries.append({
             'student': student,
@@ -1864,7 +3427,7 @@ def get_student_attendance_summary_inline(class_id=None, days=30):
             'excused_count': excused_count,
             'attendance_rate': round(attendance_rate, 1),
             'avg_late_minutes': round(avg_late_minutes, 1),
-            'recent_pattern': recent_pattern,
+            'recent_pattern': recent_patterns.get(student.id, []),
             'risk_level': risk_level
         })
     
@@ -1935,7 +3498,7 @@ def get_time_based_analytics_inline(class_id=None, days=30):
     records = query.all()
     
     # Day of week analysis
-    day_stats = defaultdict(lambda: {'Present': 0, 'Late': 0, 'Absent': 0, 'total': 0})
+    day_stats = defaultdict(lambda: {'Present': 0, 'Late': 0, 'Absent': 0, 'Excused': 0, 'total': 0})
     
     # Hour of day analysis (for late arrivals)
     hour_stats = defaultdict(lambda: {'count': 0, 'late_minutes': 0})
@@ -1982,13 +3545,17 @@ def get_time_based_analytics_inline(class_id=None, days=30):
         'hour_analysis': sorted(hour_analysis, key=lambda x: x['late_count'], reverse=True)
     }
 
-def get_predictive_insights_inline(class_id=None):
-    """Generate predictive insights based on attendance patterns"""
-    # Get recent 60 days of data for analysis
-    end_date = date.today()
-    start_date = end_date - timedelta(days=60)
+def get_predictive_insights_inline(class_id=None, student_summaries=None):
+    """
+    Generate predictive insights based on attendance patterns
     
-    student_summaries = get_student_attendance_summary_inline(class_id, 60)
+    Args:
+        class_id: Class to analyze, or None/'all' for every class
+        student_summaries: Precomputed 60-day student summaries; queried when omitted
+    """
+    # Get recent 60 days of data for analysis
+    if student_summaries is None:
+        student_summaries = get_student_attendance_summary_inline(class_id, 60)
     
     insights = {
         'at_risk_students': [],
@@ -2093,6 +3660,509 @@ def generate_attendance_report_inline(start_date, end_date, class_id=None):
     
     return report_data
 
+# Shared analytics frame
+ANALYTICS_DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+class AttendanceFrame:
+    """
+    A teacher's attendance records for one date window, held as compact columns.
+    
+    The analytics dashboard loads the widest window it needs once and derives
+    trends, student summaries, class comparison, time-of-day analysis and
+    predictive insights from it, instead of querying the Attendance table
+    separately for every panel. Rows are kept in (date, id) order.
+    """
+    
+    def __init__(self, end_date):
+        self.end_date = end_date
+        self.student_ids = array('i')
+        self.class_ids = array('i')
+        self.dates = array('i')          # date ordinals
+        self.statuses = array('b')       # index into status_names
+        self.late_minutes = array('i')
+        self.scan_hours = array('b')     # -1 when there is no scan time
+        self.status_names = []
+        self._status_codes = {}
+    
+    @classmethod
+    def load(cls, teacher_id, days, end_date=None):
+        """
+        Read a teacher's attendance for the last `days` days in a single query
+        
+        Args:
+            teacher_id (int): Owner of the classes to include
+            days (int): Window length; the window covers end_date - days .. end_date
+            end_date (date): Last day of the window (defaults to today)
+        
+        Returns:
+            AttendanceFrame: Frame covering every class of the teacher
+        """
+        frame = cls(end_date or date.today())
+        start_date = frame.end_date - timedelta(days=days)
+        
+        rows = db.session.query(
+            Attendance.student_id,
+            Attendance.class_id,
+            Attendance.date,
+            Attendance.status,
+            Attendance.late_minutes,
+            Attendance.scan_time
+        ).join(Class).filter(
+            Class.teacher_id == teacher_id,
+            Attendance.date >= start_date,
+            Attendance.date <= frame.end_date
+        ).order_by(Attendance.date, Attendance.id).yield_per(5000)
+        
+        for student_id, class_id, attendance_date, status, late_minutes, scan_time in rows:
+            frame.student_ids.append(student_id)
+            frame.class_ids.append(class_id)
+            frame.dates.append(attendance_date.toordinal())
+            frame.statuses.append(frame._status_code(status))
+            frame.late_minutes.append(late_minutes or 0)
+            frame.scan_hours.append(scan_time.hour if scan_time else -1)
+        return frame
+    
+    def __len__(self):
+        return len(self.dates)
+    
+    def _status_code(self, status):
+        code = self._status_codes.get(status)
+        if code is None:
+            code = self._status_codes[status] = len(self.status_names)
+            self.status_names.append(status)
+        return code
+    
+    def _rows(self, days, class_id=None):
+        """Row positions within the last `days` days, optionally for one class"""
+        first = bisect_left(self.dates, (self.end_date - timedelta(days=days)).toordinal())
+        if not class_id or class_id == 'all':
+            return range(first, len(self.dates))
+        try:
+            class_id = int(class_id)
+        except (TypeError, ValueError):
+            return range(0)
+        class_ids = self.class_ids
+        return [i for i in range(first, len(self.dates)) if class_ids[i] == class_id]
+    
+    def trends(self, days=30, class_id=None):
+        """Daily status counts, matching calculate_attendance_trends_inline"""
+        start_date = self.end_date - timedelta(days=days)
+        daily = {}
+        for i in self._rows(days, class_id):
+            counts = daily.setdefault(self.dates[i], defaultdict(int))
+            counts[self.statuses[i]] += 1
+        
+        trends = {}
+        for ordinal, counts in sorted(daily.items()):
+            date_str = date.fromordinal(ordinal).strftime('%Y-%m-%d')
+            trends[date_str] = {'Present': 0, 'Late': 0, 'Absent': 0, 'Excused': 0}
+            for code, count in sorted(counts.items(), key=lambda item: self.status_names[item[0]]):
+                trends[date_str][self.status_names[code]] = count
+        
+        return self._fill_missing_dates(trends, start_date)
+    
+    def _fill_missing_dates(self, trends, start_date):
+        """Add zero rows for days in the window without any records"""
+        current_date = start_date
+        while current_date <= self.end_date:
+            date_str = current_date.strftime('%Y-%m-%d')
+            if date_str not in trends:
+                trends[date_str] = {'Present': 0, 'Late': 0, 'Absent': 0, 'Excused': 0}
+            current_date += timedelta(days=1)
+        return trends
+    
+    def student_summaries(self, students, class_id=None, days=30):
+        """Per-student summaries, matching get_student_attendance_summary_inline"""
+        names = self.status_names
+        recent_from = max(self.end_date - timedelta(days=days), self.end_date - timedelta(days=7)).toordinal()
+        
+        # student_id -> [total, by-status counts, late minutes sum, late minutes count, recent pattern]
+        totals = {}
+        for i in self._rows(days, class_id):
+            entry = totals.get(self.student_ids[i])
+            if entry is None:
+                entry = totals[self.student_ids[i]] = [0, defaultdict(int), 0, 0, []]
+            status = names[self.statuses[i]]
+            entry[0] += 1
+            entry[1][status] += 1
+            if status == 'Late' and self.late_minutes[i] > 0:
+                entry[2] += self.late_minutes[i]
+                entry[3] += 1
+            if self.dates[i] >= recent_from:
+                entry[4].append(status)
+        
+        student_summaries = []
+        for student in students:
+            total_days, status_counts, late_sum, late_n, recent_pattern = \
+                totals.get(student.id, (0, {}, 0, 0, []))
+            present_count = status_counts.get('Present', 0)
+            late_count = status_counts.get('Late', 0)
+            absent_count = status_counts.get('Absent', 0)
+            excused_count = status_counts.get('Excused', 0)
+            avg_late_minutes = late_sum / late_n if late_n else 0
+            
+            attendance_rate = ((present_count + late_count) / total_days * 100) if total_days > 0 else 0
+            
+            student_summaries.append({
+                'student': student,
+                'total_days': total_days,
+                'present_count': present_count,
+                'late_count': late_count,
+                'absent_count': absent_count,
+                'excused_count': excused_count,
+                'attendance_rate': round(attendance_rate, 1),
+                'avg_late_minutes': round(avg_late_minutes, 1),
+                'recent_pattern': recent_pattern,
+                'risk_level': calculate_risk_level_inline(attendance_rate, absent_count, late_count)
+            })
+        
+        return sorted(student_summaries, key=lambda x: x['attendance_rate'])
+    
+    def class_comparison(self, classes, days=30):
+        """Per-class attendance comparison, matching get_class_comparison_data_inline"""
+        names = self.status_names
+        # class_id -> [total, present, late, absent, {date ordinal: attending count}]
+        per_class = {}
+        for i in self._rows(days):
+            entry = per_class.get(self.class_ids[i])
+            if entry is None:
+                entry = per_class[self.class_ids[i]] = [0, 0, 0, 0, defaultdict(int)]
+            status = names[self.statuses[i]]
+            entry[0] += 1
+            if status == 'Present':
+                entry[1] += 1
+                entry[4][self.dates[i]] += 1
+            elif status == 'Late':
+                entry[2] += 1
+                entry[4][self.dates[i]] += 1
+            elif status == 'Absent':
+                entry[3] += 1
+        
+        comparison_data = []
+        for class_ in classes:
+            if class_.id not in per_class:
+                continue
+            total_records, present_count, late_count, absent_count, daily_attendance = per_class[class_.id]
+            attendance_rate = ((present_count + late_count) / total_records * 100) if total_records > 0 else 0
+            avg_daily_attendance = sum(daily_attendance.values()) / len(daily_attendance) if daily_attendance else 0
+            
+            comparison_data.append({
+                'class_name': class_.name,
+                'class_id': class_.id,
+                'total_records': total_records,
+                'attendance_rate': round(attendance_rate, 1),
+                'avg_daily_attendance': round(avg_daily_attendance, 1),
+                'present_count': present_count,
+                'late_count': late_count,
+                'absent_count': absent_count,
+                'start_time': class_.start_time.strftime('%H:%M') if class_.start_time else 'N/A',
+                'end_time': class_.end_time.strftime('%H:%M') if class_.end_time else 'N/A'
+            })
+        
+        return sorted(comparison_data, key=lambda x: x['attendance_rate'], reverse=True)
+    
+    def time_analytics(self, class_id=None, days=30):
+        """Day-of-week and late-arrival-hour analysis, matching get_time_based_analytics_inline"""
+        names = self.status_names
+        day_stats = defaultdict(lambda: {'Present': 0, 'Late': 0, 'Absent': 0, 'Excused': 0, 'total': 0})
+        hour_stats = defaultdict(lambda: {'count': 0, 'late_minutes': 0})
+        
+        for i in self._rows(days, class_id):
+            status = names[self.statuses[i]]
+            # date.fromordinal(n).weekday() == (n - 1) % 7
+            stats = day_stats[ANALYTICS_DAY_NAMES[(self.dates[i] - 1) % 7]]
+            stats[status] += 1
+            stats['total'] += 1
+            
+            if status == 'Late' and self.scan_hours[i] >= 0:
+                hour = hour_stats[self.scan_hours[i]]
+                hour['count'] += 1
+                hour['late_minutes'] += self.late_minutes[i]
+        
+        day_analysis = []
+        for day in ANALYTICS_DAY_NAMES:
+            stats = day_stats[day]
+            if stats['total'] > 0:
+                attendance_rate = ((stats['Present'] + stats['Late']) / stats['total']) * 100
+                day_analysis.append({
+                    'day': day,
+                    'attendance_rate': round(attendance_rate, 1),
+                    'total_records': stats['total'],
+                    'present': stats['Present'],
+                    'late': stats['Late'],
+                    'absent': stats['Absent']
+                })
+        
+        hour_analysis = []
+        for hour in range(24):
+            if hour in hour_stats:
+                avg_late_minutes = hour_stats[hour]['late_minutes'] / hour_stats[hour]['count']
+                hour_analysis.append({
+                    'hour': hour,
+                    'hour_display': f"{hour:02d}:00",
+                    'late_count': hour_stats[hour]['count'],
+                    'avg_late_minutes': round(avg_late_minutes, 1)
+                })
+        
+        return {
+            'day_analysis': day_analysis,
+            'hour_analysis': sorted(hour_analysis, key=lambda x: x['late_count'], reverse=True)
+        }
+
+class NumpyAttendanceFrame(AttendanceFrame):
+    """
+    AttendanceFrame backed by typed numpy arrays.
+    
+    Columns are read with pandas.read_sql (status as an int8 category code,
+    date as int32 day ordinals, late minutes as int16) and every panel is
+    computed with np.bincount/np.unique instead of per-row Python loops.
+    Selected with ANALYTICS_BACKEND = 'numpy'; results match AttendanceFrame.
+    """
+    
+    @classmethod
+    def load(cls, teacher_id, days, end_date=None):
+        """Read a teacher's attendance for the last `days` days into numpy columns"""
+        frame = cls(end_date or date.today())
+        start_date = frame.end_date - timedelta(days=days)
+        
+        query = select(
+            Attendance.student_id,
+            Attendance.class_id,
+            type_coerce(Attendance.date, String).label('date'),
+            Attendance.status,
+            Attendance.late_minutes,
+            extract('hour', Attendance.scan_time).label('scan_hour')
+        ).join(Class).where(
+            Class.teacher_id == teacher_id,
+            Attendance.date >= start_date,
+            Attendance.date <= frame.end_date
+        ).order_by(Attendance.date, Attendance.id)
+        df = pd.read_sql(query, db.session.connection())
+        
+        statuses = pd.Categorical(df['status'].astype(str))
+        frame.status_names = [str(name) for name in statuses.categories]
+        frame._status_codes = {name: code for code, name in enumerate(frame.status_names)}
+        frame.statuses = statuses.codes.astype(np.int8)
+        frame.student_ids = df['student_id'].to_numpy(dtype=np.int32)
+        frame.class_ids = df['class_id'].to_numpy(dtype=np.int32)
+        epoch_days = pd.to_datetime(df['date']).to_numpy().astype('datetime64[D]').astype(np.int32)
+        frame.dates = epoch_days + np.int32(EPOCH_ORDINAL)
+        frame.late_minutes = df['late_minutes'].fillna(0).to_numpy(dtype=np.int16)
+        frame.scan_hours = df['scan_hour'].fillna(-1).to_numpy(dtype=np.int8)
+        return frame
+    
+    def _code(self, status):
+        return self._status_codes.get(status, -1)
+    
+    def _rows(self, days, class_id=None):
+        """Row positions within the last `days` days, optionally for one class"""
+        first = int(np.searchsorted(self.dates, (self.end_date - timedelta(days=days)).toordinal()))
+        if not class_id or class_id == 'all':
+            return np.arange(first, len(self.dates))
+        try:
+            class_id = int(class_id)
+        except (TypeError, ValueError):
+            return np.arange(0)
+        return first + np.flatnonzero(self.class_ids[first:] == class_id)
+    
+    def _counts_by(self, groups, group_count, rows):
+        """Status counts per group as a (group_count, statuses) list of lists"""
+        ncat = len(self.status_names)
+        cells = groups.astype(np.int64) * ncat + self.statuses[rows]
+        return np.bincount(cells, minlength=group_count * ncat).reshape(group_count, ncat).tolist()
+    
+    def trends(self, days=30, class_id=None):
+        """Daily status counts, matching calculate_attendance_trends_inline"""
+        start_date = self.end_date - timedelta(days=days)
+        rows = self._rows(days, class_id)
+        names = self.status_names
+        
+        trends = {}
+        if len(rows):
+            offsets = self.dates[rows] - start_date.toordinal()
+            counts = self._counts_by(offsets, days + 1, rows)
+            order = sorted(range(len(names)), key=names.__getitem__)
+            for offset, day_counts in enumerate(counts):
+                if not any(day_counts):
+                    continue
+                date_str = (start_date + timedelta(days=offset)).strftime('%Y-%m-%d')
+                trends[date_str] = {'Present': 0, 'Late': 0, 'Absent': 0, 'Excused': 0}
+                for code in order:
+                    if day_counts[code]:
+                        trends[date_str][names[code]] = day_counts[code]
+        
+        return self._fill_missing_dates(trends, start_date)
+    
+    def student_summaries(self, students, class_id=None, days=30):
+        """Per-student summaries, matching get_student_attendance_summary_inline"""
+        rows = self._rows(days, class_id)
+        recent_from = max(self.end_date - timedelta(days=days), self.end_date - timedelta(days=7)).toordinal()
+        present, late, absent, excused = (self._code(s) for s in ('Present', 'Late', 'Absent', 'Excused'))
+        
+        student_ids, groups = np.unique(self.student_ids[rows], return_inverse=True)
+        group_count = len(student_ids)
+        counts = self._counts_by(groups, group_count, rows)
+        
+        codes = self.statuses[rows]
+        late_minutes = self.late_minutes[rows]
+        late_mask = (codes == late) & (late_minutes > 0)
+        late_sums = np.bincount(groups[late_mask], weights=late_minutes[late_mask], minlength=group_count).tolist()
+        late_ns = np.bincount(groups[late_mask], minlength=group_count).tolist()
+        
+        # Recent statuses grouped per student, keeping (date, id) order within each group
+        recent = self.dates[rows] >= recent_from
+        recent_groups = groups[recent]
+        order = np.argsort(recent_groups, kind='stable')
+        bounds = np.cumsum(np.bincount(recent_groups, minlength=group_count))[:-1]
+        status_names = np.array(self.status_names, dtype=object)
+        patterns = np.split(status_names[codes[recent][order]], bounds) if group_count else []
+        
+        position = {student_id: i for i, student_id in enumerate(student_ids.tolist())}
+        column = lambda row, code: row[code] if code >= 0 else 0
+        
+        student_summaries = []
+        for student in students:
+            i = position.get(student.id)
+            if i is None:
+                total_days = present_count = late_count = absent_count = excused_count = 0
+                avg_late_minutes = 0
+                recent_pattern = []
+            else:
+                row = counts[i]
+                total_days = sum(row)
+                present_count = column(row, present)
+                late_count = column(row, late)
+                absent_count = column(row, absent)
+                excused_count = column(row, excused)
+                avg_late_minutes = late_sums[i] / late_ns[i] if late_ns[i] else 0
+                recent_pattern = patterns[i].tolist()
+            
+            attendance_rate = ((present_count + late_count) / total_days * 100) if total_days > 0 else 0
+            
+            student_summaries.append({
+                'student': student,
+                'total_days': total_days,
+                'present_count': present_count,
+                'late_count': late_count,
+                'absent_count': absent_count,
+                'excused_count': excused_count,
+                'attendance_rate': round(attendance_rate, 1),
+                'avg_late_minutes': round(avg_late_minutes, 1),
+                'recent_pattern': recent_pattern,
+                'risk_level': calculate_risk_level_inline(attendance_rate, absent_count, late_count)
+            })
+        
+        return sorted(student_summaries, key=lambda x: x['attendance_rate'])
+    
+    def class_comparison(self, classes, days=30):
+        """Per-class attendance comparison, matching get_class_comparison_data_inline"""
+        rows = self._rows(days)
+        present, late, absent = (self._code(s) for s in ('Present', 'Late', 'Absent'))
+        
+        class_ids, groups = np.unique(self.class_ids[rows], return_inverse=True)
+        group_count = len(class_ids)
+        counts = self._counts_by(groups, group_count, rows)
+        
+        # Distinct (class, date) pairs with at least one attending student
+        codes = self.statuses[rows]
+        attending = (codes == present) | (codes == late)
+        offsets = self.dates[rows][attending] - (self.end_date - timedelta(days=days)).toordinal()
+        pairs = np.unique(groups[attending].astype(np.int64) * (days + 1) + offsets)
+        attended_days = np.bincount(pairs // (days + 1), minlength=group_count).tolist()
+        
+        position = {class_id: i for i, class_id in enumerate(class_ids.tolist())}
+        column = lambda row, code: row[code] if code >= 0 else 0
+        
+        comparison_data = []
+        for class_ in classes:
+            i = position.get(class_.id)
+            if i is None:
+                continue
+            row = counts[i]
+            total_records = sum(row)
+            present_count = column(row, present)
+            late_count = column(row, late)
+            absent_count = column(row, absent)
+            attendance_rate = ((present_count + late_count) / total_records * 100) if total_records > 0 else 0
+            avg_daily_attendance = (present_count + late_count) / attended_days[i] if attended_days[i] else 0
+            
+            comparison_data.append({
+                'class_name': class_.name,
+                'class_id': class_.id,
+                'total_records': total_records,
+                'attendance_rate': round(attendance_rate, 1),
+                'avg_daily_attendance': round(avg_daily_attendance, 1),
+                'present_count': present_count,
+                'late_count': late_count,
+                'absent_count': absent_count,
+                'start_time': class_.start_time.strftime('%H:%M') if class_.start_time else 'N/A',
+                'end_time': class_.end_time.strftime('%H:%M') if class_.end_time else 'N/A'
+            })
+        
+        return sorted(comparison_data, key=lambda x: x['attendance_rate'], reverse=True)
+    
+    def time_analytics(self, class_id=None, days=30):
+        """Day-of-week and late-arrival-hour analysis, matching get_time_based_analytics_inline"""
+        rows = self._rows(days, class_id)
+        present, late, absent = (self._code(s) for s in ('Present', 'Late', 'Absent'))
+        column = lambda row, code: row[code] if code >= 0 else 0
+        
+        # date.fromordinal(n).weekday() == (n - 1) % 7
+        day_counts = self._counts_by((self.dates[rows] - 1) % 7, 7, rows)
+        day_analysis = []
+        for weekday, day in enumerate(ANALYTICS_DAY_NAMES):
+            row = day_counts[weekday]
+            total = sum(row)
+            if total > 0:
+                attendance_rate = ((column(row, present) + column(row, late)) / total) * 100
+                day_analysis.append({
+                    'day': day,
+                    'attendance_rate': round(attendance_rate, 1),
+                    'total_records': total,
+                    'present': column(row, present),
+                    'late': column(row, late),
+                    'absent': column(row, absent)
+                })
+        
+        hours = self.scan_hours[rows]
+        late_mask = (self.statuses[rows] == late) & (hours >= 0)
+        late_counts = np.bincount(hours[late_mask], minlength=24).tolist()
+        late_sums = np.bincount(hours[late_mask], weights=self.late_minutes[rows][late_mask], minlength=24).tolist()
+        
+        hour_analysis = []
+        for hour in range(24):
+            if late_counts[hour]:
+                hour_analysis.append({
+                    'hour': hour,
+                    'hour_display': f"{hour:02d}:00",
+                    'late_count': late_counts[hour],
+                    'avg_late_minutes': round(late_sums[hour] / late_counts[hour], 1)
+                })
+        
+        return {
+            'day_analysis': day_analysis,
+            'hour_analysis': sorted(hour_analysis, key=lambda x: x['late_count'], reverse=True)
+        }
+
+ANALYTICS_BACKENDS = {'python': AttendanceFrame, 'numpy': NumpyAttendanceFrame}
+
+def load_analytics_frame(teacher_id, days):
+    """
+    Load an analytics frame with the backend named by ANALYTICS_BACKEND
+    
+    Args:
+        teacher_id (int): Owner of the classes to include
+        days (int): Window length in days, ending today
+    
+    Returns:
+        AttendanceFrame: Python or numpy backed frame with the same interface
+    """
+    backend = app.config['ANALYTICS_BACKEND']
+    if backend not in ANALYTICS_BACKENDS:
+        raise ValueError(f"Unknown ANALYTICS_BACKEND '{backend}', expected one of {sorted(ANALYTICS_BACKENDS)}")
+    return ANALYTICS_BACKENDS[backend].load(teacher_id, days)
+
 # Enhanced Analytics Routes
 @app.route('/analytics')
 @login_required
@@ -2106,12 +4176,22 @@ def analytics_dashboard():
     # Get all classes for filter dropdown
     classes = Class.query.filter_by(teacher_id=current_user.id).all()
     
-    # Calculate analytics data using inline functions to avoid import issues
-    trends_data = calculate_attendance_trends_inline(days, class_id)
-    student_summaries = get_student_attendance_summary_inline(class_id, days)
-    class_comparison = get_class_comparison_data_inline(days)
-    time_analytics = get_time_based_analytics_inline(class_id, days)
-    predictive_insights = get_predictive_insights_inline(class_id)
+    # Read the attendance table once for the selected window
+    frame = load_analytics_frame(current_user.id, days)
+    
+    students_query = Student.query
+    if class_id and class_id != 'all':
+        students_query = students_query.filter(Student.class_id == class_id)
+    students = students_query.order_by(Student.id).all()
+    
+    trends_data = frame.trends(days, class_id)
+    student_summaries = frame.student_summaries(students, class_id, days)
+    class_comparison = frame.class_comparison(classes, days)
+    time_analytics = frame.time_analytics(class_id, days)
+    # At-risk students come from the rolling 60-day counters rather than the raw records
+    predictive_insights = get_predictive_insights_inline(
+        class_id, get_attendance_risk_summaries(students, current_user.id, class_id)
+    )
     
     # Prepare chart data for frontend
     chart_data = {
@@ -2179,6 +4259,74 @@ def generate_report():
                              classes=classes,
                              selected_class_id=class_id)
 
+# Columnar export for warehouse loads
+ATTENDANCE_PARQUET_SCHEMA = pa.schema([
+    ('attendance_id', pa.int64()),
+    ('date', pa.date32()),
+    ('student_id', pa.int64()),
+    ('student_name', pa.string()),
+    ('student_number', pa.string()),
+    ('class_id', pa.int64()),
+    ('class_name', pa.dictionary(pa.int32(), pa.string())),
+    ('teacher_id', pa.int64()),
+    ('status', pa.dictionary(pa.int8(), pa.string())),
+    ('scan_time', pa.time64('us')),
+    ('arrival_time', pa.time64('us')),
+    ('late_arrival', pa.bool_()),
+    ('late_minutes', pa.int32()),
+    ('notes', pa.string()),
+])
+
+def write_attendance_parquet(sink, teacher_id=None, start_date=None, end_date=None, class_id='all',
+                             row_group_size=PARQUET_ROW_GROUP_SIZE):
+    """
+    Write attendance joined with student and class names as a Parquet file.
+
+    Rows are fetched from the database in chunks of row_group_size and each
+    chunk is written as one row group, so memory use does not grow with the
+    size of the export.
+
+    Args:
+        sink: File path or binary file object to write to
+        teacher_id (int): Only export this teacher's classes (None for all teachers)
+        start_date (date): First day to export (None for no lower bound)
+        end_date (date): Last day to export (None for no upper bound)
+        class_id: Class ID or 'all'
+        row_group_size (int): Rows per chunk / row group
+
+    Returns:
+        int: Number of rows written
+    """
+    stmt = select(
+        Attendance.id, Attendance.date, Attendance.student_id, Student.name, Student.student_number,
+        Attendance.class_id, Class.name, Class.teacher_id, Attendance.status, Attendance.scan_time,
+        Attendance.arrival_time, Attendance.late_arrival, Attendance.late_minutes, Attendance.notes
+    ).select_from(Attendance).join(
+        Student, Attendance.student_id == Student.id
+    ).join(
+        Class, Attendance.class_id == Class.id
+    )
+    if teacher_id is not None:
+        stmt = stmt.where(Class.teacher_id == teacher_id)
+    if start_date is not None:
+        stmt = stmt.where(Attendance.date >= start_date)
+    if end_date is not None:
+        stmt = stmt.where(Attendance.date <= end_date)
+    if class_id != 'all':
+        stmt = stmt.where(Class.id == class_id)
+    stmt = stmt.order_by(Attendance.date, Attendance.id).execution_options(yield_per=row_group_size)
+
+    row_count = 0
+    with pq.ParquetWriter(sink, ATTENDANCE_PARQUET_SCHEMA, compression='zstd') as writer:
+        for rows in db.session.execute(stmt).partitions(row_group_size):
+            columns = list(zip(*rows))
+            writer.write_batch(pa.record_batch(
+                [pa.array(values, type=field.type) for values, field in zip(columns, ATTENDANCE_PARQUET_SCHEMA)],
+                schema=ATTENDANCE_PARQUET_SCHEMA
+            ), row_group_size=row_group_size)
+            row_count += len(rows)
+    return row_count
+
 @app.route('/analytics/export/csv')
 @login_required
 def export_csv():
@@ -2195,10 +4343,11 @@ def export_csv():
         start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
         end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
     
-    # Query attendance data
+    # Query only the exported columns, fetched in batches while the response streams
     query = db.session.query(
-        Attendance, Student, Class
-    ).join(
+        Attendance.date, Student.name, Student.student_number, Class.name.label('class_name'),
+        Attendance.status, Attendance.scan_time, Attendance.late_minutes, Attendance.notes
+    ).select_from(Attendance).join(
         Student, Attendance.student_id == Student.id
     ).join(
         Class, Attendance.class_id == Class.id
@@ -2211,39 +4360,64 @@ def export_csv():
     if class_id != 'all':
         query = query.filter(Class.id == class_id)
     
-    records = query.all()
-    
-    # Create CSV content
-    output = io.StringIO()
-    writer = csv.writer(output)
+    rows = query.order_by(Attendance.date, Attendance.id).yield_per(CSV_EXPORT_BATCH_SIZE)
     
-    # Write header
-    writer.writerow([
+    def generate():
+        for r in rows:
+            yield [
+                r.date.strftime('%Y-%m-%d'),
+                r.name,
+                r.student_number,
+                r.class_name,
+                r.status,
+                r.scan_time.strftime('%H:%M:%S') if r.scan_time else '',
+                r.late_minutes or 0,
+                r.notes or ''
+            ]
+    
+    header = [
         'Date', 'Student Name', 'Student Number', 'Class', 
         'Status', 'Scan Time', 'Late Minutes', 'Notes'
-    ])
-    
-    # Write data
-    for attendance, student, class_obj in records:
-        writer.writerow([
-            attendance.date.strftime('%Y-%m-%d'),
-            student.name,
-            student.student_number,
-            class_obj.name,
-            attendance.status,
-            attendance.scan_time.strftime('%H:%M:%S') if attendance.scan_time else '',
-            attendance.late_minutes or 0,
-            attendance.notes or ''
-        ])
-    
-    output.seek(0)
+    ]
     
     return Response(
-        output.getvalue(),
+        stream_with_context(iter_csv(header, generate())),
         mimetype='text/csv',
         headers={'Content-Disposition': f'attachment; filename=attendance_export_{start_date}_{end_date}.csv'}
     )
 
+@app.route('/analytics/export/parquet')
+@login_required
+def export_parquet():
+    """Export attendance data as a Parquet file for warehouse loads"""
+    start_date_str = request.args.get('start_date')
+    end_date_str = request.args.get('end_date')
+    class_id = request.args.get('class_id', 'all')
+    
+    # Default to last 30 days, same as the CSV export
+    if not start_date_str or not end_date_str:
+        end_date = date.today()
+        start_date = end_date - timedelta(days=30)
+    else:
+        try:
+            start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
+            end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
+        except ValueError:
+            flash('Invalid date format', 'danger')
+            return redirect(url_for('analytics_dashboard'))
+    
+    # The Parquet footer is written last, so build the file on disk and send it once complete
+    output = tempfile.TemporaryFile()
+    write_attendance_parquet(output, current_user.id, start_date, end_date, class_id)
+    output.seek(0)
+    
+    return send_file(
+        output,
+        mimetype='application/vnd.apache.parquet',
+        as_attachment=True,
+        download_name=f'attendance_export_{start_date}_{end_date}.parquet'
+    )
+
 @app.route('/api/analytics/trends')
 @login_required
 def api_trends():
@@ -2287,8 +4461,328 @@ def api_student_analytics():
         'data': data
     }
 
+# Incremental change feed; deletions come first so a change_seq's deletes are applied before its writes
+CHANGE_FEED_MODELS = [('deleted', ChangeTombstone), ('attendance', Attendance), ('excuse_request', ExcuseRequest)]
+
+def parse_change_cursor(cursor):
+    """
+    Parse a /api/changes cursor into a (change_seq, kind, id) position.
+    
+    Cursors look like '<change_seq>.<kind>.<id>'. A bare change_seq means
+    everything up to and including that change has been seen, and an empty
+    cursor starts from the beginning.
+    
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    if not cursor:
+        return (0, len(CHANGE_FEED_MODELS), 0)
+    parts = [int(part) for part in cursor.split('.')]
+    if len(parts) == 1:
+        return (parts[0], len(CHANGE_FEED_MODELS), 0)
+    if len(parts) != 3 or not 0 <= parts[1] < len(CHANGE_FEED_MODELS):
+        raise ValueError(f'Invalid cursor: {cursor}')
+    return tuple(parts)
+
+def _serialize_change_value(value):
+    if isinstance(value, (date, time, datetime)):
+        return value.isoformat()
+    return value
+
+def get_changes_since(teacher_id, cursor, limit=CHANGES_PAGE_SIZE):
+    """
+    Rows of a teacher's attendance and excuse requests written or deleted after a cursor.
+    
+    Each table is read with a keyset query on (teacher_id, change_seq, id), so
+    the cost of a page depends on the page size, not on the table size. Rows
+    from one write transaction share a change_seq and are ordered by table and
+    id, which lets a large bulk write be split over several pages. Deleted
+    rows come from change_tombstone and only carry their id.
+    
+    Args:
+        teacher_id (int): Only return this teacher's rows
+        cursor (tuple): Position from parse_change_cursor()
+        limit (int): Maximum rows to return
+    
+    Returns:
+        tuple: (list of change dicts, next cursor tuple, has_more)
+    """
+    seq, kind, row_id = cursor
+    candidates = []
+    for model_kind, (table_name, model) in enumerate(CHANGE_FEED_MODELS):
+        if model_kind > kind:
+            after = model.change_seq >= seq
+        elif model_kind == kind:
+            after = tuple_(model.change_seq, model.id) > (seq, row_id)
+        else:
+            after = model.change_seq > seq
+        columns = model.__table__.columns
+        rows = db.session.execute(
+            select(*columns).where(model.teacher_id == teacher_id, after)
+            .order_by(model.change_seq, model.id).limit(limit + 1)
+        ).all()
+        candidates.extend(((row.change_seq, model_kind, row.id), table_name, row) for row in rows)
+    
+    candidates.sort(key=lambda candidate: candidate[0])
+    page = candidates[:limit]
+    changes = []
+    for position, table_name, row in page:
+        if table_name == 'deleted':
+            change = {'type': row.table_name, 'op': 'delete', 'data': {'id': row.row_id}}
+        else:
+            change = {'type': table_name, 'op': 'upsert',
+                      'data': {key: _serialize_change_value(value) for key, value in row._mapping.items()}}
+        changes.append({'cursor': '.'.join(map(str, position)), **change})
+    next_cursor = page[-1][0] if page else cursor
+    return changes, next_cursor, len(candidates) > limit
+
+@app.route('/api/changes')
+@login_required
+def api_changes():
+    """API endpoint for incremental syncs - attendance and excuse request rows changed or deleted after a cursor"""
+    try:
+        cursor = parse_change_cursor(request.args.get('since', ''))
+        limit = int(request.args.get('limit', CHANGES_PAGE_SIZE))
+    except ValueError:
+        return {'success': False, 'message': 'Invalid cursor or limit.'}, 400
+    limit = max(1, min(limit, CHANGES_MAX_PAGE_SIZE))
+    
+    changes, next_cursor, has_more = get_changes_since(current_user.id, cursor, limit)
+    
+    return {
+        'success': True,
+        'changes': changes,
+        'next_cursor': '.'.join(map(str, next_cursor)),
+        'has_more': has_more
+    }
+
+# Background jobs
+scheduler = JobScheduler()
+scheduler.add_job('expire_excuses', run_excuse_expiry_job,
+                  interval=app.config['EXCUSE_EXPIRY_INTERVAL'].total_seconds())
+
+background_jobs_lock = threading.Lock()
+
+def run_class_close_sync_job():
+    """Scheduler entry point - queue the class close sweeps for the current class end times"""
+    with app.app_context():
+        schedule_class_closings()
+
+def start_background_jobs():
+    """
+    Schedule the periodic jobs and start the scheduler thread.
+    
+    Call it in one process only (see `flask run-scheduler`): every process
+    that starts it runs each job again against the same database.
+    """
+    with background_jobs_lock:
+        if scheduler.is_running():
+            return
+        if app.config['AUTO_CLOSE_CLASSES']:
+            scheduler.add_job('sync_class_closings', run_class_close_sync_job,
+                              interval=app.config['CLASS_CLOSE_SYNC_INTERVAL'].total_seconds())
+        schedule_counter_roll()
+        scheduler.start()
+        with app.app_context():
+            schedule_class_closings()
+
+@app.cli.command('run-scheduler')
+def run_scheduler_command():
+    """
+    Run the background jobs (excuse expiry, counter roll, class close) until interrupted.
+    
+    Start exactly one of these next to the web server processes, e.g. as its
+    own systemd service or supervisor program.
+    """
+    start_background_jobs()
+    print('Scheduler running, press Ctrl+C to stop.')
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        scheduler.stop()
+
+@app.cli.command('expire-excuses')
+def expire_excuses_command():
+    """
+    Expire pending excuse requests older than 7 days.
+    
+    For servers without `flask run-scheduler`, schedule it from cron instead, e.g.
+    0 * * * * cd /path/to/app && flask --app app expire-excuses
+    """
+    expired_count = auto_expire_pending_excuses()
+    print(f'Expired {expired_count} pending excuse requests older than 7 days.')
+
+@app.cli.command('rebuild-daily-stats')
+def rebuild_daily_stats_command():
+    """Recompute the daily_class_stats rollup from attendance and excuse requests"""
+    row_count = rebuild_daily_class_stats()
+    print(f'Rebuilt daily_class_stats with {row_count} class/day rows.')
+
+@app.cli.command('rebuild-attendance-counters')
+def rebuild_attendance_counters_command():
+    """Recompute the rolling per-student attendance counters from attendance"""
+    row_count = rebuild_attendance_counters()
+    db.session.commit()
+    print(f'Rebuilt {row_count} student/class attendance counters.')
+
+@app.cli.command('export-parquet')
+@click.argument('output')
+@click.option('--start-date', type=click.DateTime(formats=['%Y-%m-%d']), help='First day to export (YYYY-MM-DD)')
+@click.option('--end-date', type=click.DateTime(formats=['%Y-%m-%d']), help='Last day to export (YYYY-MM-DD)')
+@click.option('--teacher-id', type=int, help='Only export classes of this teacher')
+@click.option('--class-id', default='all', help='Only export this class')
+def export_parquet_command(output, start_date, end_date, teacher_id, class_id):
+    """Write attendance joined with students and classes to a Parquet file (for warehouse loads)"""
+    row_count = write_attendance_parquet(
+        output, teacher_id,
+        start_date.date() if start_date else None,
+        end_date.date() if end_date else None,
+        class_id
+    )
+    print(f'Wrote {row_count} attendance rows to {output}.')
+
+@app.cli.command('import-students')
+@click.argument('csv_path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=STUDENT_IMPORT_BATCH_SIZE, show_default=True, help='Students per INSERT statement')
+def import_students_command(csv_path, batch_size):
+    """Import students from a CSV file with Name and Student Number columns"""
+    job = new_student_import_job(None, os.path.basename(csv_path))
+    import_students_csv(csv_path, job, batch_size)
+    for error in job['errors']:
+        print(error)
+    if job['skipped'] > len(job['errors']):
+        print(f'... and {job["skipped"] - len(job["errors"])} more rows skipped.')
+    print(f'Imported {job["created"]} of {job["rows"]} students ({job["skipped"]} skipped).')
+
+@app.cli.command('regenerate-qr-codes')
+@click.option('--force', is_flag=True, help='Render every image again, even if its file exists')
+@click.option('--prune', is_flag=True, help='Delete files in static/qr that no student number maps to')
+def regenerate_qr_codes_command(force, prune):
+    """Render the content-addressed QR images badge sheets print, skipping ones already on disk"""
+    numbers = [number for (number,) in db.session.query(Student.student_number)]
+    checked, failed = qr_codes.write_all(numbers, overwrite=force)
+    print(f'{len(numbers)} students, {checked} QR images checked, {failed} failed.')
+    
+    if prune:
+        keep = {os.path.basename(qr_codes.path_for(number)) for number in numbers}
+        removed = 0
+        for filename in os.listdir(qr_codes.directory):
+            if filename.endswith('.png') and filename not in keep:
+                os.remove(os.path.join(qr_codes.directory, filename))
+                removed += 1
+        print(f'Removed {removed} unused QR images.')
+
+@app.cli.command('backfill-photo-variants')
+@click.option('--force', is_flag=True, help='Make every variant again, even if its file exists')
+def backfill_photo_variants_command(force):
+    """Make the resized thumbnails for student photos uploaded before they existed"""
+    locations = {path for (path,) in db.session.query(Student.photo_path).filter(Student.photo_path.isnot(None))}
+    blob_keys = sorted(location for location in locations if is_blob_key(location))
+    photo_paths = sorted(location for location in locations
+                         if not is_blob_key(location) and os.path.exists(location))
+    
+    written = 0
+    failed = []
+    with ProcessPoolExecutor(max_workers=PHOTO_WORKERS) as executor:
+        batches = [photo_paths[start:start + 50] for start in range(0, len(photo_paths), 50)]
+        for batch_written, batch_failed in executor.map(backfill_photo_variants, batches, [force] * len(batches)):
+            written += batch_written
+            failed.extend(batch_failed)
+    for key in blob_keys:
+        try:
+            written += store_photo_variants(key, overwrite=force)
+        except (OSError, ValueError) as error:
+            failed.append((key, str(error)))
+    for photo_path, error in failed:
+        print(f'{photo_path}: {error}')
+    print(f'{len(photo_paths) + len(blob_keys)} photos checked, {written} variants written, {len(failed)} failed.')
+
+@app.cli.command('migrate-uploads')
+def migrate_uploads_command():
+    """Move photos and excuse letters saved under static/ before blob storage into the blob store"""
+    legacy_folders = (app.config['UPLOAD_FOLDER'] + '/', 'static/excuse_letters/')  # avatars are shared, not uploads
+    moved = {}  # legacy path -> blob key
+    missing = 0
+    for model, (owner_type, attribute) in BLOB_REFERENCE_COLUMNS.items():
+        column = getattr(model, attribute)
+        rows = model.query.filter(or_(*[column.startswith(folder) for folder in legacy_folders])).all()
+        for row in rows:
+            path = getattr(row, attribute)
+            if path not in moved:
+                if not os.path.exists(path):
+                    missing += 1
+                    continue
+                with open(path, 'rb') as legacy_file:
+                    key, size, created = blob_store.save(legacy_file, path.rsplit('.', 1)[-1],
+                                                         mimetypes.guess_type(path)[0])
+                record_blob(key, size, mimetypes.guess_type(path)[0])
+                if model is Student and created:
+                    try:
+                        store_photo_variants(key)
+                    except (OSError, ValueError) as error:
+                        print(f'{path}: {error}')
+                moved[path] = key
+            setattr(row, attribute, moved[path])
+        db.session.commit()
+    
+    # Only remove the old files once every row points at its blob
+    for path in moved:
+        os.remove(path)
+        remove_photo_variants(path)
+    student_registry.invalidate()
+    print(f'Moved {len(moved)} files into blob storage ({missing} rows point at missing files).')
+
+@app.cli.command('gc-uploads')
+@click.option('--dry-run', is_flag=True, help='Report what would be deleted without deleting it')
+def gc_uploads_command(dry_run):
+    """Delete stored uploads that no student or excuse request refers to any more"""
+    cutoff = datetime.now() - UPLOAD_GC_GRACE
+    reference_table = BlobReference.__table__
+    blob_table = Blob.__table__
+    
+    # References left behind by rows deleted outside the ORM (cascades, bulk deletes)
+    dangling = 0
+    for model, (owner_type, _) in BLOB_REFERENCE_COLUMNS.items():
+        dangling += db.session.execute(reference_table.delete().where(
+            reference_table.c.owner_type == owner_type,
+            ~exists().where(model.__table__.c.id == reference_table.c.owner_id)
+        )).rowcount
+    
+    # Stored objects without a blob row: uploads whose request failed before commit
+    known = set()
+    for (key,) in db.session.query(Blob.key):
+        known.add(key)
+        known.update(variant_path(key, size) for size in PHOTO_VARIANT_SIZES)
+    orphans = [key for key in blob_store.list_older_than(UPLOAD_GC_GRACE.total_seconds()) if key not in known]
+    
+    candidates = [key for (key,) in db.session.query(Blob.key).filter(
+        Blob.uploaded_at < cutoff, ~exists().where(BlobReference.blob_key == Blob.key))]
+    deleted = []
+    for key in candidates:
+        # Checked again in the DELETE in case an upload referenced it meanwhile
+        result = db.session.execute(blob_table.delete().where(
+            blob_table.c.key == key, ~exists().where(reference_table.c.blob_key == key)))
+        if result.rowcount:
+            deleted.append(key)
+    
+    if dry_run:
+        db.session.rollback()
+    else:
+        db.session.commit()
+        blob_store.delete(orphans)
+        blob_store.delete([variant for key in deleted
+                           for variant in [key] + [variant_path(key, size) for size in PHOTO_VARIANT_SIZES]])
+    print(f'{"Would delete" if dry_run else "Deleted"} {len(deleted)} unreferenced uploads and '
+          f'{len(orphans)} orphaned files; removed {dangling} stale references.')
+
 if __name__ == '__main__':
     if not os.path.exists('attendance.db'):
         with app.app_context():
             db.create_all()
+    # Warm the student lookup cache before the first scan
+    with app.app_context():
+        student_registry.load()
+    # The debug reloader runs this module twice; only its child serves requests
+    if app.config['SCHEDULER_ENABLED'] and os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_jobs()
     app.run(debug=True) 
\ No newline at end of file
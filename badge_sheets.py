@@ -0,0 +1,267 @@
+"""
+Printable QR badge sheets
+Pages are drawn with Pillow in worker processes and written out as a PDF or a zip of PNGs
+"""
+
+import io
+import zipfile
+from collections import deque
+from functools import lru_cache
+
+from PIL import Image, ImageDraw, ImageFont, ImageOps
+
+from qr_service import qr_matrix, read_qr_matrix, scale_qr_matrix
+
+PAGE_DPI = 150
+PAGE_SIZE = (1240, 1754)  # A4 at PAGE_DPI
+PAGE_MARGIN = 60
+BADGE_GAP = 20
+BADGE_LAYOUTS = {4: (2, 2), 6: (2, 3), 8: (2, 4), 10: (2, 5), 12: (3, 4)}  # badges per page -> (columns, rows)
+PAGE_FORMATS = {'pdf': 'JPEG', 'zip': 'PNG'}  # sheet format -> encoding of each page
+
+
+@lru_cache(maxsize=None)
+def _font(size):
+    return ImageFont.load_default(size)
+
+
+def _fit_text(draw, text, width, size):
+    """Largest font no bigger than size that fits text in width, and the text (ellipsized if needed)"""
+    length = draw.textlength(text, font=_font(size))
+    if length > width:
+        # Text width grows in proportion to the font size; below 60% it is cut short instead
+        size = max(12, int(size * 0.6), int(size * width / length))
+    font = _font(size)
+    if draw.textlength(text, font=font) > width:
+        while text and draw.textlength(text + '…', font=font) > width:
+            text = text[:-1]
+        text += '…'
+    return text, font
+
+
+def _photo(path, side):
+    """Square crop of a student photo, or None if there is none or it can't be read"""
+    if not path:
+        return None
+    try:
+        with Image.open(path) as image:
+            image.draft('RGB', (side, side))  # JPEGs decode at reduced scale, much faster for camera photos
+            image = ImageOps.exif_transpose(image)
+            return ImageOps.fit(image.convert('RGB'), (side, side), method=Image.BILINEAR)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+
+
+def draw_badge(page, box, name, student_number, photo_path, qr_path=None):
+    """
+    Draw one badge into a rectangle of a page.
+
+    Args:
+        page (PIL.Image.Image): RGB page being drawn
+        box (tuple): (left, top, right, bottom) of the badge
+        name (str): Student name
+        student_number (str): Student number, also the QR payload
+        photo_path (str): Photo file, or None for a placeholder with the initial
+        qr_path (str): Rendered QR file to reuse instead of encoding the number again
+    """
+    left, top, right, bottom = box
+    draw = ImageDraw.Draw(page)
+    draw.rounded_rectangle(box, radius=16, outline=(160, 160, 160), width=3)
+
+    pad = 20
+    inner_width = right - left - 2 * pad
+    text_height = (bottom - top) // 4
+    side = min((inner_width - pad) // 2, bottom - top - 2 * pad - text_height)
+    name_size = min(text_height // 2, side // 4)
+    number_size = name_size * 3 // 4
+    # Centre photo, QR code and the two text lines vertically in the badge
+    top += (bottom - top - side - pad - name_size - number_size - 10) // 2
+
+    photo = _photo(photo_path, side)
+    photo_box = (left + pad, top, left + pad + side, top + side)
+    if photo is not None:
+        page.paste(photo, photo_box[:2])
+    else:
+        draw.rectangle(photo_box, fill=(226, 232, 240))
+        initial = (name or '?').strip()[:1].upper() or '?'
+        draw.text(((photo_box[0] + photo_box[2]) / 2, (photo_box[1] + photo_box[3]) / 2), initial,
+                  font=_font(side // 2), fill=(100, 116, 139), anchor='mm')
+
+    modules = read_qr_matrix(qr_path) if qr_path else None
+    if modules is None:
+        modules = qr_matrix(student_number)
+    qr = scale_qr_matrix(modules, max(1, side // len(modules)))
+    qr_left = right - pad - side + (side - qr.width) // 2
+    page.paste(qr, (qr_left, top + (side - qr.height) // 2))
+
+    text_top = top + side + pad
+    center = (left + right) / 2
+    name_text, name_font = _fit_text(draw, name or '', inner_width, max(16, name_size))
+    draw.text((center, text_top), name_text, font=name_font, fill=(15, 23, 42), anchor='mt')
+    number_text, number_font = _fit_text(draw, student_number, inner_width, max(14, number_size))
+    draw.text((center, text_top + name_font.size + 10), number_text, font=number_font,
+              fill=(71, 85, 105), anchor='mt')
+
+
+def render_badge_page(badges, per_page, image_format):
+    """
+    Draw and encode one page of badges.
+
+    Meant to run in a worker process, so it takes and returns plain data.
+
+    Args:
+        badges (list): Up to per_page (name, student_number, photo_path, qr_path) tuples
+        per_page (int): Key of BADGE_LAYOUTS
+        image_format (str): Pillow format to encode the page with ('JPEG' or 'PNG')
+
+    Returns:
+        bytes: Encoded page image of PAGE_SIZE pixels
+    """
+    columns, rows = BADGE_LAYOUTS[per_page]
+    page = Image.new('RGB', PAGE_SIZE, 'white')
+    width = (PAGE_SIZE[0] - 2 * PAGE_MARGIN - (columns - 1) * BADGE_GAP) // columns
+    height = (PAGE_SIZE[1] - 2 * PAGE_MARGIN - (rows - 1) * BADGE_GAP) // rows
+    for index, badge in enumerate(badges):
+        row, column = divmod(index, columns)
+        left = PAGE_MARGIN + column * (width + BADGE_GAP)
+        top = PAGE_MARGIN + row * (height + BADGE_GAP)
+        draw_badge(page, (left, top, left + width, top + height), *badge)
+
+    buffer = io.BytesIO()
+    if image_format == 'JPEG':
+        page.save(buffer, 'JPEG', quality=90, dpi=(PAGE_DPI, PAGE_DPI))
+    else:
+        page.save(buffer, image_format, compress_level=1, dpi=(PAGE_DPI, PAGE_DPI))
+    return buffer.getvalue()
+
+
+def iter_badge_pages(executor, badges, per_page=8, image_format='JPEG', window=4):
+    """
+    Render badge pages on a process pool, yielding encoded pages in order.
+
+    Only window pages are in flight at once, so memory stays flat however
+    long the roster is and several sheets can share one pool without one of
+    them filling its queue. Closing the generator early cancels queued pages.
+
+    Args:
+        executor (ProcessPoolExecutor): Pool to draw the pages on; left running
+        badges (list): (name, student_number, photo_path, qr_path) tuples in print order
+        per_page (int): Key of BADGE_LAYOUTS
+        image_format (str): 'JPEG' or 'PNG'
+        window (int): Pages submitted ahead of the one being yielded
+
+    Yields:
+        bytes: One encoded page
+    """
+    pending = deque()
+    try:
+        for start in range(0, len(badges), per_page):
+            pending.append(executor.submit(render_badge_page, badges[start:start + per_page],
+                                           per_page, image_format))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def iter_pdf(jpeg_pages, page_size=PAGE_SIZE, dpi=PAGE_DPI):
+    """
+    Stream a PDF with one full-page JPEG image per page.
+
+    Objects are written as each page arrives; the page tree and the
+    cross-reference table go at the end, once the page count is known.
+
+    Args:
+        jpeg_pages (iterable): Encoded RGB JPEG pages, all page_size pixels
+        page_size (tuple): Page size in pixels
+        dpi (int): Resolution the pixels are printed at
+
+    Yields:
+        bytes: Consecutive chunks of the PDF file
+    """
+    width_pt = page_size[0] * 72 / dpi
+    height_pt = page_size[1] * 72 / dpi
+    offsets = {}
+    position = 0
+
+    def write_object(number, body, stream=None):
+        nonlocal position
+        offsets[number] = position
+        chunk = f'{number} 0 obj\n'.encode() + body
+        if stream is not None:
+            chunk += b'\nstream\n' + stream + b'\nendstream'
+        chunk += b'\nendobj\n'
+        position += len(chunk)
+        return chunk
+
+    header = b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'
+    position = len(header)
+    yield header
+    yield write_object(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+
+    page_numbers = []
+    for index, jpeg in enumerate(jpeg_pages):
+        image_number, content_number, page_number = 3 + 3 * index, 4 + 3 * index, 5 + 3 * index
+        yield write_object(image_number, (
+            f'<< /Type /XObject /Subtype /Image /Width {page_size[0]} /Height {page_size[1]} '
+            f'/ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /DCTDecode /Length {len(jpeg)} >>'
+        ).encode(), jpeg)
+        content = f'q {width_pt:.2f} 0 0 {height_pt:.2f} 0 0 cm /Im0 Do Q'.encode()
+        yield write_object(content_number, f'<< /Length {len(content)} >>'.encode(), content)
+        yield write_object(page_number, (
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {width_pt:.2f} {height_pt:.2f}] '
+            f'/Resources << /XObject << /Im0 {image_number} 0 R >> >> /Contents {content_number} 0 R >>'
+        ).encode())
+        page_numbers.append(page_number)
+
+    kids = ' '.join(f'{number} 0 R' for number in page_numbers)
+    yield write_object(2, f'<< /Type /Pages /Kids [{kids}] /Count {len(page_numbers)} >>'.encode())
+
+    count = max(offsets) + 1
+    xref = [f'xref\n0 {count}\n', '0000000000 65535 f \n']
+    xref += [f'{offsets[number]:010d} 00000 n \n' for number in range(1, count)]
+    xref.append(f'trailer\n<< /Size {count} /Root 1 0 R >>\nstartxref\n{position}\n%%EOF\n')
+    yield ''.join(xref).encode()
+
+
+class _ChunkWriter(io.RawIOBase):
+    """Write-only, unseekable file that hands written bytes back out as chunks"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data, self.chunks = b''.join(self.chunks), []
+        return data
+
+
+def iter_zip(png_pages, name_format='badges-{:03d}.png'):
+    """
+    Stream a zip archive of page images.
+
+    The pages are already compressed, so they are stored as-is; zipfile
+    writes data descriptors because the output can't seek back.
+
+    Args:
+        png_pages (iterable): Encoded PNG pages
+        name_format (str): Archive member name for each page number (from 1)
+
+    Yields:
+        bytes: Consecutive chunks of the zip file
+    """
+    sink = _ChunkWriter()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for number, png in enumerate(png_pages, start=1):
+            archive.writestr(name_format.format(number), png)
+            yield sink.drain()
+    yield sink.drain()
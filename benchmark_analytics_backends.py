@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the analytics backends (ANALYTICS_BACKEND = 'python' / 'numpy')
+This script will:
+1. Build a throwaway SQLite database with the app's schema
+2. Fill it with a year of weekday attendance for 5,000 students
+3. Time loading the frame and computing every analytics panel with each backend
+4. Check that both backends return the same results
+
+Usage: python benchmark_analytics_backends.py [student_count] [days]
+"""
+
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+_db_fd, _db_path = tempfile.mkstemp(suffix='.db')
+os.close(_db_fd)
+os.environ['DATABASE_URL'] = f'sqlite:///{_db_path}'
+
+from app import app, db, Teacher, Class, Student, AttendanceFrame, NumpyAttendanceFrame
+
+DEFAULT_STUDENTS = 5_000
+DEFAULT_DAYS = 365
+CLASSES = 20
+
+
+def build_database(student_count, days):
+    """Create the schema and insert one record per student per weekday"""
+    with app.app_context():
+        db.create_all()
+        teacher = Teacher(username='benchmark', password='-')
+        db.session.add(teacher)
+        db.session.commit()
+        teacher_id = teacher.id
+
+    rng = random.Random(42)
+    end = date.today()
+    conn = sqlite3.connect(_db_path)
+    conn.executemany(
+        "INSERT INTO class (id, name, teacher_id, start_time, end_time) VALUES (?, ?, ?, ?, ?)",
+        [(c, f'Class {c}', teacher_id, '08:00:00.000000', '09:00:00.000000') for c in range(1, CLASSES + 1)]
+    )
+    conn.executemany(
+        "INSERT INTO student (id, name, name_lower, student_number, class_id) VALUES (?, ?, ?, ?, ?)",
+        [(s, f'Student {s}', f'student {s}', str(100000 + s), (s % CLASSES) + 1) for s in range(1, student_count + 1)]
+    )
+
+    def rows():
+        for day in range(days):
+            d = end - timedelta(days=day)
+            if d.weekday() >= 5:
+                continue
+            d = d.isoformat()
+            for student_id in range(1, student_count + 1):
+                status = rng.choices(['Present', 'Late', 'Absent', 'Excused'], [80, 10, 7, 3])[0]
+                late_minutes = rng.randint(1, 45) if status == 'Late' else 0
+                yield (student_id, (student_id % CLASSES) + 1, teacher_id, d, status,
+                       f'08:{late_minutes:02d}:00.000000', late_minutes)
+
+    conn.executemany(
+        "INSERT INTO attendance (student_id, class_id, teacher_id, date, status, scan_time, "
+        "late_arrival, late_minutes, change_seq) VALUES (?, ?, ?, ?, ?, ?, 0, ?, 1)",
+        rows()
+    )
+    conn.commit()
+    record_count = conn.execute("SELECT COUNT(*) FROM attendance").fetchone()[0]
+    conn.close()
+    return teacher_id, record_count
+
+
+def run_backend(frame_class, teacher_id, days):
+    """Load a frame and compute every panel; returns (seconds, load seconds, results)"""
+    with app.app_context():
+        students = Student.query.order_by(Student.id).all()
+        classes = Class.query.filter_by(teacher_id=teacher_id).all()
+
+        began = time.perf_counter()
+        frame = frame_class.load(teacher_id, days)
+        loaded = time.perf_counter()
+        results = {
+            'trends': frame.trends(days),
+            'student_summaries': [
+                {**summary, 'student': summary['student'].id}
+                for summary in frame.student_summaries(students, 'all', days)
+            ],
+            'class_comparison': frame.class_comparison(classes, days),
+            'time_analytics': frame.time_analytics('all', days),
+        }
+        finished = time.perf_counter()
+        return finished - began, loaded - began, results
+
+
+def main():
+    student_count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_STUDENTS
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_DAYS
+
+    try:
+        print("=== Analytics Backend Benchmark ===")
+        teacher_id, record_count = build_database(student_count, days)
+        print(f"{student_count:,} students, {days} days, {record_count:,} attendance records\n")
+
+        python_total, python_load, python_results = run_backend(AttendanceFrame, teacher_id, days)
+        numpy_total, numpy_load, numpy_results = run_backend(NumpyAttendanceFrame, teacher_id, days)
+
+        print(f"{'Backend':>8}  {'Load (s)':>9}  {'Panels (s)':>10}  {'Total (s)':>9}")
+        print(f"{'python':>8}  {python_load:>9.2f}  {python_total - python_load:>10.2f}  {python_total:>9.2f}")
+        print(f"{'numpy':>8}  {numpy_load:>9.2f}  {numpy_total - numpy_load:>10.2f}  {numpy_total:>9.2f}")
+        print(f"\nPanel speedup: {(python_total - python_load) / (numpy_total - numpy_load):.1f}x")
+        print(f"Total speedup: {python_total / numpy_total:.1f}x")
+        print(f"Results identical: {python_results == numpy_results}")
+    finally:
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        os.remove(_db_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the attendance lookup indexes (migration 004_attendance_indexes)
+This script will:
+1. Build a throwaway SQLite database with the attendance table schema
+2. Fill it with 10k, 100k and 1M synthetic attendance rows
+3. Time the scan lookup (student_id, class_id, date) before and after the indexes
+
+Usage: python benchmark_attendance_indexes.py [row_count ...]
+"""
+
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+LOOKUPS = 200
+CLASSES = 20
+
+ATTENDANCE_SCHEMA = """
+    CREATE TABLE attendance (
+        id INTEGER NOT NULL,
+        student_id INTEGER NOT NULL,
+        class_id INTEGER NOT NULL,
+        teacher_id INTEGER NOT NULL,
+        date DATE NOT NULL,
+        status VARCHAR(20) NOT NULL,
+        scan_time TIME,
+        arrival_time TIME,
+        late_arrival BOOLEAN DEFAULT '0' NOT NULL,
+        late_minutes INTEGER DEFAULT '0' NOT NULL,
+        notes TEXT,
+        excuse_request_id INTEGER,
+        PRIMARY KEY (id)
+    )
+"""
+
+# Same indexes as migrations/versions/004_attendance_lookup_indexes.py
+INDEXES = [
+    "CREATE UNIQUE INDEX ix_attendance_class_date_student ON attendance (class_id, date, student_id)",
+    "CREATE INDEX ix_attendance_student_date ON attendance (student_id, date)",
+    "CREATE INDEX ix_attendance_excuse_request_id ON attendance (excuse_request_id)",
+]
+
+LOOKUP_SQL = "SELECT id, status FROM attendance WHERE student_id = ? AND class_id = ? AND date = ? LIMIT 1"
+
+
+def build_database(path, row_count):
+    """Create the attendance table and insert row_count unique student/class/date rows"""
+    conn = sqlite3.connect(path)
+    conn.execute(ATTENDANCE_SCHEMA)
+
+    # Spread rows over a school year so every (student, class, date) is unique
+    days = 200
+    students = max(1, row_count // (CLASSES * days)) + 1
+    start = date(2025, 1, 1)
+    statuses = ['Present', 'Late', 'Absent', 'Excused']
+
+    def rows():
+        n = 0
+        for day in range(days):
+            d = (start + timedelta(days=day)).isoformat()
+            for class_id in range(1, CLASSES + 1):
+                for student_id in range(1, students + 1):
+                    if n >= row_count:
+                        return
+                    n += 1
+                    yield (n, student_id, class_id, 1, d, random.choice(statuses), '08:00:00')
+
+    conn.executemany(
+        "INSERT INTO attendance (id, student_id, class_id, teacher_id, date, status, scan_time) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        rows()
+    )
+    conn.commit()
+    return conn, students, days, start
+
+
+def time_lookups(conn, students, days, start):
+    """Return average lookup latency in milliseconds"""
+    rng = random.Random(42)
+    keys = [
+        (rng.randint(1, students), rng.randint(1, CLASSES),
+         (start + timedelta(days=rng.randrange(days))).isoformat())
+        for _ in range(LOOKUPS)
+    ]
+    began = time.perf_counter()
+    for key in keys:
+        conn.execute(LOOKUP_SQL, key).fetchone()
+    return (time.perf_counter() - began) * 1000 / LOOKUPS
+
+
+def run_benchmark(row_count):
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        conn, students, days, start = build_database(path, row_count)
+
+        before = time_lookups(conn, students, days, start)
+        for statement in INDEXES:
+            conn.execute(statement)
+        conn.commit()
+        after = time_lookups(conn, students, days, start)
+
+        conn.close()
+        return before, after
+    finally:
+        os.remove(path)
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+
+    print("=== Attendance Scan Lookup Benchmark ===")
+    print(f"{LOOKUPS} lookups per run\n")
+    print(f"{'Rows':>10}  {'Before (ms)':>12}  {'After (ms)':>12}  {'Speedup':>8}")
+    for row_count in sizes:
+        before, after = run_benchmark(row_count)
+        speedup = before / after if after > 0 else float('inf')
+        print(f"{row_count:>10,}  {before:>12.3f}  {after:>12.3f}  {speedup:>7.0f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+"""
+Content-addressed storage for uploaded files
+Blobs are stored once under their SHA-256 digest; the backend decides where the bytes live
+"""
+
+import hashlib
+import io
+import os
+import tempfile
+import time
+
+HASH_CHUNK_SIZE = 64 * 1024
+BLOB_CACHE_CONTROL = 'public, max-age=31536000, immutable'  # a key's content never changes
+
+
+def blob_key(digest, extension):
+    """Storage key for a digest, fanned out over 256 directories: ab/abcdef....jpg"""
+    return f'{digest[:2]}/{digest}.{extension}'
+
+
+def is_blob_key(location):
+    """
+    Whether a stored path column holds a blob key.
+
+    Uploads saved before blob storage existed are paths under static/
+    (static/photos/1234.jpg); those are served and deleted as plain files.
+    """
+    return bool(location) and not location.startswith('static/')
+
+
+class LocalBlobBackend:
+    """
+    Blobs as files under a directory, by default inside static/ so they are
+    served by the static file route without going through the application.
+    """
+
+    def __init__(self, root='static/blobs', url_prefix=None):
+        self.root = root
+        self.url_prefix = url_prefix if url_prefix is not None else '/' + root.strip('/')
+
+    def local_path(self, key):
+        return os.path.join(self.root, key)
+
+    def exists(self, key):
+        return os.path.exists(self.local_path(key))
+
+    def put_file(self, key, path, content_type=None):
+        """Move a finished temporary file into place (it must be on the same filesystem)"""
+        target = self.local_path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.chmod(path, 0o644)  # mkstemp creates files readable by the owner only
+        os.replace(path, target)
+
+    def put_bytes(self, key, data, content_type=None):
+        path = self.temp_path()
+        with open(path, 'wb') as tmp_file:
+            tmp_file.write(data)
+        self.put_file(key, path, content_type)
+
+    def open(self, key):
+        return open(self.local_path(key), 'rb')
+
+    def delete(self, key):
+        try:
+            os.remove(self.local_path(key))
+        except FileNotFoundError:
+            pass
+
+    def list(self):
+        """Yield (key, modified unix time) for every stored object"""
+        for directory, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.startswith('.tmp'):
+                    continue
+                path = os.path.join(directory, filename)
+                yield os.path.relpath(path, self.root).replace(os.sep, '/'), os.path.getmtime(path)
+
+    def url(self, key):
+        return f'{self.url_prefix}/{key}'
+
+    def temp_path(self):
+        """Temporary file in the blob directory, so put_file is a rename"""
+        os.makedirs(self.root, exist_ok=True)
+        fd, path = tempfile.mkstemp(prefix='.tmp', dir=self.root)
+        os.close(fd)
+        return path
+
+
+class S3BlobBackend:
+    """
+    Blobs as objects in an S3 bucket, or in an S3-compatible server such as
+    MinIO running locally (set endpoint_url). Needs boto3, which is only
+    imported when this backend is used: pip install -r requirements-s3.txt
+
+    URLs point at public_url when the bucket is readable anonymously (or sits
+    behind a CDN); otherwise they are presigned and expire after url_expiry seconds.
+    """
+
+    def __init__(self, bucket, endpoint_url=None, prefix='blobs/', public_url=None, url_expiry=3600):
+        import boto3
+        from botocore.exceptions import ClientError
+        self._client_error = ClientError
+        self.client = boto3.client('s3', endpoint_url=endpoint_url)
+        self.bucket = bucket
+        self.prefix = prefix
+        self.public_url = public_url.rstrip('/') if public_url else None
+        self.url_expiry = url_expiry
+
+    def local_path(self, key):
+        return None
+
+    def exists(self, key):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.prefix + key)
+        except self._client_error as error:
+            if error.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+        return True
+
+    def put_file(self, key, path, content_type=None):
+        extra = {'CacheControl': BLOB_CACHE_CONTROL}
+        if content_type:
+            extra['ContentType'] = content_type
+        self.client.upload_file(path, self.bucket, self.prefix + key, ExtraArgs=extra)
+        os.remove(path)
+
+    def put_bytes(self, key, data, content_type=None):
+        extra = {'CacheControl': BLOB_CACHE_CONTROL}
+        if content_type:
+            extra['ContentType'] = content_type
+        self.client.put_object(Bucket=self.bucket, Key=self.prefix + key, Body=data, **extra)
+
+    def open(self, key):
+        response = self.client.get_object(Bucket=self.bucket, Key=self.prefix + key)
+        return io.BytesIO(response['Body'].read())
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self.prefix + key)
+
+    def list(self):
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for item in page.get('Contents', []):
+                yield item['Key'][len(self.prefix):], item['LastModified'].timestamp()
+
+    def url(self, key):
+        if self.public_url:
+            return f'{self.public_url}/{self.prefix}{key}'
+        return self.client.generate_presigned_url(
+            'get_object', Params={'Bucket': self.bucket, 'Key': self.prefix + key}, ExpiresIn=self.url_expiry)
+
+    def temp_path(self):
+        fd, path = tempfile.mkstemp(prefix='.tmp')
+        os.close(fd)
+        return path
+
+
+class BlobStore:
+    """
+    Stores uploads by content.
+
+    save() hashes the upload while copying it to a temporary file, so the
+    file is read once and never held in memory; identical content gets the
+    same key and is stored only once.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def save(self, stream, extension, content_type=None):
+        """
+        Store the contents of a file object.
+
+        Args:
+            stream: Readable binary file object, e.g. FileStorage.stream
+            extension (str): File extension kept on the key so browsers get the right type
+            content_type (str): MIME type recorded by backends that store one
+
+        Returns:
+            tuple: (key, size in bytes, True if the content was not stored before)
+        """
+        hasher = hashlib.sha256()
+        size = 0
+        tmp_path = self.backend.temp_path()
+        try:
+            with open(tmp_path, 'wb') as tmp_file:
+                while True:
+                    chunk = stream.read(HASH_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    hasher.update(chunk)
+                    tmp_file.write(chunk)
+                    size += len(chunk)
+            key = blob_key(hasher.hexdigest(), extension.lower())
+            if self.backend.exists(key):
+                return key, size, False
+            self.backend.put_file(key, tmp_path, content_type)
+            return key, size, True
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def put_derived(self, key, data, content_type=None):
+        """Store bytes computed from a blob (e.g. a thumbnail) under a key of the caller's choosing"""
+        self.backend.put_bytes(key, data, content_type)
+
+    def open(self, key):
+        return self.backend.open(key)
+
+    def exists(self, key):
+        return self.backend.exists(key)
+
+    def url(self, key):
+        return self.backend.url(key)
+
+    def local_path(self, key):
+        """Path on this machine, or None for remote backends"""
+        return self.backend.local_path(key)
+
+    def delete(self, keys):
+        for key in keys:
+            self.backend.delete(key)
+
+    def list_older_than(self, seconds):
+        """Keys of stored objects last written more than seconds ago"""
+        cutoff = time.time() - seconds
+        return [key for key, modified in self.backend.list() if modified < cutoff]
@@ -0,0 +1,44 @@
+"""
+Shared test fixtures.
+Every test module runs against its own empty SQLite database, so instance/attendance.db is left
+untouched and modules never see each other's rows.
+"""
+import os
+import shutil
+import tempfile
+
+# app reads DATABASE_URL once, on first import, so it is set before any test module imports app
+_db_dir = tempfile.mkdtemp(prefix='attendance-tests-')
+DATABASE_PATH = os.path.join(_db_dir, 'attendance.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{DATABASE_PATH}'
+
+import pytest
+from app import app, db, student_registry
+
+# Manual scripts that run against instance/attendance.db as soon as they are imported, not pytest tests
+collect_ignore = ['test_excuse.py', 'test_workflow.py', 'test_expiration.py']
+
+
+def reset_database():
+    """Drop the database file and create an empty schema in its place"""
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()  # pooled connections still point at the old file
+        if os.path.exists(DATABASE_PATH):
+            os.remove(DATABASE_PATH)
+        db.create_all()
+    student_registry.invalidate()
+
+
+@pytest.fixture(scope='module', autouse=True)
+def database():
+    """A fresh database for each test module; setup_module seeds it"""
+    reset_database()
+    yield
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_db_dir, ignore_errors=True)
@@ -79,8 +79,7 @@ def generate_demo_data():
                 student = Student(
                     name=name,
                     student_number=student_number,
-                    class_id=assigned_class.id,
-                    qr_code_path=f'static/qr/{student_number}.png'
+                    class_id=assigned_class.id
                 )
                 db.session.add(student)
                 demo_students.append(student)
@@ -18,6 +18,15 @@ depends_on = None
 
 
 def upgrade():
+    # Databases set up with db.create_all() before this revision already have the table and column
+    inspector = sa.inspect(op.get_bind())
+    if 'excuse_request' in inspector.get_table_names():
+        if 'excuse_request_id' not in [column['name'] for column in inspector.get_columns('attendance')]:
+            with op.batch_alter_table('attendance', schema=None) as batch_op:
+                batch_op.add_column(sa.Column('excuse_request_id', sa.Integer(), nullable=True))
+                batch_op.create_foreign_key('fk_attendance_excuse_request', 'excuse_request', ['excuse_request_id'], ['id'])
+        return
+    
     # Create excuse_request table
     op.create_table('excuse_request',
         sa.Column('id', sa.Integer(), nullable=False),
@@ -45,8 +54,10 @@ def upgrade():
 
 def downgrade():
     # Remove excuse_request_id column from attendance table
+    foreign_keys = sa.inspect(op.get_bind()).get_foreign_keys('attendance')
     with op.batch_alter_table('attendance', schema=None) as batch_op:
-        batch_op.drop_constraint('fk_attendance_excuse_request', type_='foreignkey')
+        if any(fk['name'] == 'fk_attendance_excuse_request' for fk in foreign_keys):
+            batch_op.drop_constraint('fk_attendance_excuse_request', type_='foreignkey')
         batch_op.drop_column('excuse_request_id')
     
     # Drop excuse_request table
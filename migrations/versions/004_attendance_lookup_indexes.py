@@ -0,0 +1,32 @@
+"""Add composite indexes for attendance lookups
+
+Revision ID: 004_attendance_indexes
+Revises: 003_excuse_requests
+Create Date: 2024-01-01 00:00:03.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '004_attendance_indexes'
+down_revision = '003_excuse_requests'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # One attendance record per student/class/date - used by scans, reviews and excuse expiry
+    op.create_index('ix_attendance_class_date_student', 'attendance',
+                    ['class_id', 'date', 'student_id'], unique=True)
+    # Per-student history lookups (analytics, excuse submission)
+    op.create_index('ix_attendance_student_date', 'attendance', ['student_id', 'date'])
+    # Joins from attendance to excuse_request
+    op.create_index('ix_attendance_excuse_request_id', 'attendance', ['excuse_request_id'])
+
+
+def downgrade():
+    op.drop_index('ix_attendance_excuse_request_id', table_name='attendance')
+    op.drop_index('ix_attendance_student_date', table_name='attendance')
+    op.drop_index('ix_attendance_class_date_student', table_name='attendance')
@@ -0,0 +1,72 @@
+"""Add daily_class_stats rollup table
+
+Revision ID: 005_daily_class_stats
+Revises: 004_attendance_indexes
+Create Date: 2024-01-01 00:00:04.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '005_daily_class_stats'
+down_revision = '004_attendance_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # One row per class per day, kept current by refresh_daily_class_stats() in app.py
+    op.create_table('daily_class_stats',
+        sa.Column('class_id', sa.Integer(), nullable=False),
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('present_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('late_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('absent_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('excused_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('total_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('late_minutes_total', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('pending_excused_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('approved_without_record_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.ForeignKeyConstraint(['class_id'], ['class.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('class_id', 'date')
+    )
+    
+    # Backfill from existing attendance and approved excuses without a record
+    op.execute("""
+        INSERT INTO daily_class_stats (
+            class_id, date, present_count, late_count, absent_count, excused_count,
+            total_count, late_minutes_total, pending_excused_count, approved_without_record_count
+        )
+        SELECT class_id, date, SUM(present), SUM(late), SUM(absent), SUM(excused),
+               SUM(total), SUM(late_minutes), SUM(pending), SUM(approved)
+        FROM (
+            SELECT a.class_id AS class_id, a.date AS date,
+                   CASE WHEN a.status = 'Present' THEN 1 ELSE 0 END AS present,
+                   CASE WHEN a.status = 'Late' THEN 1 ELSE 0 END AS late,
+                   CASE WHEN a.status = 'Absent' THEN 1 ELSE 0 END AS absent,
+                   CASE WHEN a.status = 'Excused' THEN 1 ELSE 0 END AS excused,
+                   1 AS total,
+                   CASE WHEN a.status = 'Late' THEN a.late_minutes ELSE 0 END AS late_minutes,
+                   CASE WHEN a.status = 'Excused' AND e.status = 'Pending' THEN 1 ELSE 0 END AS pending,
+                   0 AS approved
+            FROM attendance a
+            LEFT OUTER JOIN excuse_request e ON a.excuse_request_id = e.id
+            UNION ALL
+            SELECT e.class_id, e.absence_date, 0, 0, 0, 0, 0, 0, 0, 1
+            FROM excuse_request e
+            WHERE e.status = 'Approved'
+              AND NOT EXISTS (
+                  SELECT 1 FROM attendance a
+                  WHERE a.student_id = e.student_id
+                    AND a.class_id = e.class_id
+                    AND a.date = e.absence_date
+              )
+        ) AS daily
+        GROUP BY class_id, date
+    """)
+
+
+def downgrade():
+    op.drop_table('daily_class_stats')
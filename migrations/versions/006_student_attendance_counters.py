@@ -0,0 +1,42 @@
+"""Add rolling per-student attendance counters
+
+Revision ID: 006_attendance_counters
+Revises: 005_daily_class_stats
+Create Date: 2024-01-01 00:00:05.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '006_attendance_counters'
+down_revision = '005_daily_class_stats'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Filled on first use by sync_attendance_counters() or `flask rebuild-attendance-counters`
+    op.create_table('student_attendance_counter',
+        sa.Column('student_id', sa.Integer(), nullable=False),
+        sa.Column('class_id', sa.Integer(), nullable=False),
+        sa.Column('window_end', sa.Date(), nullable=False),
+        sa.Column('day_statuses', sa.String(length=61), nullable=False),
+        sa.Column('present_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('late_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('absent_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('excused_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('total_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.ForeignKeyConstraint(['class_id'], ['class.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['student_id'], ['student.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('student_id', 'class_id')
+    )
+    op.create_index('ix_student_attendance_counter_class_id', 'student_attendance_counter', ['class_id'])
+    op.create_index('ix_student_attendance_counter_window_end', 'student_attendance_counter', ['window_end'])
+
+
+def downgrade():
+    op.drop_index('ix_student_attendance_counter_window_end', table_name='student_attendance_counter')
+    op.drop_index('ix_student_attendance_counter_class_id', table_name='student_attendance_counter')
+    op.drop_table('student_attendance_counter')
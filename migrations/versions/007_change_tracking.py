@@ -0,0 +1,45 @@
+"""Add change_seq tracking to attendance and excuse requests
+
+Revision ID: 007_change_tracking
+Revises: 006_attendance_counters
+Create Date: 2024-01-01 00:00:06.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '007_change_tracking'
+down_revision = '006_attendance_counters'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('change_counter',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('value', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    # Existing rows all belong to change 1, so a sync from the start picks them up
+    op.execute("INSERT INTO change_counter (id, value) VALUES (1, 1)")
+
+    with op.batch_alter_table('attendance', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('change_seq', sa.Integer(), nullable=False, server_default='1'))
+    with op.batch_alter_table('excuse_request', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('change_seq', sa.Integer(), nullable=False, server_default='1'))
+
+    # /api/changes pages through one teacher's rows in change_seq order
+    op.create_index('ix_attendance_teacher_change_seq', 'attendance', ['teacher_id', 'change_seq'])
+    op.create_index('ix_excuse_request_teacher_change_seq', 'excuse_request', ['teacher_id', 'change_seq'])
+
+
+def downgrade():
+    op.drop_index('ix_excuse_request_teacher_change_seq', table_name='excuse_request')
+    op.drop_index('ix_attendance_teacher_change_seq', table_name='attendance')
+    # Plain DROP COLUMN (SQLite 3.35+): batch mode would recreate excuse_request,
+    # which attendance references, and fail with foreign keys enabled
+    op.execute("ALTER TABLE excuse_request DROP COLUMN change_seq")
+    op.execute("ALTER TABLE attendance DROP COLUMN change_seq")
+    op.drop_table('change_counter')
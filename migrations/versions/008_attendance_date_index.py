@@ -0,0 +1,25 @@
+"""Add a date index for keyset pagination of attendance records
+
+Revision ID: 008_attendance_date_index
+Revises: 007_change_tracking
+Create Date: 2024-01-01 00:00:07.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '008_attendance_date_index'
+down_revision = '007_change_tracking'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # /records/manage pages by (date, id); SQLite appends the rowid to the index
+    op.create_index('ix_attendance_date', 'attendance', ['date'])
+
+
+def downgrade():
+    op.drop_index('ix_attendance_date', table_name='attendance')
@@ -0,0 +1,39 @@
+"""Add an indexed lowercase name column to students
+
+Revision ID: 009_student_name_lower
+Revises: 008_attendance_date_index
+Create Date: 2024-01-01 00:00:08.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '009_student_name_lower'
+down_revision = '008_attendance_date_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('student', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('name_lower', sa.String(length=100), nullable=False, server_default=''))
+
+    # Fill from Python so non-ASCII names are lowercased the same way the app does it
+    connection = op.get_bind()
+    students = connection.execute(sa.text("SELECT id, name FROM student")).fetchall()
+    if students:
+        connection.execute(
+            sa.text("UPDATE student SET name_lower = :name_lower WHERE id = :id"),
+            [{'id': student_id, 'name_lower': (name or '').strip().lower()} for student_id, name in students]
+        )
+
+    op.create_index('ix_student_name_lower', 'student', ['name_lower'])
+
+
+def downgrade():
+    op.drop_index('ix_student_name_lower', table_name='student')
+    # Plain DROP COLUMN (SQLite 3.35+): batch mode would recreate student,
+    # which attendance references, and fail with foreign keys enabled
+    op.execute("ALTER TABLE student DROP COLUMN name_lower")
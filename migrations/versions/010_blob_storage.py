@@ -0,0 +1,43 @@
+"""Add blob and blob_reference tables for content-addressed uploads
+
+Revision ID: 010_blob_storage
+Revises: 009_student_name_lower
+Create Date: 2024-01-01 00:00:09.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '010_blob_storage'
+down_revision = '009_student_name_lower'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('blob',
+        sa.Column('key', sa.String(length=100), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('content_type', sa.String(length=100), nullable=True),
+        sa.Column('uploaded_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('key')
+    )
+    op.create_table('blob_reference',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('blob_key', sa.String(length=100), nullable=False),
+        sa.Column('owner_type', sa.String(length=30), nullable=False),
+        sa.Column('owner_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['blob_key'], ['blob.key'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('owner_type', 'owner_id', name='uq_blob_reference_owner')
+    )
+    op.create_index('ix_blob_reference_blob_key', 'blob_reference', ['blob_key'])
+    # Existing uploads stay as static/ paths until `flask migrate-uploads` moves them
+
+
+def downgrade():
+    op.drop_index('ix_blob_reference_blob_key', table_name='blob_reference')
+    op.drop_table('blob_reference')
+    op.drop_table('blob')
@@ -0,0 +1,27 @@
+"""Drop student.qr_code_path; QR files are named by qr_service.QRCodeService.path_for
+
+Revision ID: 011_drop_student_qr_code_path
+Revises: 010_blob_storage
+Create Date: 2024-01-01 00:00:10.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '011_drop_student_qr_code_path'
+down_revision = '010_blob_storage'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Plain DROP COLUMN (SQLite 3.35+): batch mode would recreate student,
+    # which attendance references, and fail with foreign keys enabled
+    op.execute("ALTER TABLE student DROP COLUMN qr_code_path")
+
+
+def downgrade():
+    # Left empty; `flask regenerate-qr-codes` on the older code fills it in again
+    op.add_column('student', sa.Column('qr_code_path', sa.String(length=200), nullable=True))
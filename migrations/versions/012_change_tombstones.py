@@ -0,0 +1,33 @@
+"""Add change_tombstone so /api/changes reports deleted rows
+
+Revision ID: 012_change_tombstones
+Revises: 011_drop_student_qr_code_path
+Create Date: 2024-01-01 00:00:11.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '012_change_tombstones'
+down_revision = '011_drop_student_qr_code_path'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('change_tombstone',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('teacher_id', sa.Integer(), nullable=False),
+        sa.Column('table_name', sa.String(length=30), nullable=False),
+        sa.Column('row_id', sa.Integer(), nullable=False),
+        sa.Column('change_seq', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_change_tombstone_teacher_change_seq', 'change_tombstone', ['teacher_id', 'change_seq'])
+
+
+def downgrade():
+    op.drop_index('ix_change_tombstone_teacher_change_seq', table_name='change_tombstone')
+    op.drop_table('change_tombstone')
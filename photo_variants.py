@@ -0,0 +1,125 @@
+"""
+Resized copies of uploaded student photos
+Kept free of Flask and database imports so backfills can run in worker processes
+"""
+
+import io
+import os
+import tempfile
+
+from PIL import Image, ImageOps, features
+
+PHOTO_VARIANT_SIZES = (64, 256)  # square thumbnails, in pixels; the upload itself is kept as the original
+PHOTO_VARIANT_FORMAT = 'WEBP' if features.check('webp') else 'JPEG'
+PHOTO_VARIANT_EXTENSION = {'WEBP': 'webp', 'JPEG': 'jpg'}[PHOTO_VARIANT_FORMAT]
+PHOTO_VARIANT_QUALITY = 80
+PHOTO_VARIANT_MIMETYPE = {'WEBP': 'image/webp', 'JPEG': 'image/jpeg'}[PHOTO_VARIANT_FORMAT]
+
+
+def variant_path(photo_path, size):
+    """Path (or blob key) of the size-pixel variant of a photo, e.g. static/photos/1234_64.webp"""
+    root, _ = os.path.splitext(photo_path)
+    return f'{root}_{size}.{PHOTO_VARIANT_EXTENSION}'
+
+
+def existing_variant(photo_path, size):
+    """The variant of a photo if it has been made, otherwise the photo itself"""
+    path = variant_path(photo_path, size)
+    return path if os.path.exists(path) else photo_path
+
+
+def render_photo_variants(source, sizes=PHOTO_VARIANT_SIZES):
+    """
+    Encode square thumbnails of a photo.
+
+    The photo is turned upright from its EXIF orientation, centre-cropped to
+    a square and scaled down once per size. Transparent images are flattened
+    onto white when the variant format has no alpha channel.
+
+    Args:
+        source: Path or readable binary file object of the photo
+        sizes (iterable): Thumbnail sizes in pixels
+
+    Returns:
+        dict: {size: encoded image bytes}
+
+    Raises:
+        OSError: If the photo can't be read as an image
+    """
+    sizes = sorted(sizes, reverse=True)
+    if not sizes:
+        return {}
+    with Image.open(source) as image:
+        image.draft('RGB', (sizes[0], sizes[0]))  # JPEGs decode at reduced scale
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ('RGBA', 'LA', 'P') and PHOTO_VARIANT_FORMAT == 'JPEG':
+            background = Image.new('RGB', image.size, 'white')
+            background.paste(image.convert('RGBA'), mask=image.convert('RGBA'))
+            image = background
+        else:
+            image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+
+    side = min(image.size)
+    square = ImageOps.fit(image, (side, side))
+    variants = {}
+    for size in sizes:
+        # Each size is scaled from the previous, larger one
+        square = square.resize((size, size), Image.LANCZOS, reducing_gap=2.0) if side > size else square
+        buffer = io.BytesIO()
+        square.save(buffer, PHOTO_VARIANT_FORMAT, quality=PHOTO_VARIANT_QUALITY)
+        variants[size] = buffer.getvalue()
+    return variants
+
+
+def make_photo_variants(photo_path, overwrite=True):
+    """
+    Write the square thumbnails of one photo next to it.
+
+    Each file is written under a temporary name and renamed into place.
+
+    Args:
+        photo_path (str): Uploaded photo
+        overwrite (bool): Make variants that already exist again
+
+    Returns:
+        int: Number of variant files written
+
+    Raises:
+        OSError: If the photo can't be read as an image
+    """
+    sizes = [size for size in PHOTO_VARIANT_SIZES
+             if overwrite or not os.path.exists(variant_path(photo_path, size))]
+    directory = os.path.dirname(photo_path) or '.'
+    for size, data in render_photo_variants(photo_path, sizes).items():
+        fd, tmp_path = tempfile.mkstemp(suffix=f'.{PHOTO_VARIANT_EXTENSION}', dir=directory)
+        with os.fdopen(fd, 'wb') as tmp_file:
+            tmp_file.write(data)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, variant_path(photo_path, size))
+    return len(sizes)
+
+
+def remove_photo_variants(photo_path):
+    """Delete the variants of a photo (the photo itself is left alone)"""
+    for size in PHOTO_VARIANT_SIZES:
+        try:
+            os.remove(variant_path(photo_path, size))
+        except FileNotFoundError:
+            pass
+
+
+def backfill_photo_variants(photo_paths, overwrite=False):
+    """
+    Make variants for several photos; meant for a process pool.
+
+    Returns:
+        tuple: (variant files written, list of (photo_path, error message) that failed)
+    """
+    written = 0
+    failed = []
+    for photo_path in photo_paths:
+        try:
+            written += make_photo_variants(photo_path, overwrite)
+        except (OSError, ValueError, Image.DecompressionBombError) as error:
+            failed.append((photo_path, str(error)))
+    return written, failed
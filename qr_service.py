@@ -0,0 +1,247 @@
+"""
+QR code rendering for student badges
+Kept free of Flask and database imports so it can run in worker processes
+"""
+
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import qrcode
+from PIL import Image
+
+QR_RENDER_VERSION = 1  # bump when render_qr_image output changes so files are rendered again
+QR_BORDER = 4
+QR_BOX_SIZE = 10
+
+
+def qr_matrix(data, border=QR_BORDER):
+    """
+    Module matrix for a payload, quiet zone included.
+
+    Returns:
+        numpy.ndarray: 2-D bool array, True for dark modules
+    """
+    qr = qrcode.QRCode(border=border)
+    qr.add_data(data)
+    qr.make(fit=True)
+    return np.array(qr.get_matrix(), dtype=bool)
+
+
+def render_qr_image(data, box_size=QR_BOX_SIZE, border=QR_BORDER):
+    """
+    Render a QR code as a black and white PIL image.
+
+    The module matrix comes from qrcode and is scaled up with numpy, which
+    gives the same pixels as qrcode.make(data) without drawing every module
+    as a separate rectangle.
+
+    Args:
+        data (str): Payload to encode (the student number)
+        box_size (int): Pixels per QR module
+        border (int): Quiet zone width in modules
+
+    Returns:
+        PIL.Image.Image: Mode '1' image
+    """
+    return scale_qr_matrix(qr_matrix(data, border), box_size)
+
+
+def read_qr_matrix(path):
+    """
+    Recover the module matrix from a PNG written by write_qr_pngs.
+
+    Much cheaper than encoding the payload again; returns None if the file is
+    missing or isn't a full-size render.
+    """
+    try:
+        with Image.open(path) as image:
+            pixels = np.asarray(image.convert('1'))
+    except (OSError, ValueError):
+        return None
+    if pixels.shape[0] % QR_BOX_SIZE or pixels.shape[0] != pixels.shape[1]:
+        return None
+    return ~pixels[::QR_BOX_SIZE, ::QR_BOX_SIZE]
+
+
+def scale_qr_matrix(modules, box_size):
+    """Mode '1' image of a module matrix with box_size pixels per module"""
+    pixels = np.repeat(np.repeat(~modules, box_size, axis=0), box_size, axis=1)
+    return Image.fromarray(pixels)
+
+
+def render_qr_png(data, size=None):
+    """
+    Encode a QR code as PNG bytes.
+
+    Args:
+        data (str): Payload to encode
+        size (int): Largest width in pixels; modules stay whole pixels, so the
+            image is the biggest multiple of the module count that fits
+            (at least one pixel per module). None gives the full-size image.
+
+    Returns:
+        bytes: PNG file contents
+    """
+    modules = qr_matrix(data)
+    box_size = QR_BOX_SIZE if size is None else max(1, size // len(modules))
+    buffer = io.BytesIO()
+    scale_qr_matrix(modules, box_size).save(buffer, 'PNG', optimize=True)
+    return buffer.getvalue()
+
+
+def render_qr_svg(data, size=None):
+    """
+    Encode a QR code as an SVG document.
+
+    Each row of dark modules is drawn as horizontal runs in a single path,
+    so the file stays small and scales without blurring.
+
+    Args:
+        data (str): Payload to encode
+        size (int): Width and height attributes in pixels; None leaves the
+            image at one unit per module times the usual box size
+
+    Returns:
+        bytes: UTF-8 SVG document
+    """
+    modules = qr_matrix(data)
+    count = len(modules)
+    runs = []
+    for y, row in enumerate(modules):
+        # Run boundaries are where the row changes between light and dark
+        edges = np.flatnonzero(np.diff(np.concatenate(([False], row, [False])).astype(np.int8)))
+        for start, end in zip(edges[::2], edges[1::2]):
+            runs.append(f'M{start} {y}h{end - start}v1h-{end - start}z')
+    pixels = size or count * QR_BOX_SIZE
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{pixels}" height="{pixels}" '
+        f'viewBox="0 0 {count} {count}" shape-rendering="crispEdges">'
+        f'<rect width="{count}" height="{count}" fill="#fff"/>'
+        f'<path fill="#000" d="{"".join(runs)}"/></svg>'
+    ).encode()
+
+
+def qr_digest(data):
+    """SHA-256 hex digest naming the rendered file for a payload"""
+    return hashlib.sha256(f'{QR_RENDER_VERSION}:{data}'.encode()).hexdigest()
+
+
+def write_qr_pngs(items, overwrite=False):
+    """
+    Write QR PNG files, skipping ones that already exist.
+
+    Meant to be submitted to a process pool with a batch of items at a time.
+    Each file is written under a temporary name and renamed into place, so a
+    reader never sees a half-written image.
+
+    Args:
+        items (list): (data, path) pairs
+        overwrite (bool): Render again even if the file exists
+
+    Returns:
+        int: Number of files processed
+    """
+    for data, path in items:
+        if not overwrite and os.path.exists(path):
+            continue
+        directory = os.path.dirname(path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(suffix='.png', dir=directory)
+        with os.fdopen(fd, 'wb') as tmp_file:
+            render_qr_image(data).save(tmp_file, 'PNG')
+        os.chmod(tmp_path, 0o644)  # mkstemp creates files readable by the owner only
+        os.replace(tmp_path, path)
+    return len(items)
+
+
+class QRCodeService:
+    """
+    Content-addressed QR files for badge sheets.
+
+    Files are named after qr_digest(payload), so a payload is rendered once no
+    matter how many students share it, and a changed student number simply
+    points at a different file.
+    """
+
+    def __init__(self, directory, max_workers=None, batch_size=200):
+        self.directory = directory
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+
+    def path_for(self, data):
+        """Path the QR code for a payload is (or will be) stored at"""
+        return f'{self.directory}/{qr_digest(data)}.png'
+
+    def write_all(self, payloads, overwrite=False):
+        """
+        Render the files for many payloads in a process pool, in batches.
+
+        Args:
+            payloads (iterable): Payload strings (student numbers); repeats are rendered once
+            overwrite (bool): Render again even if a file already exists
+
+        Returns:
+            tuple: (distinct payloads checked, payloads whose batch failed)
+        """
+        items = list({self.path_for(data): (data, self.path_for(data)) for data in payloads}.values())
+        batches = [items[start:start + self.batch_size] for start in range(0, len(items), self.batch_size)]
+        failed = 0
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [(executor.submit(write_qr_pngs, batch, overwrite), len(batch)) for batch in batches]
+            for future, count in futures:
+                if future.exception() is not None:
+                    failed += count
+        return len(items), failed
+
+
+class QRImageCache:
+    """
+    Thread-safe LRU of encoded QR images, bounded by total size in bytes.
+
+    Keys are whatever identifies one rendering (payload, format, size); the
+    least recently used entries are dropped once max_bytes is exceeded.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_render(self, key, render):
+        """
+        Return the cached bytes for key, calling render() on a miss.
+
+        Rendering happens outside the lock, so two threads missing on the same
+        key may both render it; the result is identical either way.
+        """
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return body
+            self.misses += 1
+        body = render()
+        with self._lock:
+            if key not in self._entries and len(body) <= self.max_bytes:
+                self._entries[key] = body
+                self._bytes += len(body)
+                while self._bytes > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._bytes -= len(evicted)
+        return body
+
+    def stats(self):
+        """Entry count, cached bytes and hit/miss counters"""
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes,
+                    'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,140 @@
+"""
+Background Job Scheduler for Attendance System
+Runs periodic and one-off jobs from a single timer thread ordered by a heap
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class JobScheduler:
+    """
+    In-process job runner.
+
+    Jobs are kept in a heap ordered by their next run time. One worker thread
+    sleeps until the earliest job is due, so the cost does not grow with the
+    number of scheduled jobs. Jobs run one at a time on that thread and are
+    responsible for their own app context.
+    """
+
+    def __init__(self, name='attendance-scheduler'):
+        self.name = name
+        self._heap = []  # (run_at, sequence, job_name, generation, periodic)
+        self._jobs = {}  # job_name -> {'func', 'interval', 'generation'}
+        self._sequence = itertools.count()
+        self._generations = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+    def add_job(self, name, func, interval=None, run_at=None):
+        """
+        Register a job, replacing any job with the same name.
+
+        Args:
+            name (str): Unique job name
+            func (callable): Function to run, called with no arguments
+            interval (float): Seconds between runs for periodic jobs, None for a one-off job
+            run_at (float): Epoch seconds of the first run (defaults to now)
+        """
+        with self._condition:
+            generation = next(self._generations)
+            self._jobs[name] = {'func': func, 'interval': interval, 'generation': generation}
+            self._push(run_at if run_at is not None else time.time(), name, generation, periodic=True)
+
+    def run_now(self, name):
+        """Queue an extra run of a registered job; it runs once the worker thread is started"""
+        with self._condition:
+            job = self._jobs.get(name)
+            if job is None:
+                raise KeyError(f'Unknown job: {name}')
+            self._push(time.time(), name, job['generation'], periodic=False)
+
+    def cancel(self, name):
+        """Remove a job; entries already in the heap are skipped when they come due"""
+        with self._condition:
+            self._jobs.pop(name, None)
+            self._condition.notify()
+
+    def jobs(self):
+        """Names of the registered jobs"""
+        with self._condition:
+            return list(self._jobs)
+
+    def next_run_time(self, name):
+        """Epoch seconds of the next scheduled run of a job, or None"""
+        with self._condition:
+            job = self._jobs.get(name)
+            if job is None:
+                return None
+            times = [entry[0] for entry in self._heap
+                     if entry[2] == name and entry[3] == job['generation']]
+            return min(times) if times else None
+
+    def is_running(self):
+        """Whether the worker thread is alive"""
+        with self._condition:
+            return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start the worker thread if it isn't already running"""
+        with self._condition:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        """Stop the worker thread after the current job finishes"""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _push(self, run_at, name, generation, periodic):
+        heapq.heappush(self._heap, (run_at, next(self._sequence), name, generation, periodic))
+        self._condition.notify()
+
+    def _next_due(self):
+        """Wait for and pop the next due job; returns None when stopped"""
+        with self._condition:
+            while True:
+                if self._stopped:
+                    return None
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+                run_at, _, name, generation, periodic = self._heap[0]
+                delay = run_at - time.time()
+                if delay > 0:
+                    self._condition.wait(delay)
+                    continue
+                heapq.heappop(self._heap)
+
+                job = self._jobs.get(name)
+                if job is None or job['generation'] != generation:
+                    continue  # cancelled or replaced
+                if periodic:
+                    if job['interval']:
+                        self._push(max(run_at + job['interval'], time.time()), name, generation, periodic=True)
+                    else:
+                        del self._jobs[name]  # one-off job has run
+                return name, job['func']
+
+    def _run(self):
+        while True:
+            due = self._next_due()
+            if due is None:
+                return
+            name, func = due
+            try:
+                func()
+            except Exception:
+                logger.exception('Background job %s failed', name)
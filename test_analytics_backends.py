@@ -0,0 +1,69 @@
+"""
+Checks that the numpy analytics backend returns the same panels as the Python one.
+"""
+import random
+
+from datetime import date, time, timedelta
+from werkzeug.security import generate_password_hash
+from app import app, db, Teacher, Class, Student, Attendance, AttendanceFrame, NumpyAttendanceFrame
+
+STATUSES = ['Present', 'Present', 'Late', 'Absent', 'Excused']
+
+
+def setup_module(module):
+    rng = random.Random(7)
+    with app.app_context():
+        teacher = Teacher(username='backend_teacher', password=generate_password_hash('secret'))
+        db.session.add(teacher)
+        db.session.commit()
+        classes = [Class(name=f'Backend Class {i}', teacher_id=teacher.id,
+                         start_time=time(8 + i, 0), end_time=time(9 + i, 0)) for i in range(3)]
+        db.session.add_all(classes)
+        db.session.commit()
+        students = [Student(name=f'Backend Student {i}', student_number=str(10000 + i),
+                            class_id=classes[i % 3].id) for i in range(12)]
+        db.session.add_all(students)
+        db.session.commit()
+        for day in range(70):
+            for class_ in classes:
+                for student in students:
+                    if rng.random() < 0.3:
+                        continue
+                    status = rng.choice(STATUSES)
+                    late_minutes = rng.randint(0, 30) if status == 'Late' else 0
+                    db.session.add(Attendance(
+                        student_id=student.id, class_id=class_.id, teacher_id=teacher.id,
+                        date=date.today() - timedelta(days=day), status=status,
+                        scan_time=time(rng.randint(7, 11), rng.randint(0, 59)), late_minutes=late_minutes
+                    ))
+        db.session.commit()
+
+
+def panels(frame, students, classes, class_id, days):
+    return {
+        'trends': frame.trends(days, class_id),
+        'student_summaries': [
+            {**summary, 'student': summary['student'].id}
+            for summary in frame.student_summaries(students, class_id, days)
+        ],
+        'class_comparison': frame.class_comparison(classes, days),
+        'time_analytics': frame.time_analytics(class_id, days),
+    }
+
+
+def test_numpy_backend_matches_python_backend():
+    with app.app_context():
+        teacher = Teacher.query.filter_by(username='backend_teacher').first()
+        classes = Class.query.filter_by(teacher_id=teacher.id).all()
+        python_frame = AttendanceFrame.load(teacher.id, 60)
+        numpy_frame = NumpyAttendanceFrame.load(teacher.id, 60)
+        assert len(python_frame) == len(numpy_frame) > 0
+
+        for class_id in ['all', str(classes[1].id)]:
+            students = Student.query
+            if class_id != 'all':
+                students = students.filter(Student.class_id == class_id)
+            students = students.order_by(Student.id).all()
+            for days in [7, 30, 60]:
+                assert panels(numpy_frame, students, classes, class_id, days) == \
+                    panels(python_frame, students, classes, class_id, days)
@@ -0,0 +1,78 @@
+"""
+Checks the ring buffer behind the rolling per-student attendance counters.
+Builds StudentAttendanceCounter objects in memory, plus the nightly roll job's retry.
+"""
+import random
+
+from datetime import date, timedelta
+import pytest
+from app import StudentAttendanceCounter, COUNTER_WINDOW_DAYS, run_counter_roll_job, scheduler
+
+STATUSES = ['Present', 'Late', 'Absent', 'Excused']
+END = date(2025, 6, 30)
+
+
+def expected_counts(history, window_end):
+    """Counts computed from scratch over the window ending at window_end"""
+    window = [status for day, status in history.items()
+              if 0 <= (window_end - day).days <= COUNTER_WINDOW_DAYS]
+    return {
+        'present_count': window.count('Present'),
+        'late_count': window.count('Late'),
+        'absent_count': window.count('Absent'),
+        'excused_count': window.count('Excused'),
+        'total_count': len(window),
+    }
+
+
+def counts(counter):
+    return {key: getattr(counter, key) for key in
+            ['present_count', 'late_count', 'absent_count', 'excused_count', 'total_count']}
+
+
+def test_set_day_overwrites_and_ignores_days_outside_window():
+    counter = StudentAttendanceCounter.empty(1, 1, END)
+    counter.set_day(END, 'Absent')
+    counter.set_day(END, 'Late')  # edited record replaces the old status
+    counter.set_day(END - timedelta(days=COUNTER_WINDOW_DAYS + 1), 'Absent')
+    counter.set_day(END + timedelta(days=1), 'Absent')
+    assert counts(counter) == {'present_count': 0, 'late_count': 1, 'absent_count': 0,
+                               'excused_count': 0, 'total_count': 1}
+    assert counter.recent_days(1) == [(END.toordinal(), 'Late')]
+
+
+def test_rolling_matches_recount():
+    rng = random.Random(3)
+    start = END - timedelta(days=200)
+    history = {start + timedelta(days=d): rng.choice(STATUSES) for d in range(201) if rng.random() < 0.8}
+
+    counter = StudentAttendanceCounter.empty(1, 1, start)
+    window_end = start
+    for day in sorted(history):
+        # Move the window in uneven steps, sometimes further than its length
+        if day > window_end:
+            window_end = min(day + timedelta(days=rng.choice([0, 3, 70])), END)
+            counter.roll_to(window_end)
+            # Days that just entered the window are filled in from the records
+            for entered, status in history.items():
+                if day < entered <= window_end:
+                    counter.set_day(entered, status)
+        counter.set_day(day, history[day])
+        assert counts(counter) == expected_counts(history, window_end)
+
+    recent = [status for day, status in sorted(history.items()) if (window_end - day).days < 8]
+    assert [status for _, status in counter.recent_days(8)] == recent
+
+
+def test_failed_roll_is_requeued(monkeypatch):
+    def fail():
+        raise RuntimeError('database is locked')
+
+    monkeypatch.setattr('app.sync_attendance_counters', fail)
+    scheduler.cancel('roll_attendance_counters')
+    try:
+        with pytest.raises(RuntimeError):  # still raised, so the scheduler logs it
+            run_counter_roll_job()
+        assert scheduler.next_run_time('roll_attendance_counters') is not None
+    finally:
+        scheduler.cancel('roll_attendance_counters')
@@ -0,0 +1,83 @@
+"""
+Query-count check for the Take Attendance page.
+"""
+
+from datetime import date, time, datetime
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+from app import app, db, Teacher, Class, Student, Attendance, ExcuseRequest
+
+# load_user + class lookup + the joined students/attendance query
+ATTENDANCE_PAGE_QUERIES = 3
+STATUSES = ['Present', 'Late', 'Absent', 'Excused']
+TEST_DATE = date(2025, 9, 15)
+
+
+def setup_module(module):
+    with app.app_context():
+        teacher = Teacher(username='query_teacher', password=generate_password_hash('secret'))
+        db.session.add(teacher)
+        db.session.commit()
+        db.session.add(Class(name='Query Class', teacher_id=teacher.id, start_time=time(8, 0), end_time=time(9, 0)))
+        db.session.commit()
+
+
+def add_students_with_records(count, offset):
+    """Add students and one attendance record each, cycling through the statuses"""
+    with app.app_context():
+        class_ = Class.query.first()
+        for i in range(offset, offset + count):
+            student = Student(name=f'Student {i}', student_number=str(10000 + i))
+            db.session.add(student)
+            db.session.flush()
+            status = STATUSES[i % len(STATUSES)]
+            excuse_request = None
+            if status == 'Excused':
+                excuse_request = ExcuseRequest(
+                    student_id=student.id, class_id=class_.id, teacher_id=class_.teacher_id,
+                    absence_date=TEST_DATE, reason='Test excuse', status='Pending'
+                )
+                db.session.add(excuse_request)
+                db.session.flush()
+            db.session.add(Attendance(
+                student_id=student.id, class_id=class_.id, teacher_id=class_.teacher_id,
+                date=TEST_DATE, scan_time=datetime.now().time(), status=status,
+                excuse_request_id=excuse_request.id if excuse_request else None
+            ))
+        db.session.commit()
+        return class_.id
+
+
+def count_page_queries(class_id):
+    client = app.test_client()
+    client.post('/login', data={'username': 'query_teacher', 'password': 'secret'})
+
+    with app.app_context():
+        engine = db.engine
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        response = client.get(f'/classes/{class_id}/attendance?attendance_date={TEST_DATE}')
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+    assert response.status_code == 200
+    return len(statements), response
+
+
+def test_attendance_page_query_count_is_fixed():
+    class_id = add_students_with_records(8, 0)
+    small_count, response = count_page_queries(class_id)
+    assert small_count == ATTENDANCE_PAGE_QUERIES
+    assert b'Student 0' in response.data
+    assert b'Pending Review' in response.data
+
+    # Twenty times the roster must not add any queries
+    add_students_with_records(160, 8)
+    large_count, response = count_page_queries(class_id)
+    assert large_count == ATTENDANCE_PAGE_QUERIES
+    assert b'Student 167' in response.data
@@ -0,0 +1,99 @@
+"""
+Checks badge sheet rendering, the streamed PDF and zip writers, the badge jobs behind
+/students/badges and its filters.
+"""
+import io
+import re
+import time
+import zipfile
+
+from PIL import Image
+from werkzeug.security import generate_password_hash
+from app import app, db, Teacher, Class, Student
+from badge_sheets import PAGE_SIZE, iter_pdf, render_badge_page
+
+
+def setup_module(module):
+    with app.app_context():
+        teacher = Teacher(username='badge_teacher', password=generate_password_hash('secret'))
+        other = Teacher(username='badge_other', password=generate_password_hash('secret'))
+        db.session.add_all([teacher, other])
+        db.session.flush()
+        own_class = Class(name='Badge Class', teacher_id=teacher.id)
+        other_class = Class(name='Other Badge Class', teacher_id=other.id)
+        db.session.add_all([own_class, other_class])
+        db.session.flush()
+        db.session.add_all([Student(name=f'Badge Student {i}', student_number=str(10000 + i), class_id=own_class.id)
+                            for i in range(11)])
+        db.session.commit()
+        module.own_class_id, module.other_class_id = own_class.id, other_class.id
+
+
+def pdf_pages(data):
+    """Page count of a PDF, after checking every xref offset points at its object"""
+    start = int(re.search(rb'startxref\n(\d+)', data).group(1))
+    xref = data[start:].split(b'\n')
+    count = int(xref[1].split()[1])
+    for number, entry in enumerate(xref[3:2 + count], start=1):
+        offset = int(entry[:10])
+        assert data[offset:].startswith(f'{number} 0 obj'.encode())
+    return int(re.search(rb'/Type /Pages /Kids \[[^\]]*\] /Count (\d+)', data).group(1))
+
+
+def build_sheet(client, query):
+    """Start a badge job, poll it until it is done and return the status and the downloaded sheet"""
+    page = client.get(f'/students/badges?{query}')
+    assert page.status_code == 200
+    status_url = re.search(r"fetch\('([^']+)'\)", page.get_data(as_text=True)).group(1)
+    for _ in range(300):
+        job = client.get(status_url).get_json()['job']
+        if job['state'] in ('finished', 'failed'):
+            break
+        time.sleep(0.1)
+    assert job['state'] == 'finished', job
+    return job, status_url, client.get(job['download_url'])
+
+
+def test_page_render_and_pdf_writer():
+    badges = [('A Student', '10100', None, None), ('Missing Photo', '10101', 'static/photos/none.jpg', None)]
+    page = render_badge_page(badges, 4, 'JPEG')
+    with Image.open(io.BytesIO(page)) as image:
+        assert image.format == 'JPEG' and image.size == PAGE_SIZE
+    data = b''.join(iter_pdf([page, page, page]))
+    assert data.startswith(b'%PDF-1.4') and data.endswith(b'%%EOF\n')
+    assert pdf_pages(data) == 3
+
+
+def test_badges_for_class_as_pdf_and_zip():
+    client = app.test_client()
+    client.post('/login', data={'username': 'badge_teacher', 'password': 'secret'})
+    job, status_url, response = build_sheet(client, f'class_id={own_class_id}&per_page=4')
+    assert job['pages'] == job['pages_done'] == 3  # 11 students, 4 per page
+    assert response.mimetype == 'application/pdf'
+    assert 'qr_badges.pdf' in response.headers['Content-Disposition']
+    assert pdf_pages(response.data) == 3
+
+    job, status_url, response = build_sheet(client, f'class_id={own_class_id}&format=zip&per_page=12')
+    archive = zipfile.ZipFile(io.BytesIO(response.data))
+    assert archive.namelist() == ['badges-001.png']
+    with Image.open(archive.open('badges-001.png')) as image:
+        assert image.size == PAGE_SIZE
+
+    other = app.test_client()
+    other.post('/login', data={'username': 'badge_other', 'password': 'secret'})
+    assert other.get(status_url).status_code == 404
+    assert other.get(job['download_url']).status_code == 404
+
+
+def test_badge_filters_and_access():
+    client = app.test_client()
+    client.post('/login', data={'username': 'badge_teacher', 'password': 'secret'})
+    with app.app_context():
+        ids = [s.id for s in Student.query.filter(Student.student_number.in_(['10000', '10001']))]
+    query = '&'.join(f'student_id={student_id}' for student_id in ids)
+    assert pdf_pages(build_sheet(client, f'{query}&per_page=4')[2].data) == 1
+    assert pdf_pages(build_sheet(client, 'search=1000&per_page=4')[2].data) == 3  # 10000-10009
+    assert client.get(f'/students/badges?class_id={other_class_id}').status_code == 403
+    assert client.get('/students/badges?per_page=7').status_code == 400
+    assert client.get('/students/badges?format=tiff').status_code == 400
+    assert client.get('/students/badges?search=no such student').status_code == 302
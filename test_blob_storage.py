@@ -0,0 +1,166 @@
+"""
+Checks content-addressed upload storage: deduplication, blob references, gc-uploads and migrate-uploads.
+"""
+import hashlib
+import io
+import os
+from datetime import date, timedelta
+
+import app as app_module
+from PIL import Image
+from werkzeug.security import generate_password_hash
+from app import app, db, Teacher, Class, Student, ExcuseRequest, Blob, BlobReference, blob_store, record_blob
+from blob_storage import BlobStore, LocalBlobBackend, blob_key
+from photo_variants import PHOTO_VARIANT_SIZES, variant_path
+
+
+def setup_module(module):
+    with app.app_context():
+        teacher = Teacher(username='blob_teacher', password=generate_password_hash('secret'))
+        db.session.add(teacher)
+        db.session.flush()
+        class_ = Class(name='Blob Class', teacher_id=teacher.id)
+        db.session.add(class_)
+        db.session.add_all([Student(name=f'Blob Student {i}', student_number=str(10000 + i)) for i in range(3)])
+        db.session.commit()
+        module.class_id = class_.id
+
+
+def png_bytes(color):
+    buffer = io.BytesIO()
+    Image.new('RGB', (120, 90), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def student_ids():
+    with app.app_context():
+        return [s.id for s in Student.query.order_by(Student.student_number)]
+
+
+def references(key):
+    with app.app_context():
+        return sorted((r.owner_type, r.owner_id) for r in BlobReference.query.filter_by(blob_key=key))
+
+
+def test_store_hashes_while_copying_and_deduplicates(tmp_path, monkeypatch):
+    monkeypatch.setattr('blob_storage.HASH_CHUNK_SIZE', 7)  # several chunks per file
+    store = BlobStore(LocalBlobBackend(str(tmp_path / 'blobs'), url_prefix='/files'))
+    data = b'excuse letter contents ' * 10
+    key, size, created = store.save(io.BytesIO(data), 'PNG')
+    assert key == blob_key(hashlib.sha256(data).hexdigest(), 'png')
+    assert (size, created) == (len(data), True)
+    assert store.save(io.BytesIO(data), 'png') == (key, len(data), False)
+    with store.open(key) as stored:
+        assert stored.read() == data
+    assert store.url(key) == f'/files/{key}'
+    assert [name for name, _ in store.backend.list()] == [key]  # no temporary files left behind
+    assert store.list_older_than(-60) == [key] and store.list_older_than(60) == []
+    store.delete([key])
+    assert not store.exists(key)
+
+
+def test_uploads_are_shared_referenced_and_collected(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # uploads are stored under static/blobs
+    client = app.test_client()
+    client.post('/login', data={'username': 'blob_teacher', 'password': 'secret'})
+    first, second, third = student_ids()
+
+    # The same photo for two students is stored once and referenced twice
+    for student_id in (first, second):
+        client.post(f'/students/edit/{student_id}', data={
+            'name': f'Blob Student {student_id}', 'photo': (io.BytesIO(png_bytes('green')), 'photo.png')
+        }, content_type='multipart/form-data')
+    with app.app_context():
+        shared = Student.query.get(first).photo_path
+        assert Student.query.get(second).photo_path == shared
+        assert Blob.query.count() == 1
+    assert references(shared) == [('student_photo', first), ('student_photo', second)]
+    assert os.path.exists(blob_store.local_path(variant_path(shared, 64)))
+
+    # Two excuse letters for the same student, class and day no longer overwrite each other
+    letters = []
+    for color in ('red', 'blue'):
+        client.post('/submit-excuse', data={
+            'student_id': third, 'class_id': class_id, 'absence_date': str(date(2002, 3, 4)),
+            'reason': 'Sick', 'excuse_letter': (io.BytesIO(png_bytes(color)), 'letter.png')
+        }, content_type='multipart/form-data')
+    with app.app_context():
+        letters = [r.excuse_letter_path for r in ExcuseRequest.query.filter_by(student_id=third)]
+    assert len(set(letters)) == 2
+
+    # A photo that isn't an image is refused
+    client.post(f'/students/edit/{third}', data={
+        'name': 'Blob Student 3', 'photo': (io.BytesIO(b'not an image'), 'photo.png')
+    }, content_type='multipart/form-data')
+    with app.app_context():
+        assert Student.query.get(third).photo_path is None
+
+    # ...and so is the same file uploaded again, now that its bytes are already stored
+    client.post(f'/students/edit/{third}', data={
+        'name': 'Blob Student 3', 'photo': (io.BytesIO(b'not an image'), 'photo.png')
+    }, content_type='multipart/form-data')
+    with app.app_context():
+        assert Student.query.get(third).photo_path is None
+
+    # Replacing and deleting photos only drop references; gc-uploads deletes the bytes
+    client.post(f'/students/edit/{first}', data={
+        'name': 'Blob Student 1', 'photo': (io.BytesIO(png_bytes('yellow')), 'photo.png')
+    }, content_type='multipart/form-data')
+    assert references(shared) == [('student_photo', second)]
+    client.post(f'/students/{second}/photo/delete')
+    assert references(shared) == []
+    assert os.path.exists(blob_store.local_path(shared))
+
+    runner = app.test_cli_runner()
+    assert 'Deleted 0 unreferenced uploads' in runner.invoke(args=['gc-uploads']).output  # still within the grace period
+    monkeypatch.setattr(app_module, 'UPLOAD_GC_GRACE', timedelta(0))
+    orphan = blob_store.local_path(blob_key('0' * 64, 'png'))
+    os.makedirs(os.path.dirname(orphan), exist_ok=True)
+    open(orphan, 'wb').close()
+    assert 'Would delete 2 unreferenced uploads and 1 orphaned files' in \
+        runner.invoke(args=['gc-uploads', '--dry-run']).output  # the shared photo and the non-image
+    assert os.path.exists(blob_store.local_path(shared))
+    assert 'Deleted 2 unreferenced uploads and 1 orphaned files' in runner.invoke(args=['gc-uploads']).output
+    assert not os.path.exists(blob_store.local_path(shared))
+    assert not os.path.exists(blob_store.local_path(variant_path(shared, 64)))
+    assert not os.path.exists(orphan)
+    with app.app_context():
+        kept = {Student.query.get(first).photo_path, *letters}
+        assert {blob.key for blob in Blob.query} == kept
+    assert all(os.path.exists(blob_store.local_path(key)) for key in kept)
+
+
+def test_record_blob_survives_a_concurrent_delete():
+    key = blob_key('1' * 64, 'png')
+    with app.app_context():
+        record_blob(key, 10, 'image/png')
+        db.session.commit()
+        blob = db.session.get(Blob, key)  # loaded in this session, as an upload checking for it would
+        assert blob is not None
+        with db.engine.begin() as connection:  # gc-uploads deleting it from another connection
+            connection.execute(Blob.__table__.delete().where(Blob.__table__.c.key == key))
+        record_blob(key, 10, 'image/png')
+        db.session.commit()
+        assert db.session.query(Blob.key).filter_by(key=key).scalar() == key
+        db.session.execute(Blob.__table__.delete().where(Blob.__table__.c.key == key))
+        db.session.commit()
+
+
+def test_migrate_uploads_moves_legacy_files(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('static/photos')
+    with open('static/photos/10002.png', 'wb') as legacy:
+        legacy.write(png_bytes('purple'))
+    third = student_ids()[2]
+    with app.app_context():
+        Student.query.get(third).photo_path = 'static/photos/10002.png'
+        db.session.commit()
+
+    output = app.test_cli_runner().invoke(args=['migrate-uploads']).output
+    assert 'Moved 1 files into blob storage' in output
+    with app.app_context():
+        key = Student.query.get(third).photo_path
+    assert key == blob_key(hashlib.sha256(png_bytes('purple')).hexdigest(), 'png')
+    assert references(key) == [('student_photo', third)]
+    assert not os.path.exists('static/photos/10002.png')
+    assert all(os.path.exists(blob_store.local_path(variant_path(key, size))) for size in PHOTO_VARIANT_SIZES)
@@ -0,0 +1,121 @@
+"""
+Checks the change_seq tracking behind /api/changes, paging through the feed and reported deletions.
+"""
+
+from datetime import date, time, timedelta
+from werkzeug.security import generate_password_hash
+from app import (app, db, Teacher, Class, Student, Attendance, ExcuseRequest,
+                 bulk_mark_absent_students, get_changes_since, parse_change_cursor)
+
+DAY = date(2025, 9, 15)
+
+
+def setup_module(module):
+    with app.app_context():
+        teacher = Teacher(username='feed_teacher', password=generate_password_hash('secret'))
+        db.session.add(teacher)
+        db.session.commit()
+        class_ = Class(name='Feed Class', teacher_id=teacher.id, start_time=time(8, 0), end_time=time(9, 0))
+        db.session.add(class_)
+        db.session.commit()
+        db.session.add_all([Student(name=f'Feed Student {i}', student_number=str(10000 + i), class_id=class_.id)
+                            for i in range(5)])
+        db.session.commit()
+
+
+def read_feed(teacher_id, cursor, limit):
+    changes = []
+    while True:
+        page, cursor, has_more = get_changes_since(teacher_id, cursor, limit)
+        assert len(page) <= limit
+        changes.extend(page)
+        if not has_more:
+            return changes, cursor
+
+
+def test_writes_get_increasing_change_seq():
+    with app.app_context():
+        teacher = Teacher.query.filter_by(username='feed_teacher').first()
+        class_ = Class.query.filter_by(teacher_id=teacher.id).first()
+        students = Student.query.filter_by(class_id=class_.id).order_by(Student.id).all()
+
+        # ORM inserts in one transaction share a change_seq
+        for student in students[:3]:
+            db.session.add(Attendance(student_id=student.id, class_id=class_.id, teacher_id=teacher.id,
+                                      date=DAY, status='Present', scan_time=time(8, 0)))
+        db.session.add(ExcuseRequest(student_id=students[3].id, class_id=class_.id, teacher_id=teacher.id,
+                                     absence_date=DAY, reason='Sick'))
+        db.session.commit()
+        first = {record.change_seq for record in Attendance.query.filter_by(teacher_id=teacher.id)}
+        assert len(first) == 1
+
+        # Bulk INSERT ... SELECT gets the next value
+        assert bulk_mark_absent_students([class_.id], [DAY], only_ended=False) >= 2
+        absent = Attendance.query.filter_by(teacher_id=teacher.id, status='Absent').all()
+        assert {student.id for student in students[3:]} <= {record.student_id for record in absent}
+        assert {record.change_seq for record in absent} == {min(first) + 1}
+
+        # An ORM update restamps only the changed row
+        record = Attendance.query.filter_by(teacher_id=teacher.id, student_id=students[0].id).first()
+        record.status = 'Late'
+        db.session.commit()
+        assert record.change_seq == min(first) + 2
+
+
+def test_feed_pages_through_every_row_once():
+    with app.app_context():
+        teacher = Teacher.query.filter_by(username='feed_teacher').first()
+        changes, cursor = read_feed(teacher.id, parse_change_cursor(''), limit=2)
+        keys = [(change['type'], change['data']['id']) for change in changes]
+        expected = [('attendance', record.id) for record in Attendance.query.filter_by(teacher_id=teacher.id)] + \
+                   [('excuse_request', excuse.id) for excuse in ExcuseRequest.query.filter_by(teacher_id=teacher.id)]
+        assert sorted(keys) == sorted(expected)
+        assert changes[0]['data']['date'] == DAY.isoformat()
+
+        # Nothing new after the last cursor until another write
+        assert get_changes_since(teacher.id, cursor)[0] == []
+        excuse = ExcuseRequest.query.filter_by(teacher_id=teacher.id).first()
+        excuse.status = 'Approved'
+        db.session.commit()
+        changes, _ = read_feed(teacher.id, cursor, limit=2)
+        assert [(change['type'], change['data']['status']) for change in changes] == [('excuse_request', 'Approved')]
+
+
+def test_parse_change_cursor():
+    assert parse_change_cursor('7') == (7, 3, 0)
+    assert parse_change_cursor('7.0.15') == (7, 0, 15)
+    for bad in ['x', '7.3.1', '7.0']:
+        try:
+            parse_change_cursor(bad)
+        except ValueError:
+            continue
+        raise AssertionError(bad)
+
+
+def test_deleted_students_and_classes_are_reported():
+    client = app.test_client()
+    client.post('/login', data={'username': 'feed_teacher', 'password': 'secret'})
+    with app.app_context():
+        teacher = Teacher.query.filter_by(username='feed_teacher').first()
+        student = Student.query.filter_by(student_number='10000').one()
+        class_ = Class.query.filter_by(teacher_id=teacher.id).first()
+        db.session.add(ExcuseRequest(student_id=student.id, class_id=class_.id, teacher_id=teacher.id,
+                                     absence_date=DAY + timedelta(days=1), reason='Dentist'))
+        db.session.commit()
+        gone = sorted([('attendance', record.id) for record in student.attendances] +
+                      [('excuse_request', excuse.id) for excuse in student.excuse_requests] +
+                      [('attendance', record.id) for record in Attendance.query.filter(
+                          Attendance.class_id == class_.id, Attendance.student_id != student.id)] +
+                      [('excuse_request', excuse.id) for excuse in ExcuseRequest.query.filter(
+                          ExcuseRequest.class_id == class_.id, ExcuseRequest.student_id != student.id)])
+        student_id, class_id = student.id, class_.id
+        _, cursor = read_feed(teacher.id, parse_change_cursor(''), limit=50)
+    assert len(gone) > 2
+
+    assert client.post(f'/students/delete/{student_id}').status_code == 302
+    assert client.post(f'/classes/delete/{class_id}').status_code == 302
+    with app.app_context():
+        assert Attendance.query.count() == 0 and ExcuseRequest.query.count() == 0
+        changes, _ = read_feed(teacher.id, cursor, limit=2)
+    assert {change['op'] for change in changes} == {'delete'}
+    assert sorted((change['type'], change['data']['id']) for change in changes) == gone
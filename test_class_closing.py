@@ -0,0 +1,100 @@
+"""
+Checks the scheduled class close: only classes that met today are swept, the
+job reads the current classes each time it runs, and web processes leave the
+jobs to the scheduler process.
+"""
+
+from datetime import date, time
+
+import pytest
+from werkzeug.security import generate_password_hash
+from app import (app, db, Teacher, Class, Student, Attendance, close_classes_job, schedule_class_closings,
+                 scheduler)
+
+END = time(0, 0)  # already past whenever the test runs
+JOB = 'close_classes_000000'
+
+
+def setup_module(module):
+    with app.app_context():
+        teacher = Teacher(username='close_teacher', password=generate_password_hash('secret'))
+        db.session.add(teacher)
+        db.session.flush()
+        db.session.add_all([Class(name=name, teacher_id=teacher.id, start_time=END, end_time=END)
+                            for name in ('Met', 'Skipped')])
+        db.session.add_all([Student(name=f'Close Student {i}', student_number=str(10000 + i)) for i in range(3)])
+        db.session.commit()
+        module.teacher_id = teacher.id
+
+
+def teardown_module(module):
+    scheduler.cancel(JOB)
+
+
+def scan(class_name):
+    with app.app_context():
+        class_ = Class.query.filter_by(name=class_name).one()
+        db.session.add(Attendance(student_id=Student.query.first().id, class_id=class_.id, teacher_id=teacher_id,
+                                  date=date.today(), scan_time=END, status='Present'))
+        db.session.commit()
+
+
+def absent_by_class():
+    with app.app_context():
+        return {name: count for name, count in db.session.query(Class.name, db.func.count(Attendance.id))
+                .outerjoin(Attendance, (Attendance.class_id == Class.id) & (Attendance.status == 'Absent'))
+                .group_by(Class.name)}
+
+
+def test_only_classes_with_a_scan_are_closed():
+    scan('Met')
+    close_classes_job(END)
+    assert absent_by_class() == {'Met': 2, 'Skipped': 0}
+    assert scheduler.next_run_time(JOB) is not None  # re-armed for tomorrow
+
+
+def test_classes_added_after_queueing_are_picked_up():
+    with app.app_context():
+        db.session.add(Class(name='Late Addition', teacher_id=teacher_id, start_time=END, end_time=END))
+        db.session.commit()
+    scan('Late Addition')
+    close_classes_job(END)
+    assert absent_by_class() == {'Met': 2, 'Skipped': 0, 'Late Addition': 2}
+
+
+def test_job_is_not_rearmed_once_no_class_ends_then():
+    scheduler.cancel(JOB)
+    with app.app_context():
+        for class_ in Class.query.all():
+            class_.end_time = time(23, 59)
+        db.session.commit()
+    close_classes_job(END)
+    assert scheduler.next_run_time(JOB) is None
+
+
+def test_failed_run_is_rolled_back_and_rearmed(monkeypatch):
+    with app.app_context():
+        Class.query.filter_by(name='Met').one().end_time = END
+        db.session.commit()
+
+    def fail(class_ids, dates):
+        db.session.add(Class(name='Never Committed', teacher_id=teacher_id))
+        db.session.flush()
+        raise RuntimeError('database is locked')
+
+    monkeypatch.setattr('app.bulk_mark_absent_students', fail)
+    with pytest.raises(RuntimeError):  # still raised, so the scheduler logs it
+        close_classes_job(END)
+    assert scheduler.next_run_time(JOB) is not None
+    with app.app_context():
+        assert Class.query.filter_by(name='Never Committed').count() == 0
+
+
+def test_web_processes_leave_the_jobs_to_the_scheduler(monkeypatch):
+    monkeypatch.setitem(app.config, 'AUTO_CLOSE_CLASSES', True)
+    scheduler.cancel(JOB)
+    app.test_client().get('/login')
+    assert not scheduler.is_running()  # serving a request starts no scheduler thread
+    with app.app_context():
+        schedule_class_closings()
+    assert scheduler.next_run_time(JOB) is None
@@ -87,7 +87,7 @@ with app.app_context():
         print(f"- Old pending requests (>7 days) → Status becomes 'Disapproved'")
         print(f"- Attendance status changes from 'Excused' → 'Absent'")
         print(f"- Auto-added teacher notes about expiration")
-        print(f"- This runs automatically when dashboard is accessed")
+        print(f"- This runs automatically in the background scheduler")
         
     else:
         print("No student or class found for testing")
\ No newline at end of file
@@ -0,0 +1,86 @@
+"""
+Checks keyset pagination and status totals on /records/manage.
+"""
+import re
+
+from datetime import date, time, timedelta
+from werkzeug.security import generate_password_hash
+from app import (app, db, Teacher, Class, Student, Attendance, DailyClassStats, rebuild_daily_class_stats,
+                 encode_page_token, decode_page_token)
+
+START = date(2025, 9, 1)
+
+
+def setup_module(module):
+    with app.app_context():
+        teacher = Teacher(username='pages_teacher', password=generate_password_hash('secret'))
+        db.session.add(teacher)
+        db.session.commit()
+        class_ = Class(name='Pages Class', teacher_id=teacher.id, start_time=time(8, 0), end_time=time(9, 0))
+        db.session.add(class_)
+        db.session.commit()
+        students = [Student(name=f'Pages Student {i}', student_number=str(10000 + i)) for i in range(4)]
+        db.session.add_all(students)
+        db.session.commit()
+        for day in range(6):
+            for i, student in enumerate(students):
+                db.session.add(Attendance(student_id=student.id, class_id=class_.id, teacher_id=teacher.id,
+                                          date=START + timedelta(days=day), scan_time=time(8, 0),
+                                          status='Absent' if (day + i) % 3 == 0 else 'Present'))
+        db.session.commit()
+        rebuild_daily_class_stats()
+
+
+def rendered_ids(html):
+    return [int(attendance_id) for attendance_id in re.findall(r'/attendance/edit/(\d+)', html)]
+
+
+def test_page_tokens_round_trip():
+    assert decode_page_token(encode_page_token(START, 42)) == (START, 42)
+    assert decode_page_token('not-a-token') is None
+    assert decode_page_token(None) is None
+
+
+def test_next_and_previous_walk_every_record():
+    client = app.test_client()
+    client.post('/login', data={'username': 'pages_teacher', 'password': 'secret'})
+    with app.app_context():
+        class_ = Class.query.filter_by(name='Pages Class').first()
+        expected = [record.id for record in Attendance.query.filter_by(class_id=class_.id)
+                    .order_by(Attendance.date.desc(), Attendance.id.desc())]
+        absent = Attendance.query.filter_by(class_id=class_.id, status='Absent').count()
+
+    pages = []
+    html = client.get(f'/records/manage?class_id={class_.id}').get_data(as_text=True)
+    assert f'Absent: {absent}' in html
+    while True:
+        pages.append(rendered_ids(html))
+        link = re.search(r'href="(\?after=[^"]+)"', html)
+        if link is None or link.group(1).startswith('?after=&'):
+            break
+        html = client.get('/records/manage' + link.group(1).replace('&amp;', '&')).get_data(as_text=True)
+    assert [record_id for page in pages for record_id in page] == expected
+    assert all(len(page) == 10 for page in pages[:-1])
+
+    # Walk back from the last page
+    back = [pages[-1]]
+    while True:
+        link = re.search(r'href="(\?before=[^"]+)"', html)
+        if link is None or link.group(1).startswith('?before=&'):
+            break
+        html = client.get('/records/manage' + link.group(1).replace('&amp;', '&')).get_data(as_text=True)
+        back.append(rendered_ids(html))
+    assert back[::-1] == pages
+
+
+def test_totals_rebuild_a_rollup_that_was_never_filled():
+    client = app.test_client()
+    client.post('/login', data={'username': 'pages_teacher', 'password': 'secret'})
+    with app.app_context():
+        absent = Attendance.query.filter_by(status='Absent').count()
+        db.session.execute(DailyClassStats.__table__.delete())
+        db.session.commit()
+
+    assert f'Absent: {absent}' in client.get('/records/manage').get_data(as_text=True)
+    with app.app_context():
+        assert DailyClassStats.query.count() == 6  # one row per class and day
@@ -0,0 +1,85 @@
+"""
+Checks the Parquet attendance export: typed columns, row groups, filters and bad dates.
+"""
+
+from datetime import date, time, timedelta
+import pyarrow as pa
+import pyarrow.parquet as pq
+from werkzeug.security import generate_password_hash
+from app import app, db, Teacher, Class, Student, Attendance, write_attendance_parquet
+
+START = date(2025, 3, 3)
+END = START + timedelta(days=9)
+
+
+def setup_module(module):
+    with app.app_context():
+        teachers = [Teacher(username=f'parquet_teacher_{i}', password=generate_password_hash('secret'))
+                    for i in range(2)]
+        db.session.add_all(teachers)
+        db.session.commit()
+        classes = [Class(name=f'Parquet Class {i}', teacher_id=teachers[i % 2].id,
+                         start_time=time(8, 0), end_time=time(9, 0)) for i in range(3)]
+        db.session.add_all(classes)
+        db.session.commit()
+        students = [Student(name=f'Parquet Student {i}', student_number=str(10000 + i),
+                            class_id=classes[i % 3].id) for i in range(6)]
+        db.session.add_all(students)
+        db.session.commit()
+        for day in range((END - START).days + 1):
+            for student in students:
+                late = (day + student.id) % 4 == 0
+                db.session.add(Attendance(
+                    student_id=student.id, class_id=student.class_id,
+                    teacher_id=Class.query.get(student.class_id).teacher_id,
+                    date=START + timedelta(days=day), status='Late' if late else 'Present',
+                    scan_time=time(8, 10 if late else 0, 30), late_arrival=late,
+                    late_minutes=10 if late else 0, notes='Bus' if late else None
+                ))
+        db.session.commit()
+
+
+def test_export_keeps_native_types_and_writes_row_groups(tmp_path):
+    path = tmp_path / 'attendance.parquet'
+    with app.app_context():
+        row_count = write_attendance_parquet(str(path), start_date=START, end_date=END, row_group_size=25)
+        expected = Attendance.query.filter(Attendance.date.between(START, END)).count()
+
+    parquet_file = pq.ParquetFile(path)
+    assert row_count == expected == parquet_file.metadata.num_rows == 60
+    assert parquet_file.metadata.num_row_groups == 3
+    assert parquet_file.metadata.row_group(0).column(0).compression == 'ZSTD'
+
+    table = parquet_file.read()
+    assert table.schema.field('date').type == pa.date32()
+    assert table.schema.field('scan_time').type == pa.time64('us')
+    assert table.schema.field('late_minutes').type == pa.int32()
+    first = table.slice(0, 1).to_pylist()[0]
+    assert first['date'] == START
+    assert isinstance(first['scan_time'], time)
+    assert table.column('date').to_pylist() == sorted(table.column('date').to_pylist())
+
+
+def test_export_filters_by_teacher_class_and_dates(tmp_path):
+    path = tmp_path / 'filtered.parquet'
+    with app.app_context():
+        teacher = Teacher.query.filter_by(username='parquet_teacher_0').first()
+        class_ = Class.query.filter_by(teacher_id=teacher.id).order_by(Class.id).first()
+        row_count = write_attendance_parquet(str(path), teacher.id, START + timedelta(days=2),
+                                             START + timedelta(days=4), str(class_.id))
+
+    table = pq.read_table(path)
+    assert row_count == table.num_rows == 2 * 3
+    assert set(table.column('class_id').to_pylist()) == {class_.id}
+    assert min(table.column('date').to_pylist()) == START + timedelta(days=2)
+    assert max(table.column('date').to_pylist()) == START + timedelta(days=4)
+
+
+def test_route_rejects_malformed_dates():
+    client = app.test_client()
+    client.post('/login', data={'username': 'parquet_teacher_0', 'password': 'secret'})
+    response = client.get('/analytics/export/parquet?start_date=2025-13-01&end_date=soon')
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith('/analytics')
+    response = client.get(f'/analytics/export/parquet?start_date={START}&end_date={END}')
+    assert response.status_code == 200
@@ -0,0 +1,82 @@
+"""
+Checks the resized photo variants made on upload and by the backfill command.
+"""
+import io
+import os
+
+from PIL import Image
+from werkzeug.security import generate_password_hash
+from app import app, db, Teacher, Student, blob_store
+from photo_variants import (PHOTO_VARIANT_SIZES, backfill_photo_variants, make_photo_variants,
+                            remove_photo_variants, variant_path)
+
+
+def setup_module(module):
+    with app.app_context():
+        db.session.add(Teacher(username='photo_teacher', password=generate_password_hash('secret')))
+        db.session.add(Student(name='Photo Student', student_number='10001'))
+        db.session.commit()
+
+
+def jpeg_bytes(size=(600, 400), orientation=None):
+    image = Image.new('RGB', size, 'red')
+    image.paste(Image.new('RGB', (size[0] // 2, size[1]), 'blue'))  # left half blue
+    exif = Image.Exif()
+    if orientation:
+        exif[0x0112] = orientation
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', exif=exif)
+    return buffer.getvalue()
+
+
+def test_variants_are_square_upright_and_skipped_when_present(tmp_path):
+    photo = tmp_path / 'photo.jpg'
+    photo.write_bytes(jpeg_bytes(orientation=6))  # stored sideways, shown rotated 90 degrees
+    assert make_photo_variants(str(photo)) == len(PHOTO_VARIANT_SIZES)
+    for size in PHOTO_VARIANT_SIZES:
+        with Image.open(variant_path(str(photo), size)) as variant:
+            assert variant.size == (size, size)
+    with Image.open(variant_path(str(photo), 256)) as variant:
+        # Upright the photo is 400x600 with blue on top, so the centre crop is split top/bottom
+        top, bottom = variant.convert('RGB').getpixel((128, 10)), variant.convert('RGB').getpixel((128, 245))
+        assert top[2] > 200 and bottom[0] > 200
+
+    assert make_photo_variants(str(photo), overwrite=False) == 0
+    remove_photo_variants(str(photo))
+    assert not any(os.path.exists(variant_path(str(photo), size)) for size in PHOTO_VARIANT_SIZES)
+    assert photo.exists()
+
+
+def test_backfill_reports_unreadable_files(tmp_path):
+    good, bad = tmp_path / 'good.png', tmp_path / 'bad.png'
+    Image.new('RGBA', (80, 80), (0, 0, 0, 0)).save(good)
+    bad.write_bytes(b'not an image')
+    written, failed = backfill_photo_variants([str(good), str(bad)])
+    assert written == len(PHOTO_VARIANT_SIZES)
+    assert [path for path, _ in failed] == [str(bad)]
+
+
+def test_upload_makes_variants_and_pages_use_them(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # uploads are stored under static/blobs
+    client = app.test_client()
+    client.post('/login', data={'username': 'photo_teacher', 'password': 'secret'})
+    with app.app_context():
+        student_id = Student.query.filter_by(student_number='10001').one().id
+
+    client.post(f'/students/edit/{student_id}', data={
+        'name': 'Photo Student', 'photo': (io.BytesIO(jpeg_bytes()), 'me.jpg')
+    }, content_type='multipart/form-data')
+    with app.app_context():
+        photo_key = Student.query.get(student_id).photo_path
+    thumbnail = blob_store.local_path(variant_path(photo_key, 64))
+    assert os.path.exists(thumbnail)
+
+    students = client.get('/api/students?q=10001').get_json()['students']
+    assert students[0]['photo_url'] == blob_store.url(variant_path(photo_key, 64))
+    assert f'src="{blob_store.url(variant_path(photo_key, 256))}"'.encode() in client.get(f'/students/edit/{student_id}').data
+
+    # The backfill command makes missing variants again
+    os.remove(thumbnail)
+    result = app.test_cli_runner().invoke(args=['backfill-photo-variants'])
+    assert '1 variants written, 0 failed' in result.output
+    assert os.path.exists(thumbnail)
@@ -0,0 +1,69 @@
+"""
+Checks the on-demand /qr image endpoint, its access rules and its HTTP caching headers.
+"""
+
+from werkzeug.security import generate_password_hash
+from app import app, db, Teacher, Student, qr_images
+from qr_service import render_qr_png
+
+
+def setup_module(module):
+    with app.app_context():
+        db.session.add(Teacher(username='qr_teacher', password=generate_password_hash('secret')))
+        db.session.add(Student(name='QR Image Student', student_number='10001'))
+        db.session.commit()
+
+
+def logged_in_client():
+    client = app.test_client()
+    client.post('/login', data={'username': 'qr_teacher', 'password': 'secret'})
+    return client
+
+
+def test_png_is_cached_and_revalidated():
+    client = logged_in_client()
+    misses = qr_images.stats()['misses']
+    response = client.get('/qr/10001.png?size=100')
+    assert response.status_code == 200
+    assert response.mimetype == 'image/png'
+    assert response.data == render_qr_png('10001', 100)
+    assert 'immutable' in response.headers['Cache-Control']
+    assert 'private' in response.headers['Cache-Control']
+    etag = response.headers['ETag']
+    assert not etag.startswith('W/')
+
+    again = client.get('/qr/10001.png?size=100')
+    assert again.data == response.data
+    assert qr_images.stats()['misses'] == misses + 1
+
+    revalidated = client.get('/qr/10001.png?size=100', headers={'If-None-Match': etag})
+    assert revalidated.status_code == 304
+    assert revalidated.data == b''
+    assert client.get('/qr/10001.png?size=200').headers['ETag'] != etag
+
+
+def test_svg_and_invalid_requests():
+    client = logged_in_client()
+    response = client.get('/qr/10001.svg?size=60')
+    assert response.mimetype == 'image/svg+xml'
+    assert response.data.startswith(b'<svg')
+    assert client.get('/qr/10001.gif').status_code == 404
+    assert client.get('/qr/10001.png?size=abc').status_code == 400
+    assert client.get('/qr/10001.png?size=5000').status_code == 400
+
+
+def test_only_teachers_get_codes_and_only_for_students():
+    misses = qr_images.stats()['misses']
+    assert app.test_client().get('/qr/10001.png').status_code == 302  # to the login page
+    assert logged_in_client().get('/qr/anything at all.png').status_code == 404
+    assert qr_images.stats()['misses'] == misses
+
+
+def test_download_serves_full_size_png():
+    client = logged_in_client()
+    with app.app_context():
+        student_id = Student.query.filter_by(student_number='10001').one().id
+    response = client.get(f'/students/qr/{student_id}')
+    assert response.status_code == 200
+    assert 'filename=10001.png' in response.headers['Content-Disposition']
+    assert response.data == render_qr_png('10001')
@@ -0,0 +1,71 @@
+"""
+Checks QR rendering and the content-addressed files written for badge sheets.
+Uses a temporary directory for the images and a single worker process.
+"""
+import io
+import os
+import re
+
+import qrcode
+from PIL import Image
+from qr_service import QRCodeService, QRImageCache, qr_matrix, render_qr_image, render_qr_png, render_qr_svg
+
+
+def test_render_matches_qrcode_make():
+    expected = qrcode.make('123456').get_image()
+    rendered = render_qr_image('123456')
+    assert rendered.size == expected.size
+    assert rendered.tobytes() == expected.convert(rendered.mode).tobytes()
+
+
+def test_write_all_renders_each_payload_once(tmp_path):
+    service = QRCodeService(str(tmp_path), max_workers=1, batch_size=2)
+    assert service.write_all(['1001', '1002', '1001', '1003']) == (3, 0)
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(service.path_for(data))
+                                                  for data in ('1001', '1002', '1003'))
+    with Image.open(service.path_for('1002')) as image:
+        assert image.size == render_qr_image('1002').size
+
+    # Existing files are not rendered again unless asked to
+    os.utime(service.path_for('1001'), (0, 0))
+    service.write_all(['1001'])
+    assert os.path.getmtime(service.path_for('1001')) == 0
+    service.write_all(['1001'], overwrite=True)
+    assert os.path.getmtime(service.path_for('1001')) > 0
+
+
+def test_png_size_keeps_whole_modules():
+    count = len(qr_matrix('123456'))
+    with Image.open(io.BytesIO(render_qr_png('123456'))) as full:
+        assert full.tobytes() == render_qr_image('123456').tobytes()
+    for size, expected in [(100, (100 // count) * count), (count * 3 + 2, count * 3), (16, count)]:
+        with Image.open(io.BytesIO(render_qr_png('123456', size))) as image:
+            assert image.size == (expected, expected)
+
+
+def test_svg_runs_cover_dark_modules():
+    modules = qr_matrix('123456')
+    svg = render_qr_svg('123456', size=80).decode()
+    assert 'width="80"' in svg
+    drawn = set()
+    for x, y, width in re.findall(r'M(\d+) (\d+)h(\d+)', svg):
+        drawn.update((int(y), int(x) + dx) for dx in range(int(width)))
+    assert drawn == {(y, x) for y, x in zip(*modules.nonzero())}
+
+
+def test_image_cache_evicts_least_recently_used():
+    cache = QRImageCache(max_bytes=10)
+    renders = []
+
+    def render(body):
+        renders.append(body)
+        return body
+
+    cache.get_or_render('a', lambda: render(b'aaaa'))
+    cache.get_or_render('b', lambda: render(b'bbbb'))
+    cache.get_or_render('a', lambda: render(b'aaaa'))  # hit; 'b' is now the oldest
+    cache.get_or_render('c', lambda: render(b'cccc'))  # over 10 bytes, drops 'b'
+    cache.get_or_render('a', lambda: render(b'aaaa'))
+    cache.get_or_render('b', lambda: render(b'bbbb'))
+    assert renders == [b'aaaa', b'bbbb', b'cccc', b'bbbb']
+    assert cache.stats() == {'entries': 2, 'bytes': 8, 'hits': 2, 'misses': 4}
@@ -0,0 +1,33 @@
+"""
+Checks that the scan API answers malformed bodies with a 400 JSON error instead of a 500.
+"""
+
+from datetime import time
+from werkzeug.security import generate_password_hash
+from app import app, db, Teacher, Class, Student
+
+
+def setup_module(module):
+    with app.app_context():
+        teacher = Teacher(username='scan_teacher', password=generate_password_hash('secret'))
+        db.session.add(teacher)
+        db.session.flush()
+        class_ = Class(name='Scan Class', teacher_id=teacher.id, start_time=time(8, 0), end_time=time(9, 0))
+        db.session.add_all([class_, Student(name='Scan Student', student_number='10000')])
+        db.session.commit()
+        module.class_id = class_.id
+
+
+def test_wrong_value_types_are_rejected():
+    client = app.test_client()
+    client.post('/login', data={'username': 'scan_teacher', 'password': 'secret'})
+    url = f'/api/classes/{class_id}/scan'
+    for body in (['10000'], {'qr_data': 123}, {'qr_data': '10000', 'attendance_date': 20250915},
+                 {'qr_data': '10000', 'arrival_time': ['08:00']}):
+        response = client.post(url, json=body)
+        assert response.status_code == 400, body
+        assert response.get_json()['success'] is False
+
+    response = client.post(url, json={'qr_data': '10000', 'attendance_date': '2025-09-15', 'arrival_time': '08:05'})
+    assert response.status_code == 200
+    assert response.get_json()['student_number'] == '10000'
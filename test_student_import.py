@@ -0,0 +1,87 @@
+"""
+Checks the bulk CSV student import: validation, batching and the background worker.
+"""
+import io
+import time
+
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from werkzeug.security import generate_password_hash
+from app import app, db, Student, Teacher, import_students_csv, new_student_import_job
+
+
+def setup_module(module):
+    with app.app_context():
+        db.session.add(Teacher(username='import_teacher', password=generate_password_hash('secret')))
+        db.session.add(Student(name='Import Existing', student_number='10000'))
+        db.session.commit()
+
+
+def test_import_validates_rows(tmp_path):
+    lines = ['Name,Student Number'] + [f'Import Student {i},{10001 + i}' for i in range(7)] + [
+        'import existing,19999',   # name already in the database
+        'Someone Else,10003',      # number repeated in the file
+        'No Number,',
+        'Letters,12a4',
+        '',
+    ]
+    (tmp_path / 'roster.csv').write_text('\n'.join(lines), encoding='utf-8')
+
+    with app.app_context():
+        job = new_student_import_job(None, 'roster.csv')
+        import_students_csv(str(tmp_path / 'roster.csv'), job, batch_size=3)
+        imported = Student.query.filter(Student.student_number.between('10001', '10007')).all()
+
+    assert job['state'] == 'finished'
+    assert (job['rows'], job['created'], job['skipped']) == (11, 7, 4)
+    assert [error.split(':')[0] for error in job['errors']] == ['Line 9', 'Line 10', 'Line 11', 'Line 12']
+    assert len(imported) == 7
+    assert all(student.name_lower == student.name.lower() for student in imported)
+
+
+def test_import_rejects_missing_columns(tmp_path):
+    (tmp_path / 'bad.csv').write_text('First,Last\nA,B\n', encoding='utf-8')
+    with app.app_context():
+        job = import_students_csv(str(tmp_path / 'bad.csv'), new_student_import_job(None, 'bad.csv'))
+    assert job['state'] == 'failed'
+    assert job['created'] == 0
+
+
+def test_failed_insert_adds_no_students(tmp_path):
+    lines = ['Name,Student Number'] + [f'Atomic Student {i},{20001 + i}' for i in range(5)]
+    (tmp_path / 'roster.csv').write_text('\n'.join(lines), encoding='utf-8')
+    inserts = []
+
+    def fail_second_insert(conn, cursor, statement, parameters, context, executemany):
+        # Stands in for a student added through the form between validation and insert
+        if statement.startswith('INSERT INTO student'):
+            inserts.append(statement)
+            if len(inserts) == 2:
+                raise IntegrityError(statement, parameters, Exception('UNIQUE constraint failed'))
+
+    with app.app_context():
+        engine = db.engine
+        count = Student.query.count()
+        event.listen(engine, 'before_cursor_execute', fail_second_insert)
+        try:
+            job = import_students_csv(str(tmp_path / 'roster.csv'), new_student_import_job(None, 'roster.csv'),
+                                      batch_size=2)
+        finally:
+            event.remove(engine, 'before_cursor_execute', fail_second_insert)
+        assert Student.query.count() == count
+    assert job['state'] == 'failed' and job['created'] == 0
+    assert job['errors'][-1].startswith('Import stopped, no students were added')
+
+
+def test_upload_runs_on_the_import_worker():
+    client = app.test_client()
+    client.post('/login', data={'username': 'import_teacher', 'password': 'secret'})
+    roster = io.BytesIO(b'Name,Student Number\nUploaded Student,30001\n')
+    started = client.post('/students/import', data={'csv_file': (roster, 'roster.csv')},
+                          content_type='multipart/form-data').get_json()
+    for _ in range(100):
+        job = client.get(started['status_url']).get_json()['job']
+        if job['state'] in ('finished', 'failed'):
+            break
+        time.sleep(0.05)
+    assert (job['state'], job['created']) == ('finished', 1)
@@ -0,0 +1,51 @@
+"""
+Checks name_lower upkeep, search and cursor paging for the student list.
+"""
+
+from werkzeug.security import generate_password_hash
+from app import app, db, Teacher, Student, search_students, decode_student_cursor
+
+NAMES = ['Search Ana', 'search Ben', ' SEARCH Émile ', 'Search Zoë', 'Searcher Dana', 'Other Carl']
+
+
+def setup_module(module):
+    with app.app_context():
+        db.session.add(Teacher(username='search_teacher', password=generate_password_hash('secret')))
+        db.session.add_all([Student(name=name, student_number=str(10000 + i)) for i, name in enumerate(NAMES)])
+        db.session.commit()
+
+
+def test_name_lower_follows_name():
+    with app.app_context():
+        student = Student.query.filter_by(student_number='10002').first()
+        assert student.name_lower == 'search émile'
+        student.name = 'Search Émilie'
+        db.session.commit()
+        assert Student.query.get(student.id).name_lower == 'search émilie'
+
+
+def test_search_pages_through_prefix_matches():
+    with app.app_context():
+        names, cursor = [], None
+        while True:
+            students, next_cursor = search_students('SEARCH ', decode_student_cursor(cursor), limit=2)
+            names.extend(student.name_lower for student in students)
+            if next_cursor is None:
+                break
+            cursor = next_cursor
+        assert names == ['search ana', 'search ben', 'search zoë', 'search émilie', 'searcher dana']
+
+        students, _ = search_students('1000')
+        assert {student.student_number for student in students} == {str(10000 + i) for i in range(len(NAMES))}
+
+
+def test_duplicate_names_are_rejected_case_insensitively():
+    client = app.test_client()
+    client.post('/login', data={'username': 'search_teacher', 'password': 'secret'})
+    response = client.post('/students/manage', data={'name': 'search ana', 'student_number': '19999'})
+    assert b'A student with this name already exists.' in response.data
+    with app.app_context():
+        assert Student.query.filter_by(student_number='19999').first() is None
+
+    response = client.get('/api/students?q=other')
+    assert [student['name'] for student in response.get_json()['students']] == ['Other Carl']